@@ -6,14 +6,32 @@ Version : 2.0.0
 """
 
 import datetime
-import json
 import logging
+import os
+import time
+from typing import TYPE_CHECKING
 
-import altair as alt
-import joblib
-import pandas as pd
 import streamlit as st
 
+from comparables import PRICE_COLUMN
+from drift import DriftMonitor
+from inference import (
+    FEATURE_COLUMNS, explain_records, predict_records, predict_scenarios, scenario_grid, what_if_axes,
+)
+from inference_pool import InferencePool, ServiceBusy
+from leaderboard import DEPLOYED_MODEL, leaderboard_version, load_leaderboard
+from metrics import STAGE_SECONDS, start_file_dump, start_http_server
+from prediction_cache import PredictionCache
+from prediction_log import PredictionLog
+from registry import LoadedModel, ModelWatcher
+from search_index import PrefixIndex
+from tiers import available_tiers, tier_model
+
+if TYPE_CHECKING:
+    import altair as alt
+    import numpy as np
+    import pandas as pd
+
 # ---------------------------------------------------------------------------
 # Logging
 # ---------------------------------------------------------------------------
@@ -23,19 +41,62 @@ logger = logging.getLogger(__name__)
 # ---------------------------------------------------------------------------
 # Constants
 # ---------------------------------------------------------------------------
-MODEL_METRICS: list[dict] = [
-    {"rank": "1 🏆", "name": "XGBoost",        "mae": 1_463, "r2": 96.2, "status": "WINNER",    "winner": True},
-    {"rank": "2 🥈", "name": "Random Forest",   "mae": 1_220, "r2": 95.5, "status": "Excellent", "winner": False},
-    {"rank": "3 🥉", "name": "CatBoost",        "mae": 1_366, "r2": 95.4, "status": "Excellent", "winner": False},
-    {"rank": "4",    "name": "LightGBM",        "mae": 1_736, "r2": 92.3, "status": "Very Good", "winner": False},
-    {"rank": "5",    "name": "Decision Tree",   "mae": 1_728, "r2": 90.8, "status": "Good",      "winner": False},
-    {"rank": "6",    "name": "KNN",             "mae": 2_003, "r2": 88.4, "status": "Decent",    "winner": False},
-    {"rank": "7",    "name": "Gradient Boost",  "mae": 2_220, "r2": 87.0, "status": "Fair",      "winner": False},
-    {"rank": "8",    "name": "Linear Reg",      "mae": 3_092, "r2": 76.2, "status": "Weak",      "winner": False},
-    {"rank": "9",    "name": "AdaBoost",        "mae": 7_901, "r2": 13.4, "status": "Poor",      "winner": False},
+# R² (in %) floors for the ranking table's status column, best first.
+STATUS_BANDS: list[tuple[float, str]] = [
+    (95.0, "Excellent"), (92.0, "Very Good"), (90.0, "Good"), (88.0, "Decent"),
+    (85.0, "Fair"), (50.0, "Weak"), (float("-inf"), "Poor"),
 ]
+RANK_MEDALS: dict[int, str] = {1: " 🏆", 2: " 🥈", 3: " 🥉"}
+
+# Shared across all sessions in the process; ``None`` TTL keeps entries until
+# they are evicted or the artefacts on disk change.
+PREDICTION_CACHE_SIZE = 10_000
+PREDICTION_CACHE_TTL: float | None = None
+
+# Option lists longer than this get a server-side search box instead of
+# shipping every entry to the browser; only SEARCH_RESULTS matches are sent.
+SEARCH_THRESHOLD = 50
+SEARCH_RESULTS   = 20
+
+# Serving tier for interactive valuations (see tiers.py); the full model is
+# used when the artefacts have no measured tiers.
+APP_TIER = "fast"
+
+# The price breakdown uses XGBoost's approx_contribs: on the full model exact
+# TreeSHAP costs ~22 ms per valuation against ~2 ms. Exact contributions stay
+# available to batch runs (batch_score.py --explain exact).
+APP_EXPLAIN_APPROXIMATE = True
+
+# Bar labels of the price breakdown, one per model input.
+FIELD_LABELS: dict[str, str] = {
+    "make": "Make", "model": "Model", "trim": "Trim", "body": "Body Type", "transmission": "Transmission",
+    "state": "State", "condition": "Condition", "odometer": "Odometer", "color": "Exterior Color",
+    "interior": "Interior Color", "seller": "Seller", "car_age": "Age",
+}
+
+# Nearest historical sales shown under a valuation (see comparables.py).
+COMPARABLES_SHOWN = 5
+
+# Served artefacts: the active version of this registry, or files/ when it has
+# none. New versions are loaded, validated and swapped in without a restart.
+REGISTRY_DIR         = os.environ.get("CAR_PRICE_REGISTRY", "registry")
+MODEL_WATCH_INTERVAL = float(os.environ.get("CAR_PRICE_MODEL_WATCH_INTERVAL", "5"))
+
+# Every session's predictions run on one process-wide pool. 0 workers means one
+# per core; a full queue turns a valuation into a "busy, try again" message.
+INFERENCE_WORKERS = int(os.environ.get("CAR_PRICE_INFERENCE_WORKERS", "0"))
+INFERENCE_QUEUE   = int(os.environ.get("CAR_PRICE_INFERENCE_QUEUE", "64"))
 
-FILES_DIR = "files"
+# Every valuation is appended to a prediction log in this directory (see
+# prediction_log.py and replay.py); empty turns logging off.
+PREDICTION_LOG_DIR      = os.environ.get("CAR_PRICE_PREDICTION_LOG", "")
+PREDICTION_LOG_COMPRESS = os.environ.get("CAR_PRICE_PREDICTION_LOG_COMPRESS", "1") == "1"
+
+# Prometheus-format metrics are off unless one of these is set: a port serves
+# GET /metrics, a path is rewritten every METRICS_DUMP_INTERVAL seconds.
+METRICS_PORT          = int(os.environ.get("CAR_PRICE_METRICS_PORT", "0"))
+METRICS_FILE          = os.environ.get("CAR_PRICE_METRICS_FILE", "")
+METRICS_DUMP_INTERVAL = 15.0
 
 # ---------------------------------------------------------------------------
 # CSS
@@ -368,31 +429,133 @@ h4 {
 """
 
 # ---------------------------------------------------------------------------
-# Resource loading  (cached — only runs once per session)
+# Resource loading  (cached — only runs once per process and artefact version)
 # ---------------------------------------------------------------------------
 @st.cache_resource
-def load_resources() -> tuple:
+def get_model_watcher() -> ModelWatcher:
+    """
+    Process-wide model watcher, started on the first page view.
+
+    It loads the artefacts on a background thread, so imports and unpickling
+    overlap with rendering the home page, then keeps polling for new versions
+    and swaps them in once they are warmed up and validated (see registry.py).
     """
-    Load ML artefacts from disk.
+    return ModelWatcher(REGISTRY_DIR, interval=MODEL_WATCH_INTERVAL).start()
+
+
+def load_resources() -> LoadedModel | None:
+    """
+    The version currently served, waiting for the first load if necessary.
+
+    Taken once per script run: everything on the page comes from the same
+    model, encoder, scaler and comparables even if a swap happens meanwhile.
 
     Returns
     -------
-    (ml_model, encoder, scaler, options) or (None, None, None, None) on failure.
+    The ``LoadedModel``, or ``None`` when no artefacts could be loaded.
     """
-    try:
-        ml_model = joblib.load(f"{FILES_DIR}/xgb_model.joblib")
-        encoder  = joblib.load(f"{FILES_DIR}/target_encoder.joblib")
-        scaler   = joblib.load(f"{FILES_DIR}/scaler.joblib")
-        with open(f"{FILES_DIR}/options.json", "r", encoding="utf-8") as fh:
-            options = json.load(fh)
-        logger.info("All model artefacts loaded successfully.")
-        return ml_model, encoder, scaler, options
-    except FileNotFoundError as exc:
-        logger.error("Artefact not found: %s", exc)
-        return None, None, None, None
-    except Exception as exc:  # noqa: BLE001
-        logger.error("Unexpected error loading artefacts: %s", exc)
-        return None, None, None, None
+    watcher = get_model_watcher()
+    loaded = watcher.current()
+    if loaded is None:
+        with st.spinner("Loading the valuation model…"):
+            loaded = watcher.wait()
+    return loaded
+
+
+@st.cache_resource
+def get_prediction_cache() -> PredictionCache:
+    """Process-wide prediction cache shared by every Streamlit session."""
+    return PredictionCache(maxsize=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL)
+
+
+# Two entries: sessions still finishing on the previous version keep its pool
+# while new runs use the new one; the older pool is closed on the next swap.
+@st.cache_resource(max_entries=2, on_release=lambda pool: pool.close())
+def get_inference_pool(model_version: str, _ml_model) -> InferencePool:
+    """Process-wide inference workers for the loaded model; replaced when the artefacts change."""
+    return InferencePool(_ml_model, workers=INFERENCE_WORKERS or None, max_queue=INFERENCE_QUEUE)
+
+
+@st.cache_resource
+def get_prediction_log() -> PredictionLog | None:
+    """Process-wide prediction log, or ``None`` when ``CAR_PRICE_PREDICTION_LOG`` is unset."""
+    return PredictionLog(PREDICTION_LOG_DIR, compress=PREDICTION_LOG_COMPRESS) if PREDICTION_LOG_DIR else None
+
+
+# One per served version, like the pool: the previous version's keeps counting
+# for sessions still finishing on it.
+@st.cache_resource(max_entries=2)
+def get_drift_monitor(model_version: str, _loaded: LoadedModel) -> DriftMonitor:
+    """Process-wide input drift monitor for the loaded version (see drift.py)."""
+    return DriftMonitor(_loaded.transform, _loaded.drift_reference)
+
+
+@st.cache_resource
+def start_metrics_export() -> bool:
+    """Start the configured metrics exporters once per process."""
+    if METRICS_PORT:
+        start_http_server(METRICS_PORT)
+    if METRICS_FILE:
+        start_file_dump(METRICS_FILE, METRICS_DUMP_INTERVAL)
+    return bool(METRICS_PORT or METRICS_FILE)
+
+
+@st.cache_resource(max_entries=256)
+def get_search_index(model_version: str, relation: str, key: str, _values: list[str]) -> PrefixIndex:
+    """Prefix index over one option list, built once per (artefact version, relation, key)."""
+    return PrefixIndex(_values)
+
+
+@st.cache_data(max_entries=1)
+def get_model_metrics(leaderboard_key: str) -> list[dict]:
+    """
+    Leaderboard rows for the accuracy chart and ranking table.
+
+    ``leaderboard_key`` is the leaderboard file's size and mtime, so the file
+    is only re-read after ``leaderboard.py`` rewrites it.
+    """
+    report = load_leaderboard()
+    if report is None:
+        return []
+    rows = []
+    for rank, m in enumerate(report["models"], start=1):
+        r2 = round(m["r2"] * 100, 1)
+        deployed = m["name"] == report["deployed"]
+        size_bytes = m.get("size_bytes")
+        rows.append({
+            "rank": f"{rank}{RANK_MEDALS.get(rank, '')}",
+            "name": m["name"], "mae": round(m["mae"]), "r2": r2,
+            "latency_ms": m.get("row_latency_ms"),
+            "size_mb": None if size_bytes is None else size_bytes / 1e6,
+            "status": "DEPLOYED" if deployed else next(label for floor, label in STATUS_BANDS if r2 >= floor),
+            "winner": deployed,
+        })
+    return rows
+
+
+@st.cache_data(max_entries=1)
+def get_comparison_table_html(leaderboard_key: str) -> str:
+    """Ranking table HTML, built once per leaderboard file instead of on every rerun."""
+    return build_comparison_table_html(get_model_metrics(leaderboard_key))
+
+
+@st.cache_resource(max_entries=1)
+def get_accuracy_chart(leaderboard_key: str) -> "alt.Chart":
+    """Accuracy chart, built once per leaderboard file; charts are not mutated after building."""
+    return build_accuracy_chart(get_model_metrics(leaderboard_key))
+
+
+def deployed_metrics(model_metrics: list[dict]) -> dict:
+    """Leaderboard row of the served model (accuracy unknown if it was not benchmarked)."""
+    return next((m for m in model_metrics if m["winner"]), {"name": DEPLOYED_MODEL, "r2": "—"})
+
+
+def tier_label(name: str, tiers: dict[str, dict]) -> str:
+    """Radio label for a serving tier, with its measured error and latency when known."""
+    if name not in tiers:
+        return name.title()
+    tier = tiers[name]
+    return f"{name.title()} · ±${tier['mae']:,.0f} · {tier['row_latency_ms']:.2f} ms"
 
 
 # ---------------------------------------------------------------------------
@@ -406,12 +569,18 @@ def navigate_to(page: str) -> None:
 # ---------------------------------------------------------------------------
 # Chart builder
 # ---------------------------------------------------------------------------
-def build_accuracy_chart() -> alt.Chart:
+def build_accuracy_chart(model_metrics: list[dict]) -> "alt.Chart":
+    # Deferred: altair and pandas are only needed for this chart.
+    import altair as alt
+    import pandas as pd
+
     chart_data = pd.DataFrame({
-        "Model":        [m["name"]   for m in MODEL_METRICS],
-        "Accuracy (%)": [m["r2"]     for m in MODEL_METRICS],
-        "Error ($)":    [m["mae"]    for m in MODEL_METRICS],
-        "Color":        ["#3b82f6" if m["winner"] else "#64748b" for m in MODEL_METRICS],
+        "Model":          [m["name"]       for m in model_metrics],
+        "Accuracy (%)":   [m["r2"]         for m in model_metrics],
+        "Error ($)":      [m["mae"]        for m in model_metrics],
+        "Latency (ms)":   [m["latency_ms"] for m in model_metrics],
+        "Size (MB)":      [m["size_mb"]    for m in model_metrics],
+        "Color":          ["#3b82f6" if m["winner"] else "#64748b" for m in model_metrics],
     })
 
     return (
@@ -424,27 +593,119 @@ def build_accuracy_chart() -> alt.Chart:
                     axis=alt.Axis(title="Model Accuracy (%)", titleColor="white",
                                   labelColor="white", gridColor="rgba(255,255,255,0.1)")),
             color=alt.Color("Color", scale=None, legend=None),
-            tooltip=["Model", "Accuracy (%)", "Error ($)"],
+            tooltip=["Model", "Accuracy (%)", "Error ($)",
+                     alt.Tooltip("Latency (ms)", format=".3f"), alt.Tooltip("Size (MB)", format=".1f")],
+        )
+        .properties(height=350, background="transparent")
+        .configure_view(strokeWidth=0)
+        .configure_axis(labelColor="white", titleColor="white", domainColor="white")
+    )
+
+
+def build_what_if_chart(scenarios: "pd.DataFrame", record: dict, prediction: float) -> "alt.Chart":
+    """Price against mileage, one line per year from now; a dropdown picks the condition."""
+    import altair as alt
+    import pandas as pd
+
+    years = scenarios["car_age"] - record["car_age"]
+    chart_data = scenarios.assign(
+        When=["Now" if y == 0 else f"In {y} yr" for y in years],
+        Years=years,
+    )
+    condition = alt.param(
+        name="condition", value=round(record["condition"], 1),
+        bind=alt.binding_select(options=sorted(chart_data["condition"].unique().tolist()), name="Condition "),
+    )
+    lines = (
+        alt.Chart(chart_data)
+        .mark_line(strokeWidth=2.5)
+        .encode(
+            x=alt.X("odometer", axis=alt.Axis(title="Odometer (Miles)", format=",.0f",
+                                              gridColor="rgba(255,255,255,0.1)")),
+            y=alt.Y("price", axis=alt.Axis(title="Estimated Value ($)", format="$,.0f",
+                                           gridColor="rgba(255,255,255,0.1)")),
+            color=alt.Color("When", sort=alt.SortField("Years"), scale=alt.Scale(scheme="blues", reverse=True),
+                            legend=alt.Legend(title=None, labelColor="white", orient="top")),
+            tooltip=[alt.Tooltip("When"), alt.Tooltip("odometer", title="Odometer", format=",.0f"),
+                     alt.Tooltip("condition", title="Condition"), alt.Tooltip("price", title="Value", format="$,.0f")],
         )
+        .add_params(condition)
+        .transform_filter(alt.datum.condition == condition)
+    )
+    current = (
+        alt.Chart(pd.DataFrame({"odometer": [record["odometer"]], "price": [prediction]}))
+        .mark_point(filled=True, size=140, color="white")
+        .encode(x="odometer", y="price")
+    )
+    return (
+        (lines + current)
         .properties(height=350, background="transparent")
         .configure_view(strokeWidth=0)
         .configure_axis(labelColor="white", titleColor="white", domainColor="white")
     )
 
 
+def build_explanation_chart(contributions: "np.ndarray") -> "alt.Chart":
+    """How far each input field moved the price from the model's base value, largest first."""
+    import altair as alt
+    import pandas as pd
+
+    chart_data = pd.DataFrame({
+        "Field": [FIELD_LABELS[col] for col in FEATURE_COLUMNS],
+        "Effect": contributions[:len(FEATURE_COLUMNS)],
+    })
+    chart_data["Label"] = chart_data["Effect"].map(lambda v: f"{'+' if v >= 0 else '−'}${abs(v):,.0f}")
+    chart_data["Direction"] = (chart_data["Effect"] >= 0).map({True: "raises", False: "lowers"})
+    order = chart_data.reindex(chart_data["Effect"].abs().sort_values(ascending=False).index)["Field"].tolist()
+
+    bars = alt.Chart(chart_data).mark_bar(cornerRadiusEnd=4).encode(
+        x=alt.X("Effect", axis=alt.Axis(title="Effect on price ($)", format="$,.0f",
+                                        gridColor="rgba(255,255,255,0.1)")),
+        y=alt.Y("Field", sort=order, axis=alt.Axis(title=None)),
+        color=alt.Color("Direction", scale=alt.Scale(domain=["raises", "lowers"], range=["#22c55e", "#ef4444"]),
+                        legend=None),
+        tooltip=[alt.Tooltip("Field"), alt.Tooltip("Label", title="Effect")],
+    )
+    return (
+        bars.properties(height=320, background="transparent")
+        .configure_view(strokeWidth=0)
+        .configure_axis(labelColor="white", titleColor="white", domainColor="white")
+    )
+
+
 # ---------------------------------------------------------------------------
 # HTML components
 # ---------------------------------------------------------------------------
-def build_comparison_table_html() -> str:
+def format_comparables(nearest: "pd.DataFrame") -> "pd.DataFrame":
+    """Comparable sales as shown under the valuation."""
+    import pandas as pd
+
+    return pd.DataFrame({
+        "Make & Model": (nearest["make"].astype(str) + " " + nearest["model"].astype(str)).to_numpy(),
+        "Trim": nearest["trim"].to_numpy(),
+        "Age at Sale": nearest["car_age"].to_numpy(),
+        "Odometer": nearest["odometer"].map("{:,.0f} mi".format).to_numpy(),
+        "Condition": nearest["condition"].to_numpy(),
+        "Color": nearest["color"].to_numpy(),
+        "State": nearest["state"].to_numpy(),
+        "Sold For": nearest[PRICE_COLUMN].map("${:,.0f}".format).to_numpy(),
+    })
+
+
+def build_comparison_table_html(model_metrics: list[dict]) -> str:
     rows = ""
-    for m in MODEL_METRICS:
+    for m in model_metrics:
         row_class = 'class="winner-row"' if m["winner"] else ""
+        latency = "—" if m["latency_ms"] is None else f"{m['latency_ms']:.2f} ms"
+        size = "—" if m["size_mb"] is None else f"{m['size_mb']:,.1f} MB"
         rows += (
             f"<tr {row_class}>"
             f"<td>{m['rank']}</td>"
             f"<td>{m['name']}</td>"
             f"<td>${m['mae']:,}</td>"
             f"<td>{m['r2']}%</td>"
+            f"<td>{latency}</td>"
+            f"<td>{size}</td>"
             f"<td>{m['status']}</td>"
             f"</tr>"
         )
@@ -453,17 +714,44 @@ def build_comparison_table_html() -> str:
     <thead>
         <tr>
             <th>Rank</th><th>AI Model</th>
-            <th>Avg. Error (MAE)</th><th>Accuracy (R²)</th><th>Status</th>
+            <th>Avg. Error (MAE)</th><th>Accuracy (R²)</th>
+            <th>Latency / Car</th><th>Size</th><th>Status</th>
         </tr>
     </thead>
     <tbody>{rows}</tbody>
 </table>"""
 
 
+# ---------------------------------------------------------------------------
+# Widgets
+# ---------------------------------------------------------------------------
+def searchable_selectbox(label: str, values: list[str], model_version: str,
+                         relation: str, key: str) -> str:
+    """
+    ``st.selectbox`` that only sends a short list to the browser.
+
+    Short lists are shown as-is. Long ones get a search box; the selectbox is
+    filled with the top ``SEARCH_RESULTS`` prefix matches for the query.
+    """
+    if len(values) <= SEARCH_THRESHOLD:
+        return st.selectbox(label, values)
+
+    index = get_search_index(model_version, relation, key, values)
+    query = st.text_input(f"Search {label}", key=f"{relation}_query",
+                          placeholder=f"Type to search {len(values):,} entries…")
+    matches = index.search(query, SEARCH_RESULTS)
+    if not matches:
+        st.caption("No match — showing the first entries.")
+        matches = index.search("", SEARCH_RESULTS)
+    return st.selectbox(label, matches)
+
+
 # ---------------------------------------------------------------------------
 # Pages
 # ---------------------------------------------------------------------------
-def render_home(comparison_table_html: str) -> None:
+def render_home(model_metrics: list[dict], comparison_table_html: str, accuracy_chart: "alt.Chart") -> None:
+    deployed = deployed_metrics(model_metrics)
+
     st.markdown("""
     <div class="hero-container">
         <h1 class="hero-title">CAR PRICE AI ✨</h1>
@@ -496,7 +784,7 @@ def render_home(comparison_table_html: str) -> None:
         ("🧠", "2. AI Analyzes",
          "XGBoost compares your car with 9,000+ real sales instantly."),
         ("💎", "3. Get Price",
-         "Receive a precise market value with 96.2% accuracy rating."),
+         f"Receive a precise market value with {deployed['r2']}% accuracy rating."),
     ]
 
     for col, (icon, title, desc) in zip(st.columns(3), steps):
@@ -520,8 +808,8 @@ def render_home(comparison_table_html: str) -> None:
     )
     st.markdown(
         "<p style='text-align:center;color:#cbd5e1;margin-bottom:40px;font-size:1.1rem;'>"
-        "We tested 9 different algorithms. "
-        "<b style='color:#60a5fa;'>XGBoost</b> emerged as the undisputed champion.</p>",
+        f"We tested {len(model_metrics)} different algorithms on accuracy and serving cost. "
+        f"<b style='color:#60a5fa;'>{deployed['name']}</b> gives the best balance of the two.</p>",
         unsafe_allow_html=True,
     )
 
@@ -534,7 +822,7 @@ def render_home(comparison_table_html: str) -> None:
             "📊 Accuracy Comparison</h5>",
             unsafe_allow_html=True,
         )
-        st.altair_chart(build_accuracy_chart(), use_container_width=True)
+        st.altair_chart(accuracy_chart, use_container_width=True)
         st.markdown("</div>", unsafe_allow_html=True)
 
     with col_table:
@@ -546,91 +834,176 @@ def render_home(comparison_table_html: str) -> None:
         )
 
 
-def render_predict(ml_model, encoder, scaler, options: dict, comparison_table_html: str) -> None:
-    st.markdown("<div style='margin-top:60px;'></div>", unsafe_allow_html=True)
-    if st.button("← Back to Home", key="back_btn"):
-        navigate_to("home")
-
-    # Guard — model files missing
-    if ml_model is None:
-        st.error("⚠️  Model files are missing. Please check your setup.")
-        st.stop()
-
-    st.markdown("<div class='animate-enter'>", unsafe_allow_html=True)
-    st.markdown(
-        "<h2 style='text-align:center;margin-bottom:15px;font-size:2.8rem;'>Configure Your Car</h2>",
-        unsafe_allow_html=True,
-    )
-    st.markdown(
-        "<p style='text-align:center;color:#cbd5e1;margin-bottom:0;font-size:1.15rem;'>"
-        "Fill in the specifications for an instant AI-powered valuation.</p>",
-        unsafe_allow_html=True,
-    )
+@st.fragment
+def render_vehicle_identity(options: dict, model_version: str) -> None:
+    """
+    The dropdowns that feed other dropdowns (make → model → trim/body, make → seller).
 
-    # Section 1 — Vehicle Identity
+    A fragment, so a change here re-runs only these five widgets; the choice
+    is kept in ``st.session_state.vehicle`` for :func:`render_valuation`.
+    """
     st.markdown("#### 🚘 Vehicle Identity")
-    c1, c2, c3, c4 = st.columns(4)
-    with c1: make       = st.selectbox("Make",          options["makes"])
-    with c2: car_model  = st.selectbox("Model",         options["make_models"].get(make, []))
-    with c3: trim       = st.selectbox("Trim/Package",  options["model_trims"].get(car_model, ["Standard"]))
-    with c4: year       = st.number_input("Year", 1990, datetime.date.today().year + 1, 2015)
-
-    # Section 2 — Appearance & Condition
-    st.markdown("#### 🎨 Appearance & Condition")
-    c5, c6, c7, c8 = st.columns(4)
-    with c5: body      = st.selectbox("Body Type",       options["model_bodies"].get(car_model, ["Sedan"]))
-    with c6: color     = st.selectbox("Exterior Color",  options["colors"])
-    with c7: interior  = st.selectbox("Interior Color",  options["interiors"])
-    with c8: condition = st.slider("Condition (1–5)", 1.0, 5.0, 4.0, 0.1)
-
-    # Section 3 — Technical & Sales
-    st.markdown("#### ⚙️ Technical & Sales")
-    c9, c10, c11, c12 = st.columns(4)
-    with c9:  transmission = st.selectbox("Transmission",  options["transmissions"])
-    with c10: odometer     = st.number_input("Odometer (Miles)", 0, 500_000, 45_000)
-    with c11:
-        state_disp = st.selectbox("State", list(options["states_map"].keys()))
-        state_code = options["states_map"][state_disp]
-    with c12: seller = st.selectbox("Seller Type", options["make_sellers"].get(make, ["Other"]))
-
-    st.markdown("<br>", unsafe_allow_html=True)
+    c1, c2, c3, c4, c5 = st.columns(5)
+    with c1: make      = st.selectbox("Make",      options["makes"])
+    with c2: car_model = st.selectbox("Model",     options["make_models"].get(make, []))
+    with c3: trim      = searchable_selectbox("Trim/Package", options["model_trims"].get(car_model, ["Standard"]),
+                                              model_version, "model_trims", car_model)
+    with c4: body      = st.selectbox("Body Type", options["model_bodies"].get(car_model, ["Sedan"]))
+    with c5: seller    = searchable_selectbox("Seller Type", options["make_sellers"].get(make, ["Other"]),
+                                              model_version, "make_sellers", make)
+    st.session_state.vehicle = {"make": make, "model": car_model, "trim": trim, "body": body, "seller": seller}
+
+
+@st.fragment
+def render_valuation(loaded: LoadedModel, deployed: dict) -> None:
+    """
+    The remaining inputs, batched in a form, and the result.
+
+    Submitting the form re-runs only this fragment; changing a field inside
+    the form re-runs nothing.  A fragment re-run keeps the ``loaded`` version
+    of the full run that drew it.
+    """
+    ml_model, transform, options, model_version = loaded.ml_model, loaded.transform, loaded.options, loaded.version
+    tiers = loaded.tiers
+    tier_names = available_tiers(tiers)
+    pool = get_inference_pool(model_version, ml_model)
+
+    with st.form("valuation_form", border=False):
+        # Section 2 — Appearance & Condition
+        st.markdown("#### 🎨 Appearance & Condition")
+        c6, c7, c8, c9 = st.columns(4)
+        with c6: year      = st.number_input("Year", 1990, datetime.date.today().year + 1, 2015)
+        with c7: color     = st.selectbox("Exterior Color",  options["colors"])
+        with c8: interior  = st.selectbox("Interior Color",  options["interiors"])
+        with c9: condition = st.slider("Condition (1–5)", 1.0, 5.0, 4.0, 0.1)
+
+        # Section 3 — Technical & Sales
+        st.markdown("#### ⚙️ Technical & Sales")
+        c10, c11, c12 = st.columns(3)
+        with c10: transmission = st.selectbox("Transmission",  options["transmissions"])
+        with c11: odometer     = st.number_input("Odometer (Miles)", 0, 500_000, 45_000)
+        with c12:
+            state_disp = st.selectbox("State", list(options["states_map"].keys()))
+            state_code = options["states_map"][state_disp]
+
+        st.markdown("<br>", unsafe_allow_html=True)
+        tier = st.radio("Valuation mode", tier_names, horizontal=True,
+                        index=tier_names.index(APP_TIER) if APP_TIER in tier_names else 0,
+                        format_func=lambda name: tier_label(name, tiers))
+        explain = st.checkbox("Explain the price", value=True,
+                              help="Show how much each field raised or lowered the estimate.")
+        submitted = st.form_submit_button("Calculate Value 💰", use_container_width=True)
+
+    served_model = tier_model(ml_model, tier, tiers)
+    accuracy = round(tiers[tier]["r2"] * 100, 1) if tier in tiers else deployed["r2"]
 
     # --- Prediction ---
-    if st.button("Calculate Value 💰", use_container_width=True):
+    if submitted:
         car_age = datetime.date.today().year - int(year)
 
-        input_df = pd.DataFrame({
-            "make": [make], "model": [car_model], "trim": [trim], "body": [body],
-            "transmission": [transmission], "state": [state_code], "condition": [condition],
-            "odometer": [odometer], "color": [color], "interior": [interior],
-            "seller": [seller], "car_age": [car_age],
-        })
+        record = {
+            **st.session_state.vehicle,
+            "transmission": transmission, "state": state_code, "condition": condition,
+            "odometer": odometer, "color": color, "interior": interior, "car_age": car_age,
+        }
 
         with st.spinner("🤖 AI is analysing 9,000+ market records…"):
             try:
-                encoded    = encoder.transform(input_df)
-                scaled     = scaler.transform(encoded)
-                prediction = ml_model.predict(scaled)[0]
-
+                timings: dict[str, float] = {}
+                started = time.perf_counter()
+                if explain:
+                    def _explained() -> tuple[float, "np.ndarray"]:
+                        prices, contributions = pool.run(explain_records, served_model, transform, [record],
+                                                         APP_EXPLAIN_APPROXIMATE, timings)
+                        return prices[0], contributions[0]
+
+                    prediction, contributions = get_prediction_cache().get_or_explain(
+                        record, model_version, _explained, tier)
+                else:
+                    prediction = get_prediction_cache().get_or_compute(
+                        record, model_version,
+                        lambda: pool.run(predict_records, served_model, transform, [record], timings)[0],
+                        tier,
+                    )
+                unseen = get_drift_monitor(model_version, loaded).observe(record)
+                prediction_log = get_prediction_log()
+                if prediction_log is not None:
+                    # No transform/predict stages means the price came from the cache.
+                    prediction_log.log(record, prediction, model_version, tier, "app",
+                                       {**timings, "total": time.perf_counter() - started})
+
+                scenarios = scenario_grid(what_if_axes(record))
+                scenarios["price"] = pool.run(predict_scenarios, served_model, transform, record, scenarios)
+
+                render_started = time.perf_counter()
                 st.balloons()
-                st.markdown(
+                col_price, col_curve = st.columns(2, gap="large")
+                col_price.markdown(
                     f"""<div class="result-container">
                         <h3 style="color:#94a3b8;font-size:1.1rem;margin-bottom:10px;
                                    font-weight:500!important;letter-spacing:3px;text-transform:uppercase;">
                             Estimated Market Value
                         </h3>
                         <div class="price-tag">${prediction:,.0f}</div>
-                        <div class="confidence-badge">✓ High Confidence: 96.2% Model Accuracy</div>
+                        <div class="confidence-badge">✓ High Confidence: {accuracy}% Model Accuracy</div>
                         <p style="color:#94a3b8;font-size:0.95rem;margin-top:20px;position:relative;z-index:1;">
                             Based on comprehensive analysis of real market data
                         </p>
                     </div>""",
                     unsafe_allow_html=True,
                 )
+                if unseen:
+                    col_price.warning(
+                        f"ℹ️ {', '.join(FIELD_LABELS[col] for col in unseen)} did not appear in the sales the "
+                        "model learned from, so it was valued like an average car in that respect."
+                    )
+                if explain:
+                    col_price.markdown("#### 🧮 Why This Price?")
+                    col_price.altair_chart(build_explanation_chart(contributions), use_container_width=True)
+                    col_price.caption(f"Bars start from the model's base value of ${contributions[-1]:,.0f}; "
+                                      "together they add up to the estimate.")
+                col_curve.altair_chart(build_what_if_chart(scenarios, record, prediction), use_container_width=True)
+
+                comparables = loaded.comparables
+                if comparables is not None:
+                    nearest = comparables.query(record, transform.transform_records([record])[0], COMPARABLES_SHOWN)
+                    if len(nearest):
+                        st.markdown(f"#### 🔎 Comparable Sales — {len(nearest)} closest of {len(comparables):,}")
+                        st.dataframe(format_comparables(nearest), hide_index=True, use_container_width=True)
+                STAGE_SECONDS.observe(time.perf_counter() - render_started, "render")
+            except (ServiceBusy, TimeoutError):
+                st.warning("🚦 The valuation engine is busy right now — please press Calculate again in a moment.")
             except Exception as exc:  # noqa: BLE001
                 logger.error("Prediction failed: %s", exc)
                 st.error(f"Calculation Error: {exc}")
 
+
+def render_predict(loaded: LoadedModel | None, model_metrics: list[dict], comparison_table_html: str) -> None:
+    st.markdown("<div style='margin-top:60px;'></div>", unsafe_allow_html=True)
+    if st.button("← Back to Home", key="back_btn"):
+        navigate_to("home")
+
+    # Guard — model files missing
+    if loaded is None:
+        st.error("⚠️  Model files are missing. Please check your setup.")
+        st.stop()
+
+    deployed = deployed_metrics(model_metrics)
+
+    st.markdown("<div class='animate-enter'>", unsafe_allow_html=True)
+    st.markdown(
+        "<h2 style='text-align:center;margin-bottom:15px;font-size:2.8rem;'>Configure Your Car</h2>",
+        unsafe_allow_html=True,
+    )
+    st.markdown(
+        "<p style='text-align:center;color:#cbd5e1;margin-bottom:0;font-size:1.15rem;'>"
+        "Fill in the specifications for an instant AI-powered valuation.</p>",
+        unsafe_allow_html=True,
+    )
+
+    render_vehicle_identity(loaded.options, loaded.version)
+    render_valuation(loaded, deployed)
+
     st.markdown("</div>", unsafe_allow_html=True)
     st.markdown("<br><br>", unsafe_allow_html=True)
 
@@ -638,11 +1011,43 @@ def render_predict(ml_model, encoder, scaler, options: dict, comparison_table_ht
         st.markdown("### The Technology Behind Your Valuation")
         st.markdown(
             "<p style='color:#cbd5e1;margin-bottom:25px;'>"
-            "Our XGBoost model outperformed 8 other leading algorithms in rigorous testing.</p>",
+            f"Our {deployed['name']} model was benchmarked against {len(model_metrics) - 1} other "
+            "algorithms on accuracy, latency and size.</p>",
             unsafe_allow_html=True,
         )
         st.markdown(comparison_table_html, unsafe_allow_html=True)
 
+        cache_stats = get_prediction_cache().stats()
+        st.caption(
+            f"Prediction cache — {cache_stats['size']:,} entries · "
+            f"{cache_stats['hits']:,} hits · {cache_stats['misses']:,} misses · "
+            f"{cache_stats['evictions']:,} evictions · {cache_stats['invalidations']:,} invalidations"
+        )
+        pool_stats = get_inference_pool(loaded.version, loaded.ml_model).stats()
+        st.caption(
+            f"Inference pool — {pool_stats['workers']} workers × {pool_stats['threads_per_worker']} threads · "
+            f"{pool_stats['queue_depth']}/{pool_stats['max_queue']} queued · "
+            f"{pool_stats['completed']:,} completed · {pool_stats['rejected']:,} busy"
+        )
+        drift = get_drift_monitor(loaded.version, loaded).report()
+        if drift["max_psi"] is not None:
+            widest = max((col for col in drift["columns"] if drift["columns"][col]["psi"] is not None),
+                         key=lambda col: drift["columns"][col]["psi"])
+            drift_summary = (f"largest shift {FIELD_LABELS[widest]} (PSI {drift['max_psi']:.2f}, "
+                             f"{drift['columns'][widest]['status']})")
+        else:
+            drift_summary = "too few valuations to compare with the training data yet"
+        rarest = max(drift["columns"], key=lambda col: drift["columns"][col].get("unseen_rate", 0.0))
+        st.caption(f"Input drift — {drift['rows']:,} recent valuations · {drift_summary} · "
+                   f"{drift['columns'][rarest].get('unseen_rate', 0.0):.1%} of {FIELD_LABELS[rarest]} "
+                   "values unseen in training")
+        watcher_stats = get_model_watcher().stats()
+        st.caption(
+            f"Model version {loaded.version} · loaded "
+            f"{datetime.datetime.fromtimestamp(loaded.loaded_at):%Y-%m-%d %H:%M} · "
+            f"{watcher_stats['swaps']:,} swaps · {watcher_stats['rejections']:,} rejected"
+        )
+
 
 # ---------------------------------------------------------------------------
 # App entry point
@@ -656,18 +1061,21 @@ def main() -> None:
     )
 
     st.markdown(get_css(), unsafe_allow_html=True)
+    start_metrics_export()
 
-    ml_model, encoder, scaler, options = load_resources()
+    get_model_watcher()
 
     if "page" not in st.session_state:
         st.session_state.page = "home"
 
-    comparison_table_html = build_comparison_table_html()
+    leaderboard_key = leaderboard_version()
+    model_metrics = get_model_metrics(leaderboard_key)
+    comparison_table_html = get_comparison_table_html(leaderboard_key)
 
     if st.session_state.page == "home":
-        render_home(comparison_table_html)
+        render_home(model_metrics, comparison_table_html, get_accuracy_chart(leaderboard_key))
     elif st.session_state.page == "predict":
-        render_predict(ml_model, encoder, scaler, options, comparison_table_html)
+        render_predict(load_resources(), model_metrics, comparison_table_html)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,235 @@
+"""
+Car Price AI — Batch Scoring
+============================
+Headless valuation of whole inventories from CSV or Parquet files.
+
+The input is streamed in fixed-size chunks, each chunk is scored with a single
+vectorised transform → predict call, and results are appended to the
+output file as they are produced, so memory stays flat regardless of file size.
+
+Usage
+-----
+    python batch_score.py inventory.csv valuations.parquet --chunk-size 50000
+    python batch_score.py inventory.csv quick.parquet --tier fast
+    python batch_score.py inventory.csv comps.parquet --comparables 5
+    python batch_score.py inventory.csv explained.parquet --explain approx
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import time
+from collections.abc import Iterator
+
+import numpy as np
+import pandas as pd
+
+from comparables import load_comparables
+from inference import (
+    CONTRIBUTION_COLUMNS, FEATURE_COLUMNS, FILES_DIR, NUMERIC_COLUMNS, explain_frame, predict_frame,
+)
+from startup import load_and_warm
+from tiers import FULL_TIER, load_tiers, tier_model
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+DEFAULT_CHUNK_SIZE = 50_000
+PREDICTION_COLUMN = "predicted_price"
+COMPARABLE_PRICES_COLUMN = "comparable_prices"            # JSON list, nearest sale first
+COMPARABLES_MEDIAN_COLUMN = "comparables_median_price"
+CONTRIBUTION_PREFIX = "contribution_"                      # + field name, or base_value
+EXPLAIN_METHODS: list[str] = ["exact", "approx"]            # TreeSHAP, or XGBoost's approx_contribs
+
+
+# ---------------------------------------------------------------------------
+# Chunked readers / writers
+# ---------------------------------------------------------------------------
+def _is_parquet(path: str) -> bool:
+    return path.lower().endswith((".parquet", ".pq"))
+
+
+def iter_chunks(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Yield ``path`` as DataFrames of at most ``chunk_size`` rows."""
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        # Every column is declared rather than inferred per chunk, so all chunks share one schema:
+        # the model's numeric inputs as floats, everything else as text (``year`` is parsed in prepare_chunk).
+        columns = pd.read_csv(path, nrows=0).columns
+        yield from pd.read_csv(
+            path,
+            chunksize=chunk_size,
+            dtype={col: np.float64 if col in NUMERIC_COLUMNS else str for col in columns},
+        )
+
+
+class _ChunkWriter:
+    """Append scored chunks to a CSV or Parquet file without holding them in memory."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._parquet_writer = None
+        self._rows_written = 0
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        if _is_parquet(self.path):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self._parquet_writer is None:
+                # A text column that is empty throughout the first chunk comes out as the null type, which
+                # no later chunk's values cast to; every such column in an inventory is text.
+                schema = pa.schema([pa.field(field.name, pa.string()) if pa.types.is_null(field.type) else field
+                                    for field in table.schema], metadata=table.schema.metadata)
+                self._parquet_writer = pq.ParquetWriter(self.path, schema)
+            # pandas infers dtypes per chunk: a column of ints can come back as floats once it has a gap.
+            table = table.cast(self._parquet_writer.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            chunk.to_csv(self.path, mode="w" if self._rows_written == 0 else "a",
+                         header=self._rows_written == 0, index=False)
+        self._rows_written += len(chunk)
+
+    def close(self) -> None:
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+# ---------------------------------------------------------------------------
+# Scoring
+# ---------------------------------------------------------------------------
+def prepare_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """
+    Bring an inventory chunk into the shape the model expects.
+
+    Inventories may carry the model ``year`` instead of ``car_age``; it is
+    converted the same way ``render_predict`` does.  A missing or unreadable
+    year leaves ``car_age`` missing, which the model handles like any other
+    missing numeric field.
+    """
+    if "car_age" not in chunk.columns and "year" in chunk.columns:
+        year = pd.to_numeric(chunk["year"], errors="coerce").astype(np.float64)
+        chunk = chunk.assign(car_age=datetime.date.today().year - year)
+
+    missing = [col for col in FEATURE_COLUMNS if col not in chunk.columns]
+    if missing:
+        raise ValueError(f"Input is missing required columns: {missing}")
+    return chunk
+
+
+def add_comparables(chunk: pd.DataFrame, index, transform, k: int) -> pd.DataFrame:
+    """Add the sale prices of each row's ``k`` nearest comparable sales and their median."""
+    rows = index.query_frame(chunk, transform.transform(chunk), k)
+    prices = np.where(rows >= 0, index.prices[rows], np.nan)
+    chunk[COMPARABLES_MEDIAN_COLUMN] = pd.DataFrame(prices).median(axis=1).to_numpy()
+    chunk[COMPARABLE_PRICES_COLUMN] = [json.dumps([round(p) for p in row if p == p]) for row in prices.tolist()]
+    return chunk
+
+
+def score_file(
+    input_path: str,
+    output_path: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    files_dir: str = FILES_DIR,
+    resources: tuple | None = None,
+    tier: str = FULL_TIER,
+    comparables: int = 0,
+    explain: str | None = None,
+) -> dict:
+    """
+    Score every row of ``input_path`` and write it to ``output_path``.
+
+    Each output row is the input row plus a ``predicted_price`` column.
+    ``resources`` may be a ``load_and_warm()`` tuple that is already in memory.
+    ``tier`` picks the serving tier (see ``tiers.py``); batch runs default to
+    the full model.  With ``comparables`` > 0 each row also gets the prices
+    of that many nearest historical sales (see ``comparables.py``).  With
+    ``explain`` (``"exact"`` or ``"approx"``, see
+    ``inference.feature_contributions``) the price comes from the same call
+    as its per-field contributions, written as ``contribution_<field>`` columns.
+
+    Returns
+    -------
+    dict with ``rows``, ``chunks``, ``seconds`` and ``rows_per_second``.
+    """
+    if explain not in (None, *EXPLAIN_METHODS):
+        raise ValueError(f"Unknown explanation method '{explain}'; available: {EXPLAIN_METHODS}")
+    ml_model, transform, _ = resources or load_and_warm(files_dir)
+    if ml_model is None:
+        raise RuntimeError(f"Model artefacts could not be loaded from '{files_dir}'.")
+    ml_model = tier_model(ml_model, tier, load_tiers(files_dir, ml_model))
+    index = load_comparables(files_dir) if comparables else None
+    if comparables and index is None:
+        raise RuntimeError(f"No comparables index in '{files_dir}'; re-run train_pipeline.py to build one.")
+
+    writer = _ChunkWriter(output_path)
+    rows = chunks = 0
+    started = time.perf_counter()
+    try:
+        for chunk in iter_chunks(input_path, chunk_size):
+            chunk = prepare_chunk(chunk)
+            if explain:
+                chunk[PREDICTION_COLUMN], contributions = explain_frame(ml_model, transform, chunk,
+                                                                        approximate=explain == "approx")
+                for i, col in enumerate(CONTRIBUTION_COLUMNS):
+                    chunk[CONTRIBUTION_PREFIX + col] = contributions[:, i]
+            else:
+                chunk[PREDICTION_COLUMN] = predict_frame(ml_model, transform, chunk)
+            if index is not None:
+                chunk = add_comparables(chunk, index, transform, comparables)
+            writer.write(chunk)
+
+            rows += len(chunk)
+            chunks += 1
+            elapsed = time.perf_counter() - started
+            logger.info("Chunk %d scored — %d rows total, %.0f rows/s.",
+                        chunks, rows, rows / elapsed if elapsed else 0.0)
+    finally:
+        writer.close()
+
+    seconds = time.perf_counter() - started
+    stats = {
+        "rows": rows,
+        "chunks": chunks,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds, 1) if seconds else 0.0,
+    }
+    logger.info("Scored %d rows in %.2f s (%.0f rows/s).", rows, seconds, stats["rows_per_second"])
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Score a vehicle inventory file with the car price model.")
+    parser.add_argument("input", help="CSV or Parquet file with one vehicle per row.")
+    parser.add_argument("output", help="Destination CSV or Parquet file.")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"Rows scored per vectorised call (default: {DEFAULT_CHUNK_SIZE:,}).")
+    parser.add_argument("--files-dir", default=FILES_DIR, help="Directory holding the model artefacts.")
+    parser.add_argument("--tier", default=FULL_TIER, help="Serving tier (full, balanced, fast; see tiers.py).")
+    parser.add_argument("--comparables", type=int, default=0, metavar="K",
+                        help="Also add the prices of the K nearest historical sales.")
+    parser.add_argument("--explain", nargs="?", const="exact", choices=EXPLAIN_METHODS,
+                        help="Also add each field's contribution to the price: exact TreeSHAP (default, "
+                             "slow on the full model) or approx.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    stats = score_file(args.input, args.output, args.chunk_size, args.files_dir, tier=args.tier,
+                       comparables=args.comparables, explain=args.explain)
+    print(f"{stats['rows']:,} rows scored in {stats['seconds']:.2f} s "
+          f"({stats['rows_per_second']:,.0f} rows/s) → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
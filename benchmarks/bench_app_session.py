@@ -0,0 +1,173 @@
+"""
+Benchmark — Streamlit session cost
+==================================
+Drives a real ``streamlit run`` server over its websocket the way a browser
+does and measures, per interaction of a scripted valuation session, the
+bytes the server sends and the server CPU time it spends.
+
+The client mimics the browser where it matters for these numbers: widget
+values inside a ``st.form`` are held until the form is submitted, reruns
+started from inside a fragment carry its id, and large messages already
+received are announced as cached so the server sends a reference instead.
+
+Usage
+-----
+    python -m benchmarks.bench_app_session [--app app.py] [--sessions 3]
+    git show HEAD~1:app.py > /tmp/app_before.py && \\
+        python -m benchmarks.bench_app_session --app /tmp/app_before.py   # compare with an older app
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from websockets.asyncio.client import connect
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+# (step name, widget label, action); actions pick a value from the widget's current proto.
+SCENARIO: list[tuple[str, str | None, str]] = [
+    ("open app",         None,                  "open"),
+    ("start valuation",  "Start Valuation 🚀",  "click"),
+    ("change make",      "Make",                "second option"),
+    ("change model",     "Model",               "second option"),
+    ("change year",      "Year",                "2018"),
+    ("change odometer",  "Odometer (Miles)",    "60000"),
+    ("change colour",    "Exterior Color",      "second option"),
+    ("calculate",        "Calculate Value 💰",  "click"),
+    ("change year",      "Year",                "2019"),
+    ("calculate",        "Calculate Value 💰",  "click"),
+]
+
+
+def _cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat", "r", encoding="utf-8") as fh:
+        fields = fh.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS      # utime + stime
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class BrowserSession:
+    """One websocket session with just enough browser behaviour to drive widgets."""
+
+    def __init__(self, port: int) -> None:
+        self.url = f"ws://127.0.0.1:{port}/_stcore/stream"
+        self.widgets: dict[str, tuple[object, str]] = {}      # label → (element proto, fragment id)
+        self.pending: dict[str, list[WidgetState]] = {}        # form id → values not yet submitted
+        self.cached: set[str] = set()
+        self.page_hash = ""
+        self.conn = None
+
+    async def _rerun(self, states: list[WidgetState], fragment_id: str = "") -> tuple[int, int]:
+        msg = BackMsg()
+        msg.rerun_script.page_script_hash = self.page_hash
+        msg.rerun_script.fragment_id = fragment_id
+        msg.rerun_script.widget_states.widgets.extend(states)
+        msg.rerun_script.cached_message_hashes.extend(sorted(self.cached))
+        await self.conn.send(msg.SerializeToString())
+
+        received, messages = 0, 0
+        while True:
+            raw = await self.conn.recv()
+            received, messages = received + len(raw), messages + 1
+            fwd = ForwardMsg()
+            fwd.ParseFromString(raw)
+            kind = fwd.WhichOneof("type")
+            if fwd.metadata.cacheable and fwd.hash:
+                self.cached.add(fwd.hash)
+            if kind == "new_session":
+                self.page_hash = fwd.new_session.page_script_hash
+            elif kind == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+                element = fwd.delta.new_element
+                widget = getattr(element, element.WhichOneof("type"))
+                if hasattr(widget, "label") and hasattr(widget, "id"):
+                    self.widgets[widget.label] = (widget, fwd.delta.fragment_id)
+            elif kind == "script_finished" and fwd.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return received, messages
+
+    async def open(self) -> tuple[int, int]:
+        self.conn = await connect(self.url, max_size=None)
+        return await self._rerun([])
+
+    async def interact(self, label: str, action: str) -> tuple[int, int]:
+        widget, fragment_id = self.widgets[label]
+        state = WidgetState(id=widget.id)
+        if action == "click":
+            state.trigger_value = True
+        elif action == "second option":
+            state.string_value = widget.options[min(1, len(widget.options) - 1)]
+        else:
+            state.double_value = float(action)
+
+        if widget.form_id and action != "click":
+            self.pending.setdefault(widget.form_id, []).append(state)
+            return 0, 0                                            # held by the browser until submit
+        states = self.pending.pop(widget.form_id, []) + [state] if widget.form_id else [state]
+        return await self._rerun(states, fragment_id)
+
+
+async def run_session(port: int, pid: int) -> list[dict]:
+    session, steps = BrowserSession(port), []
+    for name, label, action in SCENARIO:
+        cpu, wall = _cpu_seconds(pid), time.perf_counter()
+        received, messages = await (session.open() if action == "open" else session.interact(label, action))
+        steps.append({"step": name, "bytes": received, "messages": messages,
+                      "cpu_ms": (_cpu_seconds(pid) - cpu) * 1_000, "wall_ms": (time.perf_counter() - wall) * 1_000})
+    await session.conn.close()
+    return steps
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure bytes sent and server CPU per app interaction.")
+    parser.add_argument("--app", default="app.py", help="Streamlit script to serve (run from the app's directory).")
+    parser.add_argument("--sessions", type=int, default=3, help="Sessions run one after another; medians reported.")
+    args = parser.parse_args(argv)
+
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", args.app, "--server.headless", "true",
+         "--server.port", str(port), "--server.enableXsrfProtection", "false",
+         "--browser.gatherUsageStats", "false"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")]))},
+    )
+    try:
+        for _ in range(300):
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1)
+                break
+            except OSError:
+                time.sleep(0.1)
+        runs = [asyncio.run(run_session(port, server.pid)) for _ in range(args.sessions)]
+    finally:
+        server.terminate()
+        server.wait()
+
+    # The first session pays for imports and artefact loading; later ones show the steady state.
+    steady = runs[1:] or runs
+    print(f"{'step':<18} {'KB sent':>9} {'messages':>9} {'server CPU ms':>14} {'wall ms':>9}")
+    totals = {"bytes": 0.0, "cpu_ms": 0.0}
+    for i, (name, _, _) in enumerate(SCENARIO):
+        row = {key: statistics.median(run[i][key] for run in steady) for key in ("bytes", "messages", "cpu_ms", "wall_ms")}
+        totals["bytes"] += row["bytes"]
+        totals["cpu_ms"] += row["cpu_ms"]
+        print(f"{name:<18} {row['bytes'] / 1e3:>9.1f} {row['messages']:>9.0f} {row['cpu_ms']:>14.0f} {row['wall_ms']:>9.0f}")
+    print(f"{'session total':<18} {totals['bytes'] / 1e3:>9.1f} {'':>9} {totals['cpu_ms']:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
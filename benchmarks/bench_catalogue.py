@@ -0,0 +1,79 @@
+"""
+Benchmark — options.json vs indexed catalogue
+=============================================
+Cold-start time and resident memory of loading the UI options, each measured
+in a fresh interpreter, plus the latency of the make → models → trims/bodies/
+sellers lookups ``render_predict`` performs on every rerun.
+
+Usage
+-----
+    python -m benchmarks.bench_catalogue [--files-dir files] [--catalogue-dir files/catalogue]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+_PROBE = r"""
+import json, os, sys, time
+
+def rss_kib():
+    with open("/proc/self/statm") as fh:
+        return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+mode, path = sys.argv[1], sys.argv[2]
+import numpy  # imported up front so both modes pay for it outside the timed region
+sys.path.insert(0, os.getcwd())
+from catalogue import Catalogue
+
+before = rss_kib()
+started = time.perf_counter()
+if mode == "json":
+    with open(path, "r", encoding="utf-8") as fh:
+        options = json.load(fh)
+else:
+    options = Catalogue(path)
+load_ms = (time.perf_counter() - started) * 1000
+after = rss_kib()
+
+makes = options["makes"]
+started = time.perf_counter()
+for make in makes:
+    for model in options["make_models"].get(make, [])[:3]:
+        options["model_trims"].get(model, ["Standard"])
+        options["model_bodies"].get(model, ["Sedan"])
+    options["make_sellers"].get(make, ["Other"])
+lookup_us = (time.perf_counter() - started) * 1e6 / len(makes)
+
+print(json.dumps({"load_ms": load_ms, "rss_delta_kib": after - before, "lookup_us_per_make": lookup_us}))
+"""
+
+
+def _probe(mode: str, path: str, repeats: int) -> dict:
+    runs = [
+        json.loads(subprocess.run([sys.executable, "-c", _PROBE, mode, path],
+                                  check=True, capture_output=True, text=True).stdout)
+        for _ in range(repeats)
+    ]
+    return {key: min(run[key] for run in runs) for key in runs[0]}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Compare options.json against the indexed catalogue.")
+    parser.add_argument("--files-dir", default="files")
+    parser.add_argument("--catalogue-dir", default="files/catalogue")
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh interpreters per mode (best is kept).")
+    args = parser.parse_args(argv)
+
+    results = {
+        "json": _probe("json", f"{args.files_dir}/options.json", args.repeats),
+        "catalogue": _probe("catalogue", args.catalogue_dir, args.repeats),
+    }
+    print(f"{'':<10} {'load (ms)':>10} {'RSS Δ (KiB)':>12} {'lookup/make (µs)':>17}")
+    for mode, r in results.items():
+        print(f"{mode:<10} {r['load_ms']:>10.2f} {r['rss_delta_kib']:>12,} {r['lookup_us_per_make']:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark — comparable-sales search
+===================================
+Per-vehicle latency of finding the nearest historical sales:
+
+- brute force over every training row, as ``KNeighborsRegressor`` does;
+- brute force over the make/model partition only;
+- ``ComparablesIndex.neighbours`` — first query of each partition (KD-tree
+  built for large ones) and warm;
+- ``ComparablesIndex.query`` — warm search plus assembling the result rows;
+
+and rows/s of ``query_frame`` over a batch.  Also checks that the index
+returns the same neighbours as brute force over the partition.
+
+Usage
+-----
+    python -m benchmarks.bench_comparables [--files-dir files] [--queries 300] [--k 5]
+"""
+
+import argparse
+import statistics
+import time
+
+import joblib
+import numpy as np
+import sklearn.neighbors  # noqa: F401 — imported here so the first-query timings exclude it
+
+from comparables import ComparablesIndex, INDEX_DIR, SEARCH_POSITIONS, load_comparables
+from compiled_transform import CompiledTransform
+from inference import FEATURE_COLUMNS, FILES_DIR
+
+SEED = 7
+
+
+def _per_query_ms(fn, queries: list) -> tuple[float, float]:
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1_000, float(np.percentile(timings, 95)) * 1_000
+
+
+def _brute(features: np.ndarray, start: int, vector: np.ndarray, k: int) -> np.ndarray:
+    distances = ((features - vector) ** 2).sum(axis=1)
+    nearest = np.argpartition(distances, k - 1)[:k]
+    return start + nearest[np.argsort(distances[nearest])]
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure comparable-sales search against brute force.")
+    parser.add_argument("--files-dir", default=FILES_DIR)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    index = load_comparables(args.files_dir)
+    if index is None:
+        raise SystemExit(f"No comparables index in '{args.files_dir}'; run train_pipeline.py first.")
+    transform = CompiledTransform.from_artefacts(joblib.load(f"{args.files_dir}/target_encoder.joblib"),
+                                                 joblib.load(f"{args.files_dir}/scaler.joblib"))
+
+    # Queries are training sales with the mileage moved by up to ±10%, so none is an exact hit.
+    rng = np.random.default_rng(SEED)
+    sample = index.sales.iloc[rng.choice(len(index), args.queries, replace=False)][FEATURE_COLUMNS].copy()
+    sample["odometer"] = sample["odometer"] * rng.uniform(0.9, 1.1, len(sample))
+    records = [{col: (value.item() if hasattr(value, "item") else value) for col, value in row.items()}
+               for row in sample.to_dict("records")]
+    scaled = transform.transform(sample)
+    queries = [(record, scaled[i], index.partition(record["make"], record["model"], args.k))
+               for i, record in enumerate(records)]
+    features = np.asarray(index.features)
+    sizes = [bounds[1] - bounds[0] for _, _, bounds in queries]
+    print(f"{len(index):,} sales, {args.queries} queries, k={args.k}, "
+          f"median partition {statistics.median(sizes):,.0f} rows")
+
+    all_rows = _per_query_ms(lambda q: _brute(features, 0, q[1][SEARCH_POSITIONS], args.k), queries)
+    partition = _per_query_ms(
+        lambda q: _brute(features[q[2][0]:q[2][1]], q[2][0], q[1][SEARCH_POSITIONS], args.k), queries)
+    fresh = ComparablesIndex(f"{args.files_dir}/{INDEX_DIR}")
+    cold = _per_query_ms(lambda q: fresh.neighbours(q[2], q[1], args.k), queries)
+    warm = _per_query_ms(lambda q: fresh.neighbours(q[2], q[1], args.k), queries)
+    full = _per_query_ms(lambda q: fresh.query(q[0], q[1], args.k), queries)
+
+    mismatches = sum(
+        not np.array_equal(np.sort(fresh.neighbours(bounds, vector, args.k)[1][0]),
+                           np.sort(_brute(features[bounds[0]:bounds[1]], bounds[0], vector[SEARCH_POSITIONS], args.k)))
+        for _, vector, bounds in queries
+    )
+
+    print(f"{'search':<28} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, (p50, p95) in [("brute force, all sales", all_rows), ("brute force, partition", partition),
+                             ("index, first query", cold), ("index, warm", warm),
+                             ("query() with result rows", full)]:
+        print(f"{name:<28} {p50:>8.3f} {p95:>8.3f}")
+    print(f"index vs. brute force over the partition: {mismatches} of {len(queries)} neighbour sets differ")
+
+    batch = sample.sample(10_000, replace=True, random_state=SEED)
+    batch_scaled = transform.transform(batch)
+    started = time.perf_counter()
+    fresh.query_frame(batch, batch_scaled, args.k)
+    print(f"query_frame: {len(batch) / (time.perf_counter() - started):,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark — input drift monitor
+===============================
+What watching live inputs for drift costs, and whether it notices drift:
+
+- ``DriftMonitor.observe`` per record against a single-row predict, and
+  ``observe_records`` / ``observe_frame`` throughput;
+- the counters held, before and after a stream of a million distinct
+  unseen values (the unseen-value sketch stays at ``SKETCH_SIZE`` entries);
+- the PSI for held-out sales as they are, and with one kind of drift
+  applied: ``condition`` on a 1–5 scale instead of the training data's,
+  cars three years newer, 5% of makes never seen in training.
+
+Traffic is drawn from the training pipeline's test split of ``--data``, i.e.
+sales from the same period the model was trained on, so it should read as
+stable.  The artefacts need a ``drift_reference.json``.
+
+Usage
+-----
+    python -m benchmarks.bench_drift --data car_prices.csv [--files-dir files] [--rows 100000]
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from drift import MIN_ROWS, DriftMonitor, format_report
+from inference import FEATURE_COLUMNS, FILES_DIR, predict_records
+from registry import load_version
+from train_pipeline import RAW_CSV, SPLIT_SEED, TRAIN_SIZE, clean_frame, read_raw
+
+SEED = 7
+BATCH = 256
+
+
+def _records(frame) -> list[dict]:
+    return [{col: (value.item() if hasattr(value, "item") else value) for col, value in row.items()}
+            for row in frame.to_dict("records")]
+
+
+def _counters(monitor: DriftMonitor) -> int:
+    return sum(len(bins) for bins in monitor._current.values()) * 2 + sum(
+        len(sketch.counters) for sketch in monitor.unseen.values())
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure the cost and sensitivity of the input drift monitor.")
+    parser.add_argument("--data", default=RAW_CSV, help="The CSV the artefacts were trained on.")
+    parser.add_argument("--files-dir", default=FILES_DIR)
+    parser.add_argument("--rows", type=int, default=100_000, help="Rows observed per throughput run.")
+    parser.add_argument("--predictions", type=int, default=3_000, help="Records timed one at a time.")
+    args = parser.parse_args(argv)
+
+    from sklearn.model_selection import train_test_split
+
+    loaded = load_version("benchmark", args.files_dir)
+    if loaded is None or loaded.drift_reference is None:
+        raise SystemExit("The benchmark needs artefacts with a drift_reference.json "
+                         "(python drift.py reference car_prices.csv --out <files-dir>).")
+    _, test = train_test_split(clean_frame(read_raw(args.data)), train_size=TRAIN_SIZE, random_state=SPLIT_SEED)
+    rng = np.random.default_rng(SEED)
+    frame = test[FEATURE_COLUMNS].iloc[rng.integers(0, len(test), args.rows)].reset_index(drop=True)
+    records = _records(frame.head(args.predictions))
+
+    # Per-record cost next to the prediction it rides along with.
+    monitor = DriftMonitor(loaded.transform, loaded.drift_reference)
+    observe, predict = [], []
+    for record in records:
+        started = time.perf_counter()
+        monitor.observe(record)
+        observe.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        predict_records(loaded.ml_model, loaded.transform, [record])
+        predict.append(time.perf_counter() - started)
+    print(f"{'per record':<28} {'mean µs':>8} {'p50 µs':>8} {'p99 µs':>8}")
+    for name, timings in [("DriftMonitor.observe", observe), ("predict_records, 1 row", predict)]:
+        print(f"{name:<28} {statistics.mean(timings) * 1e6:>8.2f} {statistics.median(timings) * 1e6:>8.2f} "
+              f"{np.percentile(timings, 99) * 1e6:>8.2f}")
+    print(f"observing adds {statistics.mean(observe) / statistics.mean(predict):.1%} to a single-row predict")
+
+    all_records = _records(frame)
+    monitor = DriftMonitor(loaded.transform, loaded.drift_reference)
+    started = time.perf_counter()
+    for i in range(0, len(all_records), BATCH):
+        monitor.observe_records(all_records[i:i + BATCH])
+    batched = time.perf_counter() - started
+    monitor = DriftMonitor(loaded.transform, loaded.drift_reference)
+    started = time.perf_counter()
+    monitor.observe_frame(frame)
+    vectorised = time.perf_counter() - started
+    print(f"\nobserve_records, batches of {BATCH}: {len(frame) / batched:>12,.0f} rows/s")
+    print(f"observe_frame:                  {len(frame) / vectorised:>12,.0f} rows/s")
+
+    # Memory does not grow with traffic, however many distinct unseen values arrive.
+    before = _counters(monitor)
+    for i in range(1_000_000):
+        monitor.unseen["seller"].add(f"New Dealer {i}")
+    print(f"\ncounters held: {before:,} → {_counters(monitor):,} after 1,000,000 distinct unseen sellers")
+
+    # Sensitivity: held-out sales as they are, then with one kind of drift each.
+    scenarios = {
+        "no drift": frame,
+        "condition on a 1–5 scale": frame.assign(condition=(frame["condition"] / 10).clip(1, 5)),
+        "cars 3 years newer": frame.assign(car_age=(frame["car_age"] - 3).clip(lower=0)),
+        "5% unseen makes": frame.assign(make=frame["make"].astype(object).where(
+            rng.random(len(frame)) > 0.05, "Rivian")),
+    }
+    print(f"\n{'scenario':<28} {'max PSI':>8}  drifted columns (PSI > 0.25)")
+    for name, traffic in scenarios.items():
+        monitor = DriftMonitor(loaded.transform, loaded.drift_reference)
+        monitor.observe_frame(traffic)
+        report = monitor.report()
+        print(f"{name:<28} {report['max_psi']:>8.3f}  {', '.join(report['drifted']) or '—'}")
+    print(f"\n(PSI needs at least {MIN_ROWS:,} observations.) Last scenario in full:\n{format_report(report)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark — per-field price attribution
+=======================================
+Cost of explaining a valuation compared with computing it, for every serving
+tier and batch size:
+
+- predict        the price alone;
+- exact          XGBoost TreeSHAP (``pred_contribs``) — what the app shows;
+- approx         ``approx_contribs`` (Saabas) — ``batch_score.py --explain approx``.
+
+Reports milliseconds per row and the largest gap between a contribution row's
+sum and the predicted price.
+
+Usage
+-----
+    python -m benchmarks.bench_explain [--files-dir files] [--batch-sizes 1 100 2000] [--repeats 5]
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+import joblib
+import numpy as np
+
+from compiled_transform import CompiledTransform, sample_frame
+from inference import FILES_DIR, feature_contributions
+from tiers import available_tiers, load_tiers, tier_model
+
+SEED = 7
+
+
+def _ms_per_row(fn, x: np.ndarray, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn(x)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1_000 / len(x)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure explanation cost against plain prediction.")
+    parser.add_argument("--files-dir", default=FILES_DIR)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 2_000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    with open(f"{args.files_dir}/options.json", "r", encoding="utf-8") as fh:
+        options = json.load(fh)
+    transform = CompiledTransform.from_artefacts(joblib.load(f"{args.files_dir}/target_encoder.joblib"),
+                                                 joblib.load(f"{args.files_dir}/scaler.joblib"))
+    ml_model = joblib.load(f"{args.files_dir}/xgb_model.joblib")
+    tiers = load_tiers(args.files_dir, ml_model)
+    x_all = transform.transform(sample_frame(options, max(args.batch_sizes), seed=SEED))
+
+    print(f"{'tier':<10} {'rows':>6} {'predict ms/row':>15} {'exact ms/row':>13} {'approx ms/row':>14} "
+          f"{'max |sum − price|':>18}")
+    for tier in available_tiers(tiers):
+        model = tier_model(ml_model, tier, tiers)
+        for rows in args.batch_sizes:
+            x = x_all[:rows]
+            predict = _ms_per_row(model.predict, x, args.repeats)
+            exact = _ms_per_row(lambda batch: feature_contributions(model, batch), x, args.repeats)
+            approx = _ms_per_row(lambda batch: feature_contributions(model, batch, approximate=True), x, args.repeats)
+            gap = np.abs(feature_contributions(model, x).sum(axis=1) - model.predict(x)).max()
+            print(f"{tier:<10} {rows:>6,} {predict:>15.3f} {exact:>13.3f} {approx:>14.3f} {gap:>18.3f}")
+
+
+if __name__ == "__main__":
+    main()
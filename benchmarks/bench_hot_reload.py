@@ -0,0 +1,152 @@
+"""
+Benchmark — model hot-reload under load
+=======================================
+Client threads score single valuations continuously through a
+``ModelWatcher`` while a second version is activated and then rolled back.
+
+The second version is the first with its model cut to half the trees, so the
+two give different prices.  Every response is checked against the price its
+version gives on its own; a request that mixed two versions' artefacts would
+not match.  Reports:
+
+- request latency before, during and after the swap, and failed requests;
+- seconds from ``activate`` until the new version is served (load, warm-up,
+  canary validation) — the app keeps answering on the old version meanwhile;
+- seconds to roll back to the still-loaded previous version;
+- for comparison, the cold load a restart would wait for with no model at all.
+
+Usage
+-----
+    python -m benchmarks.bench_hot_reload [--files-dir files] [--clients 4] [--seconds 3]
+"""
+
+import argparse
+import copy
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import joblib
+import numpy as np
+
+from comparables import load_comparables
+from inference import FEATURE_COLUMNS, FILES_DIR, predict_records
+from registry import ModelRegistry, ModelWatcher
+from startup import load_and_warm
+
+POLL_SECONDS = 0.05
+
+
+def _half_trees_copy(files_dir: str, out_dir: str) -> None:
+    """``files_dir`` with the booster cut to its first half of trees."""
+    shutil.copytree(files_dir, out_dir)
+    ml_model = joblib.load(f"{files_dir}/xgb_model.joblib")
+    booster = ml_model.get_booster()
+    trimmed = copy.copy(ml_model)
+    trimmed._Booster = booster[:max(1, booster.num_boosted_rounds() // 2)]
+    joblib.dump(trimmed, f"{out_dir}/xgb_model.joblib")
+
+
+def _wait_for(watcher: ModelWatcher, version: str) -> float:
+    started = time.perf_counter()
+    while (watcher.current() is None or watcher.current().version != version):
+        time.sleep(0.005)
+    return time.perf_counter() - started
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure serving while a new model version is swapped in.")
+    parser.add_argument("--files-dir", default=FILES_DIR)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=3.0, help="Steady-state time before and after each switch.")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="hot-reload-")
+    try:
+        registry = ModelRegistry(f"{workdir}/registry")
+        old = registry.publish(args.files_dir)
+        _half_trees_copy(args.files_dir, f"{workdir}/half")
+        new = registry.publish(f"{workdir}/half")
+        registry.activate(old)
+        comparables = load_comparables(args.files_dir)
+        if comparables is not None:
+            registry.write_canary(comparables.sales)
+
+        started = time.perf_counter()
+        cold = load_and_warm(registry.path(old))
+        restart_seconds = time.perf_counter() - started
+        records = comparables.sales[FEATURE_COLUMNS].head(50).to_dict("records") if comparables else []
+        if not records:
+            raise SystemExit("The benchmark needs a comparables index to draw vehicles from.")
+        records = [{col: (value.item() if hasattr(value, "item") else value) for col, value in record.items()}
+                   for record in records]
+
+        # Unlimited tolerance: the half-tree model is worse on purpose; validation still runs.
+        watcher = ModelWatcher(registry.root, interval=POLL_SECONDS, tolerance=float("inf")).start()
+        watcher.wait()
+        reference = {old: predict_records(cold[0], cold[1], records)}
+        half = load_and_warm(registry.path(new))
+        reference[new] = predict_records(half[0], half[1], records)
+        del cold, half
+
+        log: list[tuple[float, float, bool]] = []        # (finished at, latency, consistent)
+        errors = [0]
+        stop = threading.Event()
+
+        def _client(i: int) -> None:
+            n = i
+            while not stop.is_set():
+                loaded = watcher.current()
+                began = time.perf_counter()
+                try:
+                    price = predict_records(loaded.ml_model, loaded.transform, [records[n % len(records)]])[0]
+                except Exception:  # noqa: BLE001
+                    errors[0] += 1
+                    continue
+                done = time.perf_counter()
+                log.append((done, done - began, abs(price - reference[loaded.version][n % len(records)]) < 0.01))
+                n += args.clients
+
+        threads = [threading.Thread(target=_client, args=(i,), daemon=True) for i in range(args.clients)]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+
+        swap_started = time.perf_counter()
+        registry.activate(new)
+        swap_seconds = _wait_for(watcher, new)
+        swap_finished = time.perf_counter()
+        time.sleep(args.seconds)
+        registry.rollback()
+        rollback_seconds = _wait_for(watcher, old)
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        watcher.stop()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    finished = np.array([entry[0] for entry in log])
+    latency = np.array([entry[1] for entry in log]) * 1_000
+    phases = {
+        "before the swap": finished < swap_started,
+        "while loading": (finished >= swap_started) & (finished < swap_finished),
+        "after the swap": finished >= swap_finished,
+    }
+    print(f"{os.cpu_count()} cores, {args.clients} clients, {len(log):,} requests, "
+          f"{errors[0]} failed, {sum(not entry[2] for entry in log)} inconsistent")
+    print(f"{'phase':<17} {'requests':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, mask in phases.items():
+        if mask.any():
+            p50, p99 = np.percentile(latency[mask], [50, 99])
+            print(f"{name:<17} {mask.sum():>9,} {p50:>8.2f} {p99:>8.2f} {latency[mask].max():>8.2f}")
+    print(f"\nactivate → serving new version: {swap_seconds:.2f} s (old version answered meanwhile)")
+    print(f"rollback → serving previous:    {rollback_seconds * 1_000:.0f} ms (kept loaded)")
+    print(f"restart instead: {restart_seconds:.2f} s with no model loaded")
+
+
+if __name__ == "__main__":
+    main()
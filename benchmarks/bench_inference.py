@@ -0,0 +1,171 @@
+"""
+Benchmark — per-stage inference latency
+=======================================
+Times each stage of the prediction path separately across batch sizes:
+
+    frame      building the input DataFrame (as ``render_predict`` used to)
+    encode     ``encoder.transform``
+    scale      ``scaler.transform``
+    compiled   ``CompiledTransform.transform`` (replaces encode + scale)
+    predict    ``ml_model.predict``
+
+Inputs are synthetic rows sampled from ``options.json``.  When
+``xgb_model.joblib`` is absent a small stand-in XGBoost model is trained so
+the suite still runs; the results record which model was used.
+
+Results are written as JSON.  ``--compare`` checks a run against a baseline
+file and exits non-zero when any stage's latency or throughput regresses by
+more than ``--threshold``.
+
+Usage
+-----
+    python -m benchmarks.bench_inference --out bench.json
+    python -m benchmarks.bench_inference --out new.json --compare bench.json --threshold 0.15
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from compiled_transform import CompiledTransform, sample_frame
+from inference import FEATURE_COLUMNS, FILES_DIR
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+BATCH_SIZES: list[int] = [1, 10, 100, 1_000, 10_000, 100_000, 1_000_000]
+STAGES: list[str] = ["frame", "encode", "scale", "compiled", "predict"]
+FORMAT_VERSION = 1
+
+
+def _stand_in_model(scaled: np.ndarray):
+    """Small XGBoost model on synthetic targets, used when the real model is absent."""
+    from xgboost import XGBRegressor
+
+    rng = np.random.default_rng(7)
+    target = 13_600 + scaled @ rng.normal(0, 2_000, scaled.shape[1]) + rng.normal(0, 500, len(scaled))
+    return XGBRegressor(n_estimators=100, max_depth=6, random_state=7).fit(scaled, target)
+
+
+def _time(fn, repeats: int) -> tuple[float, object]:
+    """Median wall time of ``fn`` over ``repeats`` calls, plus its last result."""
+    samples, result = [], None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), result
+
+
+def _repeats_for(batch_size: int, requested: int) -> int:
+    # Keep the very large batches to a single pass so the suite stays minutes, not hours.
+    return requested if batch_size <= 10_000 else max(1, requested // 5)
+
+
+def run(files_dir: str, batch_sizes: list[int], repeats: int) -> dict:
+    encoder = joblib.load(f"{files_dir}/target_encoder.joblib")
+    scaler = joblib.load(f"{files_dir}/scaler.joblib")
+    with open(f"{files_dir}/options.json", "r", encoding="utf-8") as fh:
+        options = json.load(fh)
+    transform = CompiledTransform.from_artefacts(encoder, scaler)
+
+    pool = sample_frame(options, max(batch_sizes))
+    model_path = f"{files_dir}/xgb_model.joblib"
+    if os.path.exists(model_path):
+        ml_model, model_name = joblib.load(model_path), "xgb_model.joblib"
+    else:
+        ml_model = _stand_in_model(transform.transform(pool.head(20_000)))
+        model_name = "stand-in (100 trees, depth 6)"
+
+    results = []
+    for batch_size in batch_sizes:
+        columns = {col: pool[col].iloc[:batch_size].tolist() for col in FEATURE_COLUMNS}
+        n = _repeats_for(batch_size, repeats)
+
+        timings = {}
+        timings["frame"], frame = _time(lambda: pd.DataFrame(columns), n)
+        timings["encode"], encoded = _time(lambda: encoder.transform(frame), n)
+        timings["scale"], scaled = _time(lambda: scaler.transform(encoded), n)
+        timings["compiled"], compiled = _time(lambda: transform.transform(frame), n)
+        timings["predict"], _ = _time(lambda: ml_model.predict(compiled), n)
+
+        for stage in STAGES:
+            seconds = timings[stage]
+            results.append({
+                "stage": stage,
+                "batch_size": batch_size,
+                "repeats": n,
+                "latency_ms": round(seconds * 1_000, 4),
+                "rows_per_second": round(batch_size / seconds, 1) if seconds else None,
+            })
+            print(f"{stage:<9} {batch_size:>9,} rows  {seconds * 1_000:>11.3f} ms  "
+                  f"{batch_size / seconds if seconds else float('inf'):>14,.0f} rows/s", flush=True)
+
+    return {
+        "format_version": FORMAT_VERSION,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "model": model_name,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """Human-readable regressions of ``current`` against ``baseline``."""
+    reference = {(r["stage"], r["batch_size"]): r for r in baseline["results"]}
+    regressions = []
+    for row in current["results"]:
+        base = reference.get((row["stage"], row["batch_size"]))
+        if base is None or not base["latency_ms"]:
+            continue
+        change = row["latency_ms"] / base["latency_ms"] - 1
+        if change > threshold:
+            regressions.append(
+                f"{row['stage']} @ {row['batch_size']:,} rows: {base['latency_ms']:.3f} → "
+                f"{row['latency_ms']:.3f} ms (+{change:.0%}, throughput "
+                f"{base['rows_per_second']:,.0f} → {row['rows_per_second']:,.0f} rows/s)"
+            )
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Per-stage inference latency benchmark.")
+    parser.add_argument("--files-dir", default=FILES_DIR)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=BATCH_SIZES)
+    parser.add_argument("--repeats", type=int, default=5, help="Timed calls per stage (median is kept).")
+    parser.add_argument("--out", default="bench_inference.json", help="Where to write the results.")
+    parser.add_argument("--compare", metavar="BASELINE", help="Baseline results to check against.")
+    parser.add_argument("--threshold", type=float, default=0.20,
+                        help="Allowed relative latency increase before failing (default 0.20).")
+    args = parser.parse_args(argv)
+
+    current = run(args.files_dir, sorted(args.batch_sizes), args.repeats)
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(current, fh, indent=2)
+    print(f"Results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark — shared inference pool under concurrent sessions
+===========================================================
+Simulated app sessions, each pressing "Calculate Value" in a loop (one
+prediction plus the what-if grid), run against:
+
+- inline       every session scores on its own thread with XGBoost's default
+               thread count — what the app did before the pool;
+- pool, N      sessions submit to an ``InferencePool`` of N workers with the
+               model pinned to cores / N threads, for N = 1, 2, 4 … cores.
+
+Reports valuations per second, speed-up over one worker and p50/p95 latency,
+then overloads a pool with a short queue to show the share of requests
+answered "busy" and the latency of the ones that were accepted.
+
+Usage
+-----
+    python -m benchmarks.bench_inference_pool [--files-dir files] [--seconds 5] [--sessions-per-worker 4]
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+
+import joblib
+import numpy as np
+
+from benchmarks.bench_inference import _stand_in_model
+from compiled_transform import CompiledTransform, sample_frame
+from inference import FILES_DIR, predict_records, predict_scenarios, scenario_grid, what_if_axes
+from inference_pool import InferencePool, ServiceBusy, available_cores, pin_threads
+
+BUSY_RETRY_SECONDS = 0.05   # a session told "busy" presses Calculate again after this long
+
+
+def _valuation(ml_model, transform, record: dict) -> None:
+    """What the app computes for one press of "Calculate Value"."""
+    predict_records(ml_model, transform, [record])
+    predict_scenarios(ml_model, transform, record, scenario_grid(what_if_axes(record)))
+
+
+def _drive(sessions: int, seconds: float, records: list[dict], press) -> dict:
+    """Run ``sessions`` threads calling ``press(record)`` until ``seconds`` elapse."""
+    latencies: list[list[float]] = [[] for _ in range(sessions)]
+    busy = [0] * sessions
+    deadline = time.perf_counter() + seconds
+
+    def _session(i: int) -> None:
+        n = i
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                press(records[n % len(records)])
+            except ServiceBusy:
+                busy[i] += 1
+                time.sleep(BUSY_RETRY_SECONDS)
+                continue
+            latencies[i].append(time.perf_counter() - started)
+            n += sessions
+
+    threads = [threading.Thread(target=_session, args=(i,)) for i in range(sessions)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    done = np.array([x for per_session in latencies for x in per_session]) * 1_000
+    p50, p95 = np.percentile(done, [50, 95]) if done.size else (float("nan"), float("nan"))
+    return {"per_s": done.size / elapsed, "p50_ms": p50, "p95_ms": p95,
+            "busy_share": sum(busy) / max(1, sum(busy) + done.size)}
+
+
+def _worker_counts(cores: int) -> list[int]:
+    counts, n = [], 1
+    while n < cores:
+        counts.append(n)
+        n *= 2
+    return counts + [cores]
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure valuation throughput against inference pool size.")
+    parser.add_argument("--files-dir", default=FILES_DIR)
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each run.")
+    parser.add_argument("--sessions-per-worker", type=int, default=4,
+                        help="Concurrent sessions per worker (and per core for the inline run).")
+    args = parser.parse_args(argv)
+
+    encoder = joblib.load(f"{args.files_dir}/target_encoder.joblib")
+    scaler = joblib.load(f"{args.files_dir}/scaler.joblib")
+    with open(f"{args.files_dir}/options.json", "r", encoding="utf-8") as fh:
+        options = json.load(fh)
+    transform = CompiledTransform.from_artefacts(encoder, scaler)
+    frame = sample_frame(options, 2_000)
+    model_path = f"{args.files_dir}/xgb_model.joblib"
+    ml_model = (joblib.load(model_path) if os.path.exists(model_path)
+                else _stand_in_model(transform.transform(frame)))
+    records = frame.to_dict("records")
+
+    cores = available_cores()
+    print(f"{cores} cores, {args.sessions_per_worker} sessions per worker, {args.seconds:.0f} s per run")
+    print(f"{'mode':<16} {'sessions':>9} {'valuations/s':>13} {'speed-up':>9} {'p50 ms':>8} {'p95 ms':>8}")
+
+    pin_threads(ml_model, None)                                 # XGBoost default: every core per call
+    inline = _drive(args.sessions_per_worker * cores, args.seconds, records,
+                    lambda record: _valuation(ml_model, transform, record))
+    print(f"{'inline':<16} {args.sessions_per_worker * cores:>9} {inline['per_s']:>13.1f} {'':>9} "
+          f"{inline['p50_ms']:>8.1f} {inline['p95_ms']:>8.1f}")
+
+    single = None
+    for workers in _worker_counts(cores):
+        pool = InferencePool(ml_model, workers=workers, max_queue=args.sessions_per_worker * workers)
+        result = _drive(args.sessions_per_worker * workers, args.seconds, records,
+                        lambda record: pool.run(_valuation, ml_model, transform, record))
+        pool.close()
+        single = single or result["per_s"]
+        print(f"{f'pool, {workers} workers':<16} {args.sessions_per_worker * workers:>9} {result['per_s']:>13.1f} "
+              f"{result['per_s'] / single:>8.2f}× {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f}")
+
+    # Four times more sessions than the queue holds: the excess is told "busy"
+    # instead of queueing, so accepted requests keep a bounded latency.
+    pool = InferencePool(ml_model, workers=cores, max_queue=args.sessions_per_worker * cores)
+    overload = _drive(4 * args.sessions_per_worker * cores, args.seconds, records,
+                      lambda record: pool.run(_valuation, ml_model, transform, record))
+    pool.close()
+    print(f"\noverload ({4 * args.sessions_per_worker * cores} sessions, queue {args.sessions_per_worker * cores}): "
+          f"{overload['per_s']:.1f} valuations/s, {overload['busy_share']:.0%} answered busy, "
+          f"accepted p50 {overload['p50_ms']:.1f} ms / p95 {overload['p95_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark — instrumentation overhead
+====================================
+Cost of the metrics recorded on the prediction path: a single histogram
+observation, the ``time()`` context manager, a counter increment, the same
+under thread contention, and a single-row ``predict_records`` call with and
+without instrumentation.
+
+Usage
+-----
+    python -m benchmarks.bench_metrics [--files-dir files] [--iterations 200000]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+
+import joblib
+
+from benchmarks.bench_inference import _stand_in_model
+from compiled_transform import CompiledTransform, sample_frame
+from inference import FILES_DIR, predict_records
+from metrics import Counter, Histogram, Registry
+
+
+def _per_call_ns(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) * 1e9 / iterations
+
+
+def _contended_ns(fn, iterations: int, threads: int) -> float:
+    per_thread = iterations // threads
+
+    def _work() -> None:
+        for _ in range(per_thread):
+            fn()
+
+    workers = [threading.Thread(target=_work) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - started) * 1e9 / (per_thread * threads)
+
+
+def _timed_block(histogram: Histogram) -> None:
+    with histogram.time("predict"):
+        pass
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure the overhead of the prediction metrics.")
+    parser.add_argument("--files-dir", default=FILES_DIR)
+    parser.add_argument("--iterations", type=int, default=200_000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    registry = Registry()
+    histogram = Histogram("bench_seconds", "Benchmark histogram.", ("stage",), registry=registry)
+    counter = Counter("bench_total", "Benchmark counter.", ("path",), registry=registry)
+
+    print(f"histogram.observe        {_per_call_ns(lambda: histogram.observe(0.003, 'predict'), args.iterations):>8.0f} ns")
+    print(f"histogram.time() block   {_per_call_ns(lambda: _timed_block(histogram), args.iterations):>8.0f} ns")
+    print(f"counter.inc              {_per_call_ns(lambda: counter.inc(1, 'records'), args.iterations):>8.0f} ns")
+    print(f"observe, {args.threads} threads       "
+          f"{_contended_ns(lambda: histogram.observe(0.003, 'predict'), args.iterations, args.threads):>8.0f} ns")
+    started = time.perf_counter()
+    registry.render()
+    print(f"render                   {(time.perf_counter() - started) * 1e6:>8.0f} µs")
+
+    # End to end: one interactive prediction, raw vs instrumented.
+    encoder = joblib.load(f"{args.files_dir}/target_encoder.joblib")
+    scaler = joblib.load(f"{args.files_dir}/scaler.joblib")
+    with open(f"{args.files_dir}/options.json", "r", encoding="utf-8") as fh:
+        options = json.load(fh)
+    transform = CompiledTransform.from_artefacts(encoder, scaler)
+    pool = sample_frame(options, 5_000)
+    model_path = f"{args.files_dir}/xgb_model.joblib"
+    ml_model = (joblib.load(model_path) if os.path.exists(model_path)
+                else _stand_in_model(transform.transform(pool)))
+    records = pool.head(1).to_dict("records")
+
+    def _raw() -> None:
+        ml_model.predict(transform.transform_records(records))
+
+    def _instrumented() -> None:
+        predict_records(ml_model, transform, records)
+
+    raw, instrumented = [], []
+    for _ in range(7):
+        raw.append(_per_call_ns(_raw, 500))
+        instrumented.append(_per_call_ns(_instrumented, 500))
+    raw_us, inst_us = statistics.median(raw) / 1_000, statistics.median(instrumented) / 1_000
+    print(f"predict_records (1 row)  raw {raw_us:.1f} µs, instrumented {inst_us:.1f} µs "
+          f"({(inst_us / raw_us - 1):+.1%})")
+
+
+if __name__ == "__main__":
+    main()
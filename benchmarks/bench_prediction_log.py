@@ -0,0 +1,140 @@
+"""
+Benchmark — prediction log
+==========================
+What logging costs a request, and how fast the log can be written and
+replayed:
+
+- caller-side cost of ``PredictionLog.log`` against writing each entry
+  synchronously (encode, write, flush) on the request thread;
+- single-row predict latency with no log, with the buffered log, and with
+  the synchronous write;
+- writer throughput and bytes per entry, plain and gzip at levels 1 and 6;
+- ``replay.py`` rows/s over the written log.
+
+Usage
+-----
+    python -m benchmarks.bench_prediction_log [--files-dir files] [--entries 200000]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+import joblib
+import numpy as np
+
+import prediction_log
+from compiled_transform import CompiledTransform, sample_frame
+from inference import FILES_DIR, predict_records
+from prediction_log import PredictionLog
+from registry import load_version
+from replay import replay
+
+SEED = 7
+VERSION = "benchmark"
+STAGES = {"transform": 0.00004, "predict": 0.0004, "total": 0.0011}
+
+
+def _percentiles_us(timings: list[float]) -> tuple[float, float, float]:
+    return statistics.mean(timings) * 1e6, statistics.median(timings) * 1e6, float(np.percentile(timings, 99)) * 1e6
+
+
+def _sync_writer(path: str):
+    fh = open(path, "ab")
+
+    def _write(record: dict, price: float) -> None:
+        fh.write((json.dumps({"ts": time.time(), "version": VERSION, "path": "bench", "tier": "full",
+                              "input": record, "price": price, "stages_ms": STAGES},
+                             separators=(",", ":")) + "\n").encode("utf-8"))
+        fh.flush()
+
+    return _write, fh
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure prediction log overhead and throughput.")
+    parser.add_argument("--files-dir", default=FILES_DIR)
+    parser.add_argument("--entries", type=int, default=200_000, help="Entries written per writer run.")
+    parser.add_argument("--predictions", type=int, default=3_000, help="Predictions timed per mode.")
+    args = parser.parse_args(argv)
+
+    with open(f"{args.files_dir}/options.json", "r", encoding="utf-8") as fh:
+        options = json.load(fh)
+    transform = CompiledTransform.from_artefacts(joblib.load(f"{args.files_dir}/target_encoder.joblib"),
+                                                 joblib.load(f"{args.files_dir}/scaler.joblib"))
+    ml_model = joblib.load(f"{args.files_dir}/xgb_model.joblib")
+    frame = sample_frame(options, 10_000, seed=SEED)
+    records = [{col: (value.item() if hasattr(value, "item") else value) for col, value in row.items()}
+               for row in frame.to_dict("records")]
+    prices = ml_model.predict(transform.transform(frame)).tolist()
+    workdir = tempfile.mkdtemp(prefix="prediction-log-")
+    try:
+        # Caller-side cost of one entry.
+        log = PredictionLog(f"{workdir}/calls")
+        buffered = []
+        for i in range(args.predictions * 10):
+            started = time.perf_counter()
+            log.log(records[i % len(records)], prices[i % len(prices)], VERSION, "full", "bench", STAGES)
+            buffered.append(time.perf_counter() - started)
+        log.close()
+        write, fh = _sync_writer(f"{workdir}/sync.jsonl")
+        sync = []
+        for i in range(args.predictions * 10):
+            started = time.perf_counter()
+            write(records[i % len(records)], prices[i % len(prices)])
+            sync.append(time.perf_counter() - started)
+        fh.close()
+        print(f"{'caller cost per entry':<32} {'mean µs':>8} {'p50 µs':>8} {'p99 µs':>8}")
+        for name, timings in [("PredictionLog.log", buffered), ("synchronous write + flush", sync)]:
+            mean, p50, p99 = _percentiles_us(timings)
+            print(f"{name:<32} {mean:>8.2f} {p50:>8.2f} {p99:>8.2f}")
+
+        # Predict latency with each kind of logging on the request thread.
+        log = PredictionLog(f"{workdir}/predict")
+        write, fh = _sync_writer(f"{workdir}/predict-sync.jsonl")
+        modes = {"no log": lambda record, price: None,
+                 "buffered log": lambda record, price: log.log(record, price, VERSION, "full", "bench", STAGES),
+                 "synchronous write": write}
+        print(f"\n{'single-row predict':<32} {'mean µs':>8} {'p50 µs':>8} {'p99 µs':>8}")
+        for name, sink in modes.items():
+            timings = []
+            for i in range(args.predictions):
+                record = records[i % len(records)]
+                started = time.perf_counter()
+                sink(record, float(predict_records(ml_model, transform, [record])[0]))
+                timings.append(time.perf_counter() - started)
+            mean, p50, p99 = _percentiles_us(timings)
+            print(f"{name:<32} {mean:>8.1f} {p50:>8.1f} {p99:>8.1f}")
+        log.close()
+        fh.close()
+
+        # Writer throughput: queue everything, then time until it is on disk.
+        print(f"\n{'writer':<32} {'entries/s':>10} {'bytes/entry':>12}")
+        for name, compress, level in [("plain", False, 1), ("gzip level 1", True, 1), ("gzip level 6", True, 6)]:
+            prediction_log.COMPRESS_LEVEL = level
+            directory = f"{workdir}/{name.replace(' ', '-')}"
+            log = PredictionLog(directory, compress=compress, max_queue=args.entries + 1)
+            started = time.perf_counter()
+            for i in range(args.entries):
+                log.log(records[i % len(records)], prices[i % len(prices)], VERSION, "full", "bench", STAGES)
+            log.close()
+            elapsed = time.perf_counter() - started
+            size = sum(os.path.getsize(path) for path in prediction_log.segments(directory))
+            print(f"{name:<32} {args.entries / elapsed:>10,.0f} {size / args.entries:>12.1f}")
+
+        # Replay the gzip level 1 log through the model.
+        served = load_version(VERSION, args.files_dir)
+        report = replay(f"{workdir}/gzip-level-1", served)
+        print(f"\nreplay: {report['rows']:,} rows in {report['seconds']:.2f} s — decoding "
+              f"{report['decode_rows_per_s']:,.0f} rows/s, scoring {report['served']['rows_per_s']:,.0f} rows/s, "
+              f"{report['served']['mismatches']} of {report['served']['same_version_rows']:,} prices differ from logged")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark — what-if scenario grid
+=================================
+Latency of the app's what-if panel: one interactive prediction, the same
+scenarios scored one ``predict_records`` call at a time, and the whole grid
+through ``predict_scenarios`` (categoricals encoded once, one predict).
+Also checks that both ways give the same prices.
+
+Usage
+-----
+    python -m benchmarks.bench_what_if [--files-dir files] [--repeats 20]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+import joblib
+import numpy as np
+
+from benchmarks.bench_inference import _stand_in_model
+from compiled_transform import CompiledTransform, sample_frame
+from inference import FILES_DIR, predict_records, predict_scenarios, scenario_grid, what_if_axes
+
+
+def _median_ms(fn, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1_000
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure the what-if grid against one-by-one predictions.")
+    parser.add_argument("--files-dir", default=FILES_DIR)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    encoder = joblib.load(f"{args.files_dir}/target_encoder.joblib")
+    scaler = joblib.load(f"{args.files_dir}/scaler.joblib")
+    with open(f"{args.files_dir}/options.json", "r", encoding="utf-8") as fh:
+        options = json.load(fh)
+    transform = CompiledTransform.from_artefacts(encoder, scaler)
+    pool = sample_frame(options, 5_000)
+    model_path = f"{args.files_dir}/xgb_model.joblib"
+    ml_model = (joblib.load(model_path) if os.path.exists(model_path)
+                else _stand_in_model(transform.transform(pool)))
+
+    record = {**pool.iloc[0].to_dict(), "odometer": 45_000.0, "condition": 4.0, "car_age": 8}
+    grid = scenario_grid(what_if_axes(record))
+    records = [{**record, **row} for row in grid.to_dict("records")]
+
+    gridded = predict_scenarios(ml_model, transform, record, grid)
+    one_by_one = np.array([predict_records(ml_model, transform, [r])[0] for r in records])
+    print(f"{len(grid)} scenarios, max |grid − one-by-one| = {np.abs(gridded - one_by_one).max():.4f} $")
+
+    single = _median_ms(lambda: predict_records(ml_model, transform, [record]), args.repeats)
+    loop = _median_ms(lambda: [predict_records(ml_model, transform, [r]) for r in records], max(1, args.repeats // 10))
+    batched = _median_ms(lambda: predict_scenarios(ml_model, transform, record, grid), args.repeats)
+    print(f"single prediction        {single:>9.2f} ms")
+    print(f"grid, one by one         {loop:>9.2f} ms")
+    print(f"grid, one predict call   {batched:>9.2f} ms  ({batched / single:.1f}× a single prediction)")
+
+
+if __name__ == "__main__":
+    main()
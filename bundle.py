@@ -0,0 +1,266 @@
+"""
+Car Price AI — Model Bundle
+===========================
+Versioned, memory-mappable export of the serving artefacts for hosts that run
+several app/server processes.
+
+Instead of every process unpickling its own copy of the joblib files, the
+bundle stores the encoder/scaler as pre-scaled ``.npy`` tables and the options
+as the indexed catalogue; both are opened with ``mmap_mode="r"`` so all
+workers share the same page-cache pages.  The booster is stored in XGBoost's
+native UBJSON format, which loads without pickle (XGBoost still parses it
+into private memory — trees cannot be mapped).
+
+Layout
+------
+    files/bundle/
+    ├── manifest.json            format, version, xgboost version, sha256 per file
+    ├── model.ubj                XGBoost booster (native format)
+    ├── tables/<col>_keys.npy    sorted category strings
+    ├── tables/<col>_values.npy  pre-scaled encodings (float32), unknown value appended
+    ├── tables/specials.npy      per categorical column: [unknown, missing]
+    ├── tables/numeric.npy       per numeric column: [mean, scale]
+    └── catalogue/               options catalogue (see catalogue.py)
+
+Usage
+-----
+    python bundle.py export [--files-dir files] [--out files/bundle]
+    python bundle.py verify [--bundle files/bundle]
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from catalogue import Catalogue, build_from_options
+from compiled_transform import CompiledTransform
+from inference import CATEGORICAL_COLUMNS, FEATURE_COLUMNS, FILES_DIR, NUMERIC_COLUMNS
+from normalization import canonical
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+BUNDLE_DIR = f"{FILES_DIR}/bundle"
+FORMAT_VERSION = 2   # 2: table keys are canonical spellings (normalization.py)
+MODEL_FILE = "model.ubj"
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _checksums(bundle_dir: str) -> dict[str, str]:
+    sums = {}
+    for root, _, files in os.walk(bundle_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, bundle_dir)
+            if rel != "manifest.json":
+                sums[rel.replace(os.sep, "/")] = _sha256(path)
+    return dict(sorted(sums.items()))
+
+
+# ---------------------------------------------------------------------------
+# Memory-mapped transform
+# ---------------------------------------------------------------------------
+class MappedTransform(CompiledTransform):
+    """
+    ``CompiledTransform`` backed by memory-mapped sorted arrays.
+
+    Lookups binary-search the shared key arrays instead of per-process dicts,
+    so the tables cost no private memory in each worker.
+    """
+
+    def __init__(self, tables_dir: str) -> None:
+        def _load(name: str) -> np.ndarray:
+            return np.load(f"{tables_dir}/{name}.npy", mmap_mode="r")
+
+        self._keys = {col: _load(f"{col}_keys") for col in CATEGORICAL_COLUMNS}
+        self._values = {col: _load(f"{col}_values") for col in CATEGORICAL_COLUMNS}
+        specials = np.load(f"{tables_dir}/specials.npy")
+        numeric = np.load(f"{tables_dir}/numeric.npy")
+        self.unknown = dict(zip(CATEGORICAL_COLUMNS, specials[:, 0].tolist()))
+        self.missing = dict(zip(CATEGORICAL_COLUMNS, specials[:, 1].tolist()))
+        self.numeric_mean = dict(zip(NUMERIC_COLUMNS, numeric[:, 0].tolist()))
+        self.numeric_scale = dict(zip(NUMERIC_COLUMNS, numeric[:, 1].tolist()))
+        self._positions = {col: FEATURE_COLUMNS.index(col) for col in FEATURE_COLUMNS}
+
+    def categories(self, col: str) -> list[str]:
+        return self._keys[col].tolist()
+
+    def encodings(self, col: str) -> np.ndarray:
+        return np.asarray(self._values[col][:-1])
+
+    def _lookup(self, col: str, value) -> float:
+        keys, value = self._keys[col], canonical(col, value)
+        if len(value) > keys.dtype.itemsize // 4:          # longer than any stored key
+            return self.unknown[col]
+        pos = int(np.searchsorted(keys, value))
+        if pos < len(keys) and keys[pos] == value:
+            return float(self._values[col][pos])
+        return self.unknown[col]
+
+    def _lookup_categories(self, col: str, categories: pd.Index) -> np.ndarray:
+        keys = self._keys[col]
+        raw = categories.to_numpy(dtype=object)
+        # Casting to the key dtype truncates longer strings; those can never match.
+        fits = np.fromiter(map(len, raw), dtype=np.int64, count=len(raw)) <= keys.dtype.itemsize // 4
+        values = raw.astype(keys.dtype)
+        pos = np.minimum(np.searchsorted(keys, values), len(keys) - 1)
+        hit = fits & (keys[pos] == values)
+        return np.where(hit, self._values[col][pos], self._values[col][-1]).astype(np.float32)
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+def _write_tables(transform: CompiledTransform, tables_dir: str) -> None:
+    # Only the public lookups, so a loaded bundle's MappedTransform can be re-exported too.
+    os.makedirs(tables_dir, exist_ok=True)
+    for col in CATEGORICAL_COLUMNS:
+        keys = np.array(transform.categories(col), dtype=str)
+        order = np.argsort(keys, kind="stable")
+        np.save(f"{tables_dir}/{col}_keys.npy", keys[order])
+        values = np.append(np.asarray(transform.encodings(col), dtype=np.float32)[order], transform.unknown[col])
+        np.save(f"{tables_dir}/{col}_values.npy", values.astype(np.float32))
+    np.save(f"{tables_dir}/specials.npy",
+            np.array([[transform.unknown[c], transform.missing[c]] for c in CATEGORICAL_COLUMNS]))
+    np.save(f"{tables_dir}/numeric.npy",
+            np.array([[transform.numeric_mean[c], transform.numeric_scale[c]] for c in NUMERIC_COLUMNS]))
+
+
+def export_bundle(ml_model, transform: CompiledTransform, options, out_dir: str = BUNDLE_DIR) -> str:
+    """
+    Write a bundle for the given artefacts and return its version.
+
+    The bundle is assembled in a sibling temp directory and moved into place,
+    so readers never see a half-written bundle.
+    """
+    import xgboost
+
+    staging = f"{out_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    ml_model.save_model(f"{staging}/{MODEL_FILE}")
+    _write_tables(transform, f"{staging}/tables")
+    if isinstance(options, Catalogue):
+        shutil.copytree(options.directory, f"{staging}/catalogue")
+    else:
+        build_from_options(options, f"{staging}/catalogue")
+
+    checksums = _checksums(staging)
+    version = hashlib.sha256(json.dumps(checksums, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "version": version,
+        "xgboost_version": xgboost.__version__,
+        "files": checksums,
+    }
+    with open(f"{staging}/manifest.json", "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2)
+
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.replace(staging, out_dir)
+    logger.info("Bundle %s written to %s.", version, out_dir)
+    return version
+
+
+# ---------------------------------------------------------------------------
+# Loading
+# ---------------------------------------------------------------------------
+def has_bundle(bundle_dir: str = BUNDLE_DIR) -> bool:
+    return os.path.exists(f"{bundle_dir}/manifest.json")
+
+
+def read_manifest(bundle_dir: str = BUNDLE_DIR) -> dict:
+    with open(f"{bundle_dir}/manifest.json", "r", encoding="utf-8") as fh:
+        manifest = json.load(fh)
+    if manifest["format_version"] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported bundle format {manifest['format_version']}")
+    return manifest
+
+
+def verify_bundle(bundle_dir: str = BUNDLE_DIR) -> list[str]:
+    """Files whose checksum does not match the manifest (empty when the bundle is intact)."""
+    expected = read_manifest(bundle_dir)["files"]
+    actual = _checksums(bundle_dir)
+    return sorted(name for name in expected.keys() | actual.keys() if expected.get(name) != actual.get(name))
+
+
+def load_bundle(bundle_dir: str = BUNDLE_DIR, verify: bool = True) -> tuple:
+    """
+    Load a bundle with its tables and catalogue memory-mapped.
+
+    Returns
+    -------
+    (ml_model, transform, options) — raises ``ValueError`` if verification fails.
+    """
+    from xgboost import XGBRegressor
+
+    manifest = read_manifest(bundle_dir)
+    if verify:
+        corrupt = verify_bundle(bundle_dir)
+        if corrupt:
+            raise ValueError(f"Bundle {manifest['version']} failed checksum verification: {corrupt}")
+
+    ml_model = XGBRegressor()
+    ml_model.load_model(f"{bundle_dir}/{MODEL_FILE}")
+    transform = MappedTransform(f"{bundle_dir}/tables")
+    options = Catalogue(f"{bundle_dir}/catalogue")
+    logger.info("Loaded bundle %s from %s.", manifest["version"], bundle_dir)
+    return ml_model, transform, options
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def main(argv: list[str] | None = None) -> None:
+    from inference import load_artefacts
+
+    parser = argparse.ArgumentParser(description="Export or verify a memory-mappable model bundle.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Build a bundle from the joblib artefacts.")
+    export.add_argument("--files-dir", default=FILES_DIR)
+    export.add_argument("--out", default=BUNDLE_DIR)
+    verify = sub.add_parser("verify", help="Check a bundle against its manifest checksums and load it.")
+    verify.add_argument("--bundle", default=BUNDLE_DIR)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "export":
+        ml_model, encoder, scaler, options = load_artefacts(args.files_dir)
+        if ml_model is None:
+            raise SystemExit(f"Model artefacts could not be loaded from '{args.files_dir}'.")
+        version = export_bundle(ml_model, CompiledTransform.from_artefacts(encoder, scaler), options, args.out)
+        print(f"Bundle {version} written to {args.out}")
+    else:
+        from compiled_transform import sample_frame
+        from drift import DriftMonitor, load_reference
+
+        corrupt = verify_bundle(args.bundle)
+        if corrupt:
+            raise SystemExit(f"Checksum mismatch: {corrupt}")
+        # Load it the way serving does: the model, its transform and the drift monitor built on it.
+        ml_model, transform, options = load_bundle(args.bundle, verify=False)
+        frame = sample_frame(options.to_dict(), 100)
+        ml_model.predict(transform.transform(frame))
+        DriftMonitor(transform, load_reference(os.path.dirname(os.path.abspath(args.bundle)))).observe_frame(frame)
+        print(f"Bundle {read_manifest(args.bundle)['version']} OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""
+Car Price AI — Options Catalogue
+================================
+Compact, memory-mappable replacement for ``files/options.json``.
+
+Every distinct string (makes, models, trims, bodies, sellers, …) is stored
+once in a sorted, interned string table (one UTF-8 blob plus an offset
+array).  Relations such as make → models are CSR-style integer arrays:
+``<name>_keys`` (sorted string ids), ``<name>_offsets`` and ``<name>_values``.
+All arrays are ``.npy`` files opened with ``mmap_mode="r"``, so worker
+processes share pages and strings are only decoded when looked up.
+
+The ``Catalogue`` object answers the same ``options[...]`` lookups the app
+already performs (``options["make_models"].get(make, [])`` etc.).
+
+Usage
+-----
+    python catalogue.py --from-json files/options.json       # convert existing options
+    python catalogue.py --from-csv car_prices_cleaned.csv    # build from the cleaned dataset
+"""
+
+import argparse
+import json
+import logging
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+CATALOGUE_DIR = "files/catalogue"
+FORMAT_VERSION = 1
+
+# Decoded relation entries kept per relation; reruns keep asking for the same make/model.
+RELATION_CACHE_SIZE = 128
+
+LISTS: list[str] = ["makes", "transmissions", "colors", "interiors"]
+# relation name → (key column, value column) in the cleaned dataset
+RELATIONS: dict[str, tuple[str, str]] = {
+    "make_models":  ("make",  "model"),
+    "model_trims":  ("model", "trim"),
+    "model_bodies": ("model", "body"),
+    "make_sellers": ("make",  "seller"),
+}
+
+US_STATES: dict[str, str] = {
+    'AL': 'Alabama', 'AK': 'Alaska', 'AZ': 'Arizona', 'AR': 'Arkansas', 'CA': 'California',
+    'CO': 'Colorado', 'CT': 'Connecticut', 'DE': 'Delaware', 'FL': 'Florida', 'GA': 'Georgia',
+    'HI': 'Hawaii', 'ID': 'Idaho', 'IL': 'Illinois', 'IN': 'Indiana', 'IA': 'Iowa',
+    'KS': 'Kansas', 'KY': 'Kentucky', 'LA': 'Louisiana', 'ME': 'Maine', 'MD': 'Maryland',
+    'MA': 'Massachusetts', 'MI': 'Michigan', 'MN': 'Minnesota', 'MS': 'Mississippi', 'MO': 'Missouri',
+    'MT': 'Montana', 'NE': 'Nebraska', 'NV': 'Nevada', 'NH': 'New Hampshire', 'NJ': 'New Jersey',
+    'NM': 'New Mexico', 'NY': 'New York', 'NC': 'North Carolina', 'ND': 'North Dakota', 'OH': 'Ohio',
+    'OK': 'Oklahoma', 'OR': 'Oregon', 'PA': 'Pennsylvania', 'RI': 'Rhode Island', 'SC': 'South Carolina',
+    'SD': 'South Dakota', 'TN': 'Tennessee', 'TX': 'Texas', 'UT': 'Utah', 'VT': 'Vermont',
+    'VA': 'Virginia', 'WA': 'Washington', 'WV': 'West Virginia', 'WI': 'Wisconsin', 'WY': 'Wyoming'
+}
+
+
+# ---------------------------------------------------------------------------
+# Writer
+# ---------------------------------------------------------------------------
+class _StringTable:
+    """Sorted interned strings; ids compare in the same order as the strings."""
+
+    def __init__(self, strings) -> None:
+        self.strings = sorted(set(strings))
+        self._ids = {s: i for i, s in enumerate(self.strings)}
+
+    def ids(self, values) -> np.ndarray:
+        return np.fromiter((self._ids[v] for v in values), dtype=np.int32)
+
+    def save(self, out_dir: str) -> None:
+        encoded = [s.encode("utf-8") for s in self.strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        np.save(f"{out_dir}/string_offsets.npy", offsets)
+        np.save(f"{out_dir}/string_bytes.npy", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+
+def _write(out_dir: str, lists: dict[str, list[str]], relations: dict[str, dict[str, list[str]]],
+           states_map: dict[str, str]) -> None:
+    os.makedirs(out_dir, exist_ok=True)
+    strings = [s for values in lists.values() for s in values]
+    strings += list(states_map) + list(states_map.values())
+    for mapping in relations.values():
+        strings += list(mapping)
+        strings += [v for values in mapping.values() for v in values]
+    table = _StringTable(strings)
+    table.save(out_dir)
+
+    for name, values in lists.items():
+        np.save(f"{out_dir}/{name}.npy", table.ids(sorted(values)))
+    np.save(f"{out_dir}/states_map_keys.npy", table.ids(states_map))
+    np.save(f"{out_dir}/states_map_values.npy", table.ids(states_map.values()))
+
+    for name, mapping in relations.items():
+        keys = sorted(mapping)
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum([len(mapping[k]) for k in keys], out=offsets[1:])
+        values = [v for k in keys for v in sorted(mapping[k])]
+        np.save(f"{out_dir}/{name}_keys.npy", table.ids(keys))
+        np.save(f"{out_dir}/{name}_offsets.npy", offsets)
+        np.save(f"{out_dir}/{name}_values.npy", table.ids(values))
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "strings": len(table.strings),
+        "lists": list(lists),
+        "relations": list(relations),
+    }
+    with open(f"{out_dir}/manifest.json", "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2)
+    logger.info("Catalogue written to %s (%d interned strings).", out_dir, len(table.strings))
+
+
+def build_from_options(options: dict, out_dir: str = CATALOGUE_DIR) -> None:
+    """Convert an already-loaded ``options.json`` dict."""
+    _write(
+        out_dir,
+        {name: options[name] for name in LISTS},
+        {name: options[name] for name in RELATIONS},
+        options["states_map"],
+    )
+
+
+def build_from_frame(df: pd.DataFrame, out_dir: str = CATALOGUE_DIR) -> None:
+    """
+    Build the catalogue from the cleaned, normalised sales dataset.
+
+    Each column is factorised once; every relation is then the set of unique
+    (key code, value code) pairs, found with one vectorised ``np.unique`` pass
+    instead of a ``groupby(...).unique()`` per relation.
+    """
+    codes, uniques = {}, {}
+    for col in {c for pair in RELATIONS.values() for c in pair} | {"transmission", "color", "interior", "state"}:
+        codes[col], uniques[col] = pd.factorize(df[col].astype(str), sort=True)
+
+    relations = {}
+    for name, (key_col, value_col) in RELATIONS.items():
+        n_values = len(uniques[value_col])
+        pairs = np.unique(codes[key_col].astype(np.int64) * n_values + codes[value_col])
+        key_codes, value_codes = np.divmod(pairs, n_values)
+        keys, values = uniques[key_col], uniques[value_col]
+        mapping: dict[str, list[str]] = {}
+        for k, v in zip(key_codes.tolist(), value_codes.tolist()):
+            mapping.setdefault(keys[k], []).append(values[v])
+        relations[name] = mapping
+
+    lists = {
+        "makes": list(uniques["make"]),
+        "transmissions": list(uniques["transmission"]),
+        "colors": list(uniques["color"]),
+        "interiors": list(uniques["interior"]),
+    }
+    states_map = {US_STATES.get(code, code): code for code in uniques["state"]}
+    _write(out_dir, lists, relations, states_map)
+
+
+# ---------------------------------------------------------------------------
+# Reader
+# ---------------------------------------------------------------------------
+class _Relation:
+    """Read-only ``dict[str, list[str]]`` view over one CSR relation."""
+
+    def __init__(self, catalogue: "Catalogue", keys: np.ndarray, offsets: np.ndarray,
+                 values: np.ndarray) -> None:
+        self._catalogue = catalogue
+        self._keys = keys
+        self._offsets = offsets
+        self._values = values
+        self._decode = lru_cache(maxsize=RELATION_CACHE_SIZE)(self._decode_uncached)
+
+    def _position(self, key: str) -> int:
+        string_id = self._catalogue.string_id(key)
+        if string_id < 0:
+            return -1
+        pos = int(np.searchsorted(self._keys, string_id))
+        return pos if pos < len(self._keys) and self._keys[pos] == string_id else -1
+
+    def _decode_uncached(self, key: str) -> list[str] | None:
+        pos = self._position(key)
+        if pos < 0:
+            return None
+        start, end = self._offsets[pos], self._offsets[pos + 1]
+        return self._catalogue.strings(self._values[start:end])
+
+    def get(self, key: str, default=None):
+        """Values for ``key``; the returned list is shared with the cache and must not be mutated."""
+        result = self._decode(key)
+        return default if result is None else result
+
+    def __getitem__(self, key: str) -> list[str]:
+        result = self.get(key)
+        if result is None:
+            raise KeyError(key)
+        return result
+
+    def __contains__(self, key: str) -> bool:
+        return self._position(key) >= 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def keys(self) -> list[str]:
+        return self._catalogue.strings(self._keys)
+
+
+class Catalogue:
+    """
+    Lazily decoded, memory-mapped options catalogue.
+
+    Supports the subset of the ``options`` dict interface the app uses:
+    ``catalogue["makes"]`` returns a list, ``catalogue["states_map"]`` a dict and
+    relation names a ``_Relation`` with ``.get(key, default)``.
+    """
+
+    def __init__(self, directory: str = CATALOGUE_DIR) -> None:
+        self.directory = directory
+        with open(f"{directory}/manifest.json", "r", encoding="utf-8") as fh:
+            self.manifest = json.load(fh)
+        if self.manifest["format_version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported catalogue format {self.manifest['format_version']}")
+
+        def _load(name: str) -> np.ndarray:
+            return np.load(f"{directory}/{name}.npy", mmap_mode="r")
+
+        self._offsets = _load("string_offsets")
+        self._bytes = _load("string_bytes")
+        self._buffer = memoryview(self._bytes)
+        self._lists = {name: _load(name) for name in self.manifest["lists"]}
+        self._relations = {
+            name: _Relation(self, _load(f"{name}_keys"), _load(f"{name}_offsets"), _load(f"{name}_values"))
+            for name in self.manifest["relations"]
+        }
+        self._states = (_load("states_map_keys"), _load("states_map_values"))
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def string(self, string_id: int) -> str:
+        return str(self._buffer[self._offsets[string_id]:self._offsets[string_id + 1]], "utf-8")
+
+    def strings(self, string_ids: np.ndarray) -> list[str]:
+        """Decode many ids at once; offsets are gathered in one vectorised step."""
+        string_ids = np.asarray(string_ids, dtype=np.int64)
+        starts = self._offsets[string_ids].tolist()
+        ends = self._offsets[string_ids + 1].tolist()
+        buffer = self._buffer
+        return [str(buffer[s:e], "utf-8") for s, e in zip(starts, ends)]
+
+    def string_id(self, value: str) -> int:
+        """Id of ``value`` in the interned table, or ``-1``; binary search, O(log n) decodes."""
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.string(mid) < value:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < len(self) and self.string(lo) == value else -1
+
+    def __getitem__(self, name: str):
+        if name in self._lists:
+            return self.strings(self._lists[name])
+        if name in self._relations:
+            return self._relations[name]
+        if name == "states_map":
+            keys, values = self._states
+            return {self.string(k): self.string(v) for k, v in zip(keys, values)}
+        raise KeyError(name)
+
+    def to_dict(self) -> dict:
+        """Fully decoded ``options.json``-style dict (for tools that still read the JSON)."""
+        options = {name: self[name] for name in self._lists}
+        options["states_map"] = self["states_map"]
+        for name, relation in self._relations.items():
+            options[name] = {key: relation[key] for key in relation.keys()}
+        return options
+
+
+def load_options(files_dir: str):
+    """The indexed catalogue when one has been built in ``files_dir``, otherwise the JSON options."""
+    directory = f"{files_dir}/catalogue"
+    if os.path.exists(f"{directory}/manifest.json"):
+        return Catalogue(directory)
+    with open(f"{files_dir}/options.json", "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Build the indexed options catalogue.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--from-json", metavar="PATH", help="Existing options.json to convert.")
+    source.add_argument("--from-csv", metavar="PATH", help="Cleaned sales dataset (car_prices_cleaned.csv).")
+    parser.add_argument("--out", default=CATALOGUE_DIR, help="Output directory.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.from_json:
+        with open(args.from_json, "r", encoding="utf-8") as fh:
+            build_from_options(json.load(fh), args.out)
+    else:
+        from normalization import normalize_frame
+
+        columns = ["make", "model", "trim", "body", "transmission", "state", "color", "interior", "seller"]
+        df = pd.read_csv(args.from_csv, usecols=columns, dtype="category")
+        build_from_frame(normalize_frame(df, columns), args.out)
+
+
+if __name__ == "__main__":
+    main()
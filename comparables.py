@@ -0,0 +1,231 @@
+"""
+Car Price AI — Comparable Sales
+===============================
+The historical sales closest to a configured car, returned next to its
+valuation.
+
+The notebook's ``KNeighborsRegressor`` compares a car with every training
+row.  This index only searches sales of the same make and model: the
+training rows are sorted by ``(make, model)`` so each partition is a
+contiguous row range.  Partitions of up to ``BRUTE_FORCE_ROWS`` sales are
+scanned directly; larger ones get a KD-tree the first time they are queried.
+Trees are built in each process rather than stored with the index: they are
+rebuilt from the memory-mapped features in tens of milliseconds, and most processes
+only ever query a few partitions.  Distances are taken over the model's own scaled features
+(``car_age``, ``odometer``, ``condition`` and the target-encoded columns),
+so a query reuses the vector the compiled transform already produces.
+Models with fewer than ``k`` sales fall back to the whole make.
+
+The training pipeline's ``index`` stage builds it from the training split
+and ``export`` copies it to ``files/comparables/``:
+
+    features.npy      float32 rows × SEARCH_COLUMNS, memory-mapped
+    sales.parquet     the same rows' fields and sale price
+    partitions.json   make → row range, make → model → row range
+
+Usage
+-----
+    index = load_comparables("files")
+    index.query(record, transform.transform_records([record])[0], k=5)
+    python batch_score.py inventory.csv out.parquet --comparables 5
+    python -m benchmarks.bench_comparables          # KD-tree vs. brute force
+"""
+
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from inference import FEATURE_COLUMNS, FILES_DIR
+from normalization import canonical
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+FORMAT_VERSION   = 1
+INDEX_DIR        = "comparables"
+PRICE_COLUMN     = "sellingprice"     # train_pipeline.TARGET
+DISTANCE_COLUMN  = "distance"
+DEFAULT_K        = 5
+LEAF_SIZE        = 40
+BRUTE_FORCE_ROWS = 1_000              # below about this many rows a vectorised scan beats a KD-tree
+
+# make and model select the partition; every other model input is a search dimension.
+SEARCH_COLUMNS: list[str] = [col for col in FEATURE_COLUMNS if col not in ("make", "model")]
+SEARCH_POSITIONS: list[int] = [FEATURE_COLUMNS.index(col) for col in SEARCH_COLUMNS]
+
+
+# ---------------------------------------------------------------------------
+# Build
+# ---------------------------------------------------------------------------
+def build_index(sales: pd.DataFrame, scaled: np.ndarray, out_dir: str) -> dict:
+    """
+    Write the index for ``sales`` into ``out_dir``.
+
+    ``sales`` holds ``FEATURE_COLUMNS`` in canonical spelling plus the sale
+    price; ``scaled`` is the same rows as the model sees them.
+
+    Returns
+    -------
+    The ``partitions.json`` contents.
+    """
+    makes = sales["make"].astype(str).to_numpy()
+    models = sales["model"].astype(str).to_numpy()
+    order = np.lexsort((models, makes))
+    makes, models = makes[order], models[order]
+
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(f"{out_dir}/features.npy", np.ascontiguousarray(scaled[order][:, SEARCH_POSITIONS], dtype=np.float32))
+    sales.iloc[order][FEATURE_COLUMNS + [PRICE_COLUMN]].reset_index(drop=True).to_parquet(
+        f"{out_dir}/sales.parquet", index=False)
+
+    change = np.flatnonzero((makes[1:] != makes[:-1]) | (models[1:] != models[:-1])) + 1
+    starts = np.r_[0, change]
+    return write_partitions(out_dir, makes[starts].tolist(), models[starts].tolist(),
+                            np.diff(np.r_[starts, len(order)]).tolist())
+
+
+def write_partitions(out_dir: str, makes: list[str], models: list[str], sizes: list[int]) -> dict:
+    """
+    Write ``partitions.json`` for rows stored in ``(make, model)`` order.
+
+    ``makes``, ``models`` and ``sizes`` list the partitions in that order with
+    their row counts, so an index can also be assembled without sorting all
+    sales in memory (``out_of_core.py``).
+    """
+    make_ranges: dict[str, list[int]] = {}
+    model_ranges: dict[str, dict[str, list[int]]] = {}
+    start = 0
+    for make, model, size in zip(makes, models, sizes):
+        model_ranges.setdefault(make, {})[model] = [start, start + size]
+        make_ranges[make] = [make_ranges.get(make, [start])[0], start + size]
+        start += size
+
+    partitions = {"format_version": FORMAT_VERSION, "rows": start, "columns": SEARCH_COLUMNS,
+                  "makes": make_ranges, "models": model_ranges}
+    with open(f"{out_dir}/partitions.json", "w", encoding="utf-8") as fh:
+        json.dump(partitions, fh)
+    logger.info("Comparables index: %d sales in %d make/model partitions.", start, len(sizes))
+    return partitions
+
+
+# ---------------------------------------------------------------------------
+# Query
+# ---------------------------------------------------------------------------
+class ComparablesIndex:
+    """Partitioned nearest-sale search over an index directory written by :func:`build_index`."""
+
+    def __init__(self, directory: str) -> None:
+        with open(f"{directory}/partitions.json", "r", encoding="utf-8") as fh:
+            partitions = json.load(fh)
+        if partitions.get("format_version") != FORMAT_VERSION or partitions["columns"] != SEARCH_COLUMNS:
+            raise ValueError(f"Comparables index in '{directory}' has an incompatible format.")
+        self.makes: dict[str, list[int]] = partitions["makes"]
+        self.models: dict[str, dict[str, list[int]]] = partitions["models"]
+        self.features = np.load(f"{directory}/features.npy", mmap_mode="r")
+        self.sales = pd.read_parquet(f"{directory}/sales.parquet")
+        self.prices = self.sales[PRICE_COLUMN].to_numpy()
+        self._trees: dict[tuple[int, int], object] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.sales)
+
+    def partition(self, make, model, k: int = DEFAULT_K) -> tuple[int, int] | None:
+        """Row range searched for ``make``/``model``: the model's sales, or the make's when too few."""
+        make = canonical("make", make)
+        if make not in self.makes:
+            return None
+        bounds = self.models[make].get(canonical("model", model))
+        if bounds is None or bounds[1] - bounds[0] < k:
+            bounds = self.makes[make]
+        return bounds[0], bounds[1]
+
+    def _tree(self, bounds: tuple[int, int]):
+        tree = self._trees.get(bounds)
+        if tree is None:
+            from sklearn.neighbors import KDTree
+
+            with self._lock:
+                tree = self._trees.get(bounds)
+                if tree is None:
+                    tree = self._trees[bounds] = KDTree(self.features[bounds[0]:bounds[1]], leaf_size=LEAF_SIZE)
+        return tree
+
+    def neighbours(self, bounds: tuple[int, int], scaled: np.ndarray, k: int = DEFAULT_K) -> tuple:
+        """
+        Nearest rows within ``bounds`` for each row of ``scaled`` (model-space features).
+
+        Returns
+        -------
+        (distances, rows) — arrays of shape ``(len(scaled), min(k, partition size))``.
+        A row with a missing numeric field has no position in feature space;
+        it gets rows ``-1`` and infinite distances.
+        """
+        start, end = bounds
+        k = min(k, end - start)
+        query = np.asarray(scaled, dtype=np.float32).reshape(-1, len(FEATURE_COLUMNS))[:, SEARCH_POSITIONS]
+        finite = np.isfinite(query).all(axis=1)
+        distances = np.full((len(query), k), np.inf)
+        rows = np.full((len(query), k), -1, dtype=np.int64)
+        if not finite.any():
+            return distances, rows
+        query = query[finite]
+        if end - start > BRUTE_FORCE_ROWS:
+            found_distances, found = self._tree(bounds).query(query, k=k)
+        else:
+            block = np.asarray(self.features[start:end], dtype=np.float64)
+            query = query.astype(np.float64)
+            squared = (query ** 2).sum(axis=1)[:, None] - 2 * query @ block.T + (block ** 2).sum(axis=1)
+            found = np.argpartition(squared, k - 1, axis=1)[:, :k]
+            found = np.take_along_axis(found, np.argsort(np.take_along_axis(squared, found, axis=1), axis=1), axis=1)
+            found_distances = np.sqrt(np.maximum(np.take_along_axis(squared, found, axis=1), 0.0))
+        distances[finite], rows[finite] = found_distances, found + start
+        return distances, rows
+
+    def query(self, record: dict, scaled_row: np.ndarray, k: int = DEFAULT_K) -> pd.DataFrame:
+        """
+        The ``k`` sales closest to ``record``, nearest first.
+
+        ``scaled_row`` is ``record`` through the compiled transform. Empty when
+        the make has no sales in the index or a numeric field is missing.
+        """
+        bounds = self.partition(record["make"], record["model"], k)
+        if bounds is None:
+            return self.sales.iloc[:0].assign(**{DISTANCE_COLUMN: []})
+        distances, rows = self.neighbours(bounds, scaled_row, k)
+        found = rows[0] >= 0
+        return self.sales.iloc[rows[0][found]].assign(**{DISTANCE_COLUMN: distances[0][found]}).reset_index(drop=True)
+
+    def query_frame(self, frame: pd.DataFrame, scaled: np.ndarray, k: int = DEFAULT_K) -> np.ndarray:
+        """
+        Index rows of the ``k`` nearest sales for every row of ``frame``; ``-1`` pads missing ones.
+
+        Rows are grouped by partition so each KD-tree is queried once per chunk.
+        """
+        result = np.full((len(frame), k), -1, dtype=np.int64)
+        groups = pd.DataFrame({"make": frame["make"].to_numpy(), "model": frame["model"].to_numpy()})
+        for (make, model), positions in groups.groupby(["make", "model"], sort=False, dropna=False).indices.items():
+            bounds = self.partition(make, model, k)
+            if bounds is None:
+                continue
+            _, rows = self.neighbours(bounds, scaled[positions], k)
+            result[positions, :rows.shape[1]] = rows
+        return result
+
+
+def load_comparables(files_dir: str = FILES_DIR) -> ComparablesIndex | None:
+    """The exported comparables index, or ``None`` when there is none or it cannot be read."""
+    directory = os.path.join(files_dir, INDEX_DIR)
+    if not os.path.exists(f"{directory}/partitions.json"):
+        return None
+    try:
+        return ComparablesIndex(directory)
+    except (OSError, ValueError, KeyError) as exc:
+        logger.error("Comparables index not loaded: %s", exc)
+        return None
@@ -0,0 +1,310 @@
+"""
+Car Price AI — Compiled Feature Transform
+=========================================
+Folds the fitted ``TargetEncoder`` and ``StandardScaler`` into one pre-scaled
+lookup table per categorical column plus a single affine op for the numeric
+columns.  At inference time a row costs a handful of dict lookups instead of
+two pandas-heavy ``transform`` calls.
+
+Tables are keyed by the canonical spelling from ``normalization.py`` and
+inputs are canonicalised before lookup, so "BMW", "bmw" and "Bmw" all hit the
+same entry.  When an encoder was fitted on raw, mixed-case data, the spelling
+seen first during training provides the value for its canonical form.
+
+Usage
+-----
+    python compiled_transform.py --check              # parity against the encoder/scaler chain
+    python compiled_transform.py --export out.npz     # write the compiled tables
+"""
+
+import argparse
+import json
+import logging
+from collections.abc import Iterable, Mapping
+
+import numpy as np
+import pandas as pd
+
+from inference import CATEGORICAL_COLUMNS, FEATURE_COLUMNS, FILES_DIR, NUMERIC_COLUMNS
+from normalization import canonical, is_missing, normalize_column
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+# Ordinal codes category_encoders reserves for unseen and missing values.
+_UNKNOWN_CODE = -1
+_MISSING_CODE = -2
+
+
+def scale_float32(values, mean, scale) -> np.ndarray:
+    """
+    ``(values - mean) / scale`` rounded exactly as the training pipeline rounds it.
+
+    The pipeline feeds ``float32`` frames to ``StandardScaler.transform``, which
+    works in place and rounds to ``float32`` after each step.  Encodings sit
+    exactly on the model's split thresholds, so a one-ulp difference from a
+    single float64 op is enough to send a row down the other branch.
+    """
+    shifted = (np.asarray(values, dtype=np.float32) - np.float64(mean)).astype(np.float32)
+    return (shifted / np.float64(scale)).astype(np.float32)
+
+
+# ---------------------------------------------------------------------------
+# Compiled transform
+# ---------------------------------------------------------------------------
+class CompiledTransform:
+    """
+    Pre-scaled replacement for ``scaler.transform(encoder.transform(df))``.
+
+    Output columns follow ``FEATURE_COLUMNS`` and are written into a
+    preallocated ``float32`` matrix, which is what XGBoost consumes internally.
+    """
+
+    def __init__(
+        self,
+        tables: dict[str, dict[str, float]],
+        unknown: dict[str, float],
+        missing: dict[str, float],
+        numeric_mean: dict[str, float],
+        numeric_scale: dict[str, float],
+    ) -> None:
+        self.tables = tables
+        self.unknown = unknown
+        self.missing = missing
+        self.numeric_mean = numeric_mean
+        self.numeric_scale = numeric_scale
+
+        self._positions = {col: FEATURE_COLUMNS.index(col) for col in FEATURE_COLUMNS}
+        # Index objects back the vectorised path; built once here rather than per call.
+        self._indexes = {col: pd.Index(list(table)) for col, table in tables.items()}
+        self._values = {
+            col: np.append(np.fromiter(table.values(), dtype=np.float32, count=len(table)),
+                           np.float32(unknown[col]))
+            for col, table in tables.items()
+        }
+
+    # -- construction -------------------------------------------------------
+    @classmethod
+    def from_artefacts(cls, encoder, scaler) -> "CompiledTransform":
+        """Compile the fitted ``encoder`` and ``scaler`` into lookup tables."""
+        columns = list(scaler.feature_names_in_)
+        if columns != FEATURE_COLUMNS:
+            raise ValueError(f"Scaler was fitted on unexpected columns: {columns}")
+        mean  = dict(zip(columns, scaler.mean_.tolist()))
+        scale = dict(zip(columns, scaler.scale_.tolist()))
+
+        ordinal = {entry["col"]: entry["mapping"] for entry in encoder.ordinal_encoder.mapping}
+        tables, unknown, missing = {}, {}, {}
+        for col in CATEGORICAL_COLUMNS:
+            encoded = encoder.mapping[col]
+
+            def _scaled(code: int, col: str = col) -> float:
+                return float(scale_float32(encoded.loc[code], mean[col], scale[col]))
+
+            table: dict[str, float] = {}
+            for category, code in sorted(ordinal[col].items(), key=lambda item: item[1]):
+                if not is_missing(category):
+                    table.setdefault(canonical(col, category), _scaled(int(code)))
+            tables[col] = table
+            unknown[col] = _scaled(_UNKNOWN_CODE)
+            missing[col] = _scaled(_MISSING_CODE)
+
+        return cls(
+            tables, unknown, missing,
+            {col: mean[col] for col in NUMERIC_COLUMNS},
+            {col: scale[col] for col in NUMERIC_COLUMNS},
+        )
+
+    # -- persistence --------------------------------------------------------
+    def save(self, path: str) -> None:
+        """Write the compiled tables to a single ``.npz`` archive."""
+        arrays = {}
+        for col, table in self.tables.items():
+            arrays[f"{col}__keys"]   = np.array(list(table), dtype=str)
+            arrays[f"{col}__values"] = np.fromiter(table.values(), dtype=np.float64, count=len(table))
+        header = {
+            "unknown": self.unknown, "missing": self.missing,
+            "numeric_mean": self.numeric_mean, "numeric_scale": self.numeric_scale,
+        }
+        arrays["header"] = np.array(json.dumps(header))
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "CompiledTransform":
+        """Load tables written by :meth:`save`."""
+        with np.load(path) as data:
+            header = json.loads(str(data["header"]))
+            tables = {
+                col: dict(zip(data[f"{col}__keys"].tolist(), data[f"{col}__values"].tolist()))
+                for col in CATEGORICAL_COLUMNS
+            }
+        return cls(tables, header["unknown"], header["missing"],
+                   header["numeric_mean"], header["numeric_scale"])
+
+    # -- lookups ------------------------------------------------------------
+    def categories(self, col: str) -> list[str]:
+        """Canonical categories of ``col`` seen in training; any other value is encoded as unknown."""
+        return list(self.tables[col])
+
+    def encodings(self, col: str) -> np.ndarray:
+        """Pre-scaled encodings of :meth:`categories` ``(col)``, in the same order."""
+        return self._values[col][:-1]
+
+    def _lookup(self, col: str, value) -> float:
+        """Pre-scaled value of one category."""
+        return self.tables[col].get(canonical(col, value), self.unknown[col])
+
+    def _lookup_categories(self, col: str, categories: pd.Index) -> np.ndarray:
+        """Pre-scaled values of distinct canonical categories."""
+        return self._values[col][self._indexes[col].get_indexer(categories)]   # -1 → trailing unknown
+
+    def _lookup_column(self, col: str, series: pd.Series) -> np.ndarray:
+        """
+        Pre-scaled values of a whole column; missing values are patched by the caller.
+
+        Only the column's distinct values are canonicalised and looked up; rows
+        are then filled through the category codes.
+        """
+        categorical = normalize_column(series, col)
+        values = np.append(self._lookup_categories(col, categorical.categories), np.float32(self.unknown[col]))
+        return values[categorical.codes]
+
+    # -- inference ----------------------------------------------------------
+    def transform_records(self, records: Iterable[Mapping]) -> np.ndarray:
+        """Transform a small list of dict rows — the interactive fast path."""
+        records = list(records)
+        out = np.empty((len(records), len(FEATURE_COLUMNS)), dtype=np.float32)
+        for i, record in enumerate(records):
+            row = out[i]
+            for col in CATEGORICAL_COLUMNS:
+                value = record[col]
+                row[self._positions[col]] = (
+                    self.missing[col] if is_missing(value) else self._lookup(col, value)
+                )
+            for col in NUMERIC_COLUMNS:
+                # scale_float32 spelled out for one value; the row store is the final rounding.
+                shifted = float(np.float32(float(np.float32(record[col])) - self.numeric_mean[col]))
+                row[self._positions[col]] = shifted / self.numeric_scale[col]
+        return out
+
+    def transform_scenarios(self, record: Mapping, numeric: Mapping[str, np.ndarray]) -> np.ndarray:
+        """
+        Transform ``record`` once per scenario, varying only numeric columns.
+
+        The categorical lookups run once for ``record`` and the row is
+        repeated; each column in ``numeric`` (equal-length arrays of raw
+        values) is then scaled with a single vectorised op.
+        """
+        unknown = set(numeric) - set(NUMERIC_COLUMNS)
+        if unknown:
+            raise ValueError(f"Only numeric columns can vary between scenarios, got: {sorted(unknown)}")
+        base = self.transform_records([record])
+        out = np.repeat(base, len(next(iter(numeric.values()))), axis=0)
+        for col, values in numeric.items():
+            out[:, self._positions[col]] = scale_float32(values, self.numeric_mean[col], self.numeric_scale[col])
+        return out
+
+    def transform(self, frame: pd.DataFrame) -> np.ndarray:
+        """Transform a DataFrame with vectorised index lookups — the batch path."""
+        out = np.empty((len(frame), len(FEATURE_COLUMNS)), dtype=np.float32)
+        for col in CATEGORICAL_COLUMNS:
+            series = frame[col]
+            column = self._lookup_column(col, series)
+            column[series.isna().to_numpy()] = self.missing[col]
+            out[:, self._positions[col]] = column
+        for col in NUMERIC_COLUMNS:
+            out[:, self._positions[col]] = scale_float32(
+                frame[col].to_numpy(dtype=np.float64), self.numeric_mean[col], self.numeric_scale[col]
+            )
+        return out
+
+
+# ---------------------------------------------------------------------------
+# Parity check
+# ---------------------------------------------------------------------------
+def sample_frame(options: dict, n_rows: int, seed: int = 7) -> pd.DataFrame:
+    """Draw synthetic model inputs from the UI option lists."""
+    rng = np.random.default_rng(seed)
+    makes  = rng.choice(options["makes"], n_rows)
+    models = [rng.choice(options["make_models"].get(m) or ["Unknown"]) for m in makes]
+    return pd.DataFrame({
+        "make": makes,
+        "model": models,
+        "trim": [rng.choice(options["model_trims"].get(m, ["Standard"])) for m in models],
+        "body": [rng.choice(options["model_bodies"].get(m, ["Sedan"])) for m in models],
+        "transmission": rng.choice(options["transmissions"], n_rows),
+        "state": rng.choice(list(options["states_map"].values()), n_rows),
+        "condition": rng.uniform(1.0, 5.0, n_rows).round(1),
+        "odometer": rng.integers(0, 500_000, n_rows),
+        "color": rng.choice(options["colors"], n_rows),
+        "interior": rng.choice(options["interiors"], n_rows),
+        "seller": [rng.choice(options["make_sellers"].get(m, ["Other"])) for m in makes],
+        "car_age": rng.integers(0, 30, n_rows),
+    })
+
+
+def raw_spellings(encoder) -> dict[str, dict[str, str]]:
+    """Per column, canonical value → the raw training category its compiled value came from."""
+    spellings = {}
+    for entry in encoder.ordinal_encoder.mapping:
+        col, mapping = entry["col"], {}
+        for category, _ in sorted(entry["mapping"].items(), key=lambda item: item[1]):
+            if not is_missing(category):
+                mapping.setdefault(canonical(col, category), category)
+        spellings[col] = mapping
+    return spellings
+
+
+def max_abs_difference(transform: CompiledTransform, encoder, scaler, frame: pd.DataFrame) -> float:
+    """
+    Largest absolute gap between the compiled path and the encoder/scaler chain.
+
+    The chain does no normalisation, so it is fed each value's raw training
+    spelling; the compiled path gets the frame as-is.
+    """
+    raw = frame[FEATURE_COLUMNS].copy()
+    for col, mapping in raw_spellings(encoder).items():
+        raw[col] = [v if is_missing(v) else mapping.get(canonical(col, v), v) for v in raw[col]]
+    reference = scaler.transform(encoder.transform(raw))
+    vectorised = transform.transform(frame)
+    per_record = transform.transform_records(frame.to_dict("records"))
+    return float(max(np.abs(reference - vectorised).max(), np.abs(reference - per_record).max()))
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def main(argv: list[str] | None = None) -> None:
+    import joblib
+
+    parser = argparse.ArgumentParser(description="Compile the target encoder + scaler into lookup tables.")
+    parser.add_argument("--files-dir", default=FILES_DIR, help="Directory holding the model artefacts.")
+    parser.add_argument("--export", metavar="PATH", help="Write the compiled tables to this .npz file.")
+    parser.add_argument("--check", action="store_true", help="Compare against the encoder/scaler chain.")
+    parser.add_argument("--rows", type=int, default=5_000, help="Synthetic rows used by --check.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    encoder = joblib.load(f"{args.files_dir}/target_encoder.joblib")
+    scaler  = joblib.load(f"{args.files_dir}/scaler.joblib")
+    transform = CompiledTransform.from_artefacts(encoder, scaler)
+
+    if args.export:
+        transform.save(args.export)
+        print(f"Compiled transform written to {args.export}")
+    if args.check:
+        with open(f"{args.files_dir}/options.json", "r", encoding="utf-8") as fh:
+            options = json.load(fh)
+        frame = sample_frame(options, args.rows)
+        frame.loc[::97, "seller"] = "Never Seen Before Motors"
+        frame.loc[::89, "interior"] = None
+        diff = max_abs_difference(transform, encoder, scaler, frame)
+        print(f"Max abs difference over {len(frame):,} rows: {diff:.2e}")
+        if diff > 1e-4:
+            raise SystemExit("Parity check FAILED.")
+
+
+if __name__ == "__main__":
+    main()
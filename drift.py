@@ -0,0 +1,532 @@
+"""
+Car Price AI — Input Drift Monitor
+==================================
+Constant-memory summaries of the inputs the model is asked to price, compared
+with the same summaries of the data it was trained on.
+
+The training pipeline's ``encode`` stage writes ``drift_reference.json`` from
+the training split and ``export`` copies it next to the model:
+
+- per categorical column, the shares of its ``TOP_CATEGORIES`` most common
+  values, of every other training value pooled, and of missing values;
+- per numeric column (``condition``, ``odometer``, ``car_age``), the edges of
+  ``NUMERIC_BINS`` quantile bins, the share of rows in each, and the range.
+
+The test split's rate of values training never saw is recorded too, as the
+rate to expect from fresh traffic of the same kind.
+
+``DriftMonitor`` keeps one counter per reference bin, so observing a record
+costs a dict lookup per categorical field and a bisect per numeric one, and
+memory does not grow with traffic.  A value the target encoder never saw goes
+to an extra "unseen" bin — the model prices it with the encoder's prior, as
+an average car — and into a Space-Saving sketch of ``SKETCH_SIZE`` counters
+per column, which keeps the most frequent unseen values, each with a bound on
+its overcount, however many distinct ones arrive.
+
+Counts cover the latest ``window`` to ``2 × window`` observations: two
+generations are kept and the older is dropped when the newer one fills.
+:meth:`DriftMonitor.report` gives, per column, the population stability
+index (PSI) against the reference — below 0.1 stable, up to 0.25 moderate,
+above that major — with unseen and missing rates, numeric values outside the
+training range and the top unseen values, and sets the
+``car_price_input_drift_psi`` gauges.
+
+Usage
+-----
+    monitor = DriftMonitor(loaded.transform, loaded.drift_reference)
+    monitor.observe(record)                          # → ["trim"] when that trim was never seen in training
+    monitor.report()
+    python drift.py report logs                      # a prediction log against the served version
+    python drift.py reference car_prices.csv --out files     # for artefacts exported without one
+    python -m benchmarks.bench_drift                 # cost per observation
+"""
+
+import argparse
+import bisect
+import datetime
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from inference import CATEGORICAL_COLUMNS, FILES_DIR, NUMERIC_COLUMNS
+from metrics import INPUT_DRIFT_PSI, UNSEEN_CATEGORIES
+from normalization import canonical, is_missing, normalize_column
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+REFERENCE_FILE = "drift_reference.json"
+TOP_CATEGORIES = 50         # categories per column with their own bin; the rest share one
+NUMERIC_BINS   = 20         # quantile bins per numeric column (fewer when values repeat)
+SKETCH_SIZE    = 32         # unseen values tracked per column
+DEFAULT_WINDOW = 100_000    # observations per generation
+MIN_ROWS       = 1_000      # observations before a PSI is reported; fewer inflate it by chance
+PSI_MODERATE   = 0.10
+PSI_MAJOR      = 0.25
+PSI_FLOOR      = 1e-4       # share used for empty bins so the PSI stays finite
+TOP_UNSEEN     = 10         # unseen values listed per column in a report
+
+
+# ---------------------------------------------------------------------------
+# Reference summaries
+# ---------------------------------------------------------------------------
+def build_reference(frame: pd.DataFrame, holdout: pd.DataFrame | None = None) -> dict:
+    """
+    Reference summary of a training frame with the ``FEATURE_COLUMNS``.
+
+    Long-tailed columns such as ``seller`` keep meeting new values even when
+    nothing has changed.  With a ``holdout`` from the same data (the test
+    split), the share of its rows whose value training never saw is recorded
+    as the expected unseen rate, so only unseen values beyond it count as drift.
+    """
+    builder = ReferenceBuilder()
+    builder.add(frame)
+    if holdout is not None:
+        builder.add_holdout(holdout)
+    return builder.reference()
+
+
+def _quantiles(counts: pd.Series, q: np.ndarray) -> np.ndarray:
+    """``np.quantile`` (linear) of the values counted in ``counts`` (sorted value → rows)."""
+    cumulative = counts.to_numpy().cumsum()
+    values = counts.index.to_numpy(dtype=np.float64)
+    position = (cumulative[-1] - 1) * q
+    below = np.floor(position)
+    lower = values[np.searchsorted(cumulative, below, side="right")]
+    upper = values[np.searchsorted(cumulative, np.minimum(below + 1, cumulative[-1] - 1), side="right")]
+    t = position - below
+    # numpy's lerp, so edges match np.quantile over the rows themselves.
+    return np.where(t >= 0.5, upper - (upper - lower) * (1 - t), lower + (upper - lower) * t)
+
+
+class ReferenceBuilder:
+    """
+    :func:`build_reference` over a frame that arrives in chunks (``out_of_core.py``).
+
+    Keeps per-value counts, so memory grows with the number of distinct
+    values rather than rows; numeric quantiles are read off the merged counts.
+    """
+
+    def __init__(self) -> None:
+        self.rows = self.holdout_rows = 0
+        self._categorical: dict[str, pd.Series] = {}
+        self._numeric: dict[str, pd.Series] = {}
+        self._missing = dict.fromkeys(CATEGORICAL_COLUMNS + NUMERIC_COLUMNS, 0)
+        self._holdout: dict[str, pd.Series] = {}
+
+    @staticmethod
+    def _merge(counts: dict[str, pd.Series], col: str, chunk: pd.Series) -> None:
+        counts[col] = chunk if col not in counts else counts[col].add(chunk, fill_value=0)
+
+    @staticmethod
+    def _category_counts(series: pd.Series, col: str) -> tuple[pd.Series, int]:
+        values = normalize_column(series, col)
+        present = values.codes >= 0
+        counts = np.bincount(values.codes[present], minlength=len(values.categories))
+        return pd.Series(counts, index=values.categories), int((~present).sum())
+
+    def add(self, frame: pd.DataFrame) -> None:
+        """Count a chunk of training rows."""
+        self.rows += len(frame)
+        for col in CATEGORICAL_COLUMNS:
+            counts, missing = self._category_counts(frame[col], col)
+            self._merge(self._categorical, col, counts)
+            self._missing[col] += missing
+        for col in NUMERIC_COLUMNS:
+            values = frame[col].to_numpy(dtype=np.float64)
+            self._merge(self._numeric, col, pd.Series(values).value_counts())
+            self._missing[col] += int(np.isnan(values).sum())
+
+    def add_holdout(self, frame: pd.DataFrame) -> None:
+        """Count a chunk of held-out rows, for the expected unseen rates."""
+        self.holdout_rows += len(frame)
+        for col in CATEGORICAL_COLUMNS:
+            self._merge(self._holdout, col, self._category_counts(frame[col], col)[0])
+
+    def reference(self) -> dict:
+        """The reference summary of every row added so far."""
+        rows = self.rows
+        categorical = {}
+        for col in CATEGORICAL_COLUMNS:
+            counts = self._categorical[col]
+            counts = counts[counts > 0]
+            top = counts.sort_values(ascending=False, kind="stable").head(TOP_CATEGORIES)
+            unseen_share = 0.0
+            if self.holdout_rows:
+                held = self._holdout[col]
+                unseen_share = float(held[~held.index.isin(counts.index)].sum()) / self.holdout_rows
+            categorical[col] = {
+                "categories": [str(value) for value in top.index],
+                "shares": (top.to_numpy() / rows).tolist(),
+                "other_share": float(counts.sum() - top.sum()) / rows,
+                "missing_share": float(self._missing[col]) / rows,
+                "unseen_share": unseen_share,
+                "distinct": len(counts),
+            }
+        numeric = {}
+        for col in NUMERIC_COLUMNS:
+            counts = self._numeric[col].sort_index()
+            edges = np.unique(_quantiles(counts, np.linspace(0, 1, NUMERIC_BINS + 1)[1:-1]))
+            bins = np.bincount(np.searchsorted(edges, counts.index.to_numpy(dtype=np.float64), side="right"),
+                               weights=counts.to_numpy(dtype=np.float64), minlength=len(edges) + 1)
+            numeric[col] = {
+                "edges": edges.tolist(),
+                "shares": (bins / rows).tolist(),
+                "missing_share": float(self._missing[col]) / rows,
+                "min": float(counts.index.min()),
+                "max": float(counts.index.max()),
+            }
+        return {"rows": rows, "created": datetime.datetime.now().isoformat(timespec="seconds"),
+                "categorical": categorical, "numeric": numeric}
+
+
+def write_reference(reference: dict, out_dir: str) -> None:
+    path = f"{out_dir}/{REFERENCE_FILE}"
+    with open(f"{path}.tmp", "w", encoding="utf-8") as fh:
+        json.dump(reference, fh)
+    os.replace(f"{path}.tmp", path)
+
+
+def load_reference(files_dir: str = FILES_DIR) -> dict | None:
+    """The exported reference summary, or ``None`` when there is none or it cannot be read."""
+    path = f"{files_dir}/{REFERENCE_FILE}"
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError) as exc:
+        logger.error("Drift reference not loaded: %s", exc)
+        return None
+
+
+def psi(actual: np.ndarray, expected: np.ndarray) -> float:
+    """Population stability index of two share vectors over the same bins."""
+    actual, expected = np.maximum(actual, PSI_FLOOR), np.maximum(expected, PSI_FLOOR)
+    return float(((actual - expected) * np.log(actual / expected)).sum())
+
+
+def drift_status(value: float | None) -> str:
+    if value is None:
+        return "n/a"
+    return "major" if value > PSI_MAJOR else "moderate" if value > PSI_MODERATE else "stable"
+
+
+# ---------------------------------------------------------------------------
+# Unseen-value sketch
+# ---------------------------------------------------------------------------
+class SpaceSaving:
+    """
+    The most frequent values of a stream in ``size`` counters (Metwally et al.).
+
+    A value arriving when every counter is taken replaces the smallest one and
+    inherits its count, so counts are upper bounds: each overcounts by at most
+    its recorded ``error``, and any value with more than ``total / size``
+    occurrences is guaranteed to be kept.
+    """
+
+    def __init__(self, size: int = SKETCH_SIZE) -> None:
+        self.size = size
+        self.counters: dict[str, list[int]] = {}    # value → [count, error]
+
+    def add(self, value: str, count: int = 1) -> None:
+        counter = self.counters.get(value)
+        if counter is not None:
+            counter[0] += count
+        elif len(self.counters) < self.size:
+            self.counters[value] = [count, 0]
+        else:
+            smallest = min(self.counters, key=lambda key: self.counters[key][0])
+            floor = self.counters.pop(smallest)[0]
+            self.counters[value] = [floor + count, floor]
+
+    def top(self, n: int = TOP_UNSEEN) -> list[dict]:
+        ranked = sorted(self.counters.items(), key=lambda item: -item[1][0])[:n]
+        return [{"value": value, "count": count, "max_overcount": error} for value, (count, error) in ranked]
+
+
+# ---------------------------------------------------------------------------
+# Monitor
+# ---------------------------------------------------------------------------
+class DriftMonitor:
+    """
+    Streaming input summaries for one model version.
+
+    Categorical bins are the reference's top categories, then "other known",
+    "missing" and "unseen"; numeric bins are the reference's quantile bins,
+    then "missing", "below the training minimum" and "above the maximum" (the
+    last two also counted in the outermost bins).  Without a reference only
+    the known/missing/unseen split is kept and no PSI is reported.
+    """
+
+    def __init__(self, transform, reference: dict | None = None, window: int = DEFAULT_WINDOW,
+                 sketch_size: int = SKETCH_SIZE) -> None:
+        self.reference = reference
+        self.window = window
+        categorical = (reference or {}).get("categorical", {})
+        numeric = (reference or {}).get("numeric", {})
+
+        # col → (canonical value → bin, missing bin, unseen bin)
+        self._categorical: dict[str, tuple[dict[str, int], int, int]] = {}
+        for col in CATEGORICAL_COLUMNS:
+            top = categorical.get(col, {}).get("categories", [])
+            bins = dict.fromkeys(transform.categories(col), len(top))
+            bins.update((value, i) for i, value in enumerate(top))
+            self._categorical[col] = (bins, len(top) + 1, len(top) + 2)
+        # col → (edges, missing bin, min, max)
+        self._numeric: dict[str, tuple[list[float], int, float, float]] = {}
+        for col in NUMERIC_COLUMNS:
+            summary = numeric.get(col, {})
+            edges = summary.get("edges", [])
+            self._numeric[col] = (edges, len(edges) + 1, summary.get("min", -np.inf), summary.get("max", np.inf))
+
+        self._lock = threading.Lock()
+        self._current = self._empty()
+        self._previous: dict[str, list[int]] | None = None
+        self._rows = self._previous_rows = 0
+        self.observed = 0
+        self.unseen = {col: SpaceSaving(sketch_size) for col in CATEGORICAL_COLUMNS}
+
+    def _empty(self) -> dict[str, list[int]]:
+        counts = {col: [0] * (unseen + 1) for col, (_, _, unseen) in self._categorical.items()}
+        counts.update({col: [0] * (missing + 3) for col, (_, missing, _, _) in self._numeric.items()})
+        return counts
+
+    def _advance(self, rows: int) -> None:
+        """Count ``rows`` more observations; caller holds the lock."""
+        self._rows += rows
+        self.observed += rows
+        if self._rows >= self.window:
+            self._previous, self._previous_rows = self._current, self._rows
+            self._current, self._rows = self._empty(), 0
+
+    # -- observation ---------------------------------------------------------
+    def _observe(self, record: dict) -> list[str]:
+        unseen_columns = []
+        counts = self._current
+        for col, (bins, missing, unseen) in self._categorical.items():
+            value = record[col]
+            if is_missing(value):
+                counts[col][missing] += 1
+                continue
+            key = canonical(col, value)
+            position = bins.get(key)
+            if position is None:
+                counts[col][unseen] += 1
+                self.unseen[col].add(key)
+                unseen_columns.append(col)
+            else:
+                counts[col][position] += 1
+        for col, (edges, missing, low, high) in self._numeric.items():
+            value = record[col]
+            if is_missing(value):
+                counts[col][missing] += 1
+                continue
+            counts[col][bisect.bisect_right(edges, value)] += 1
+            if value < low:
+                counts[col][missing + 1] += 1
+            elif value > high:
+                counts[col][missing + 2] += 1
+        return unseen_columns
+
+    def observe(self, record: dict) -> list[str]:
+        """
+        Count one model input (the twelve ``FEATURE_COLUMNS``).
+
+        Returns
+        -------
+        The categorical columns whose value was not seen in training.
+        """
+        with self._lock:
+            unseen_columns = self._observe(record)
+            self._advance(1)
+        for col in unseen_columns:
+            UNSEEN_CATEGORIES.inc(1, col)
+        return unseen_columns
+
+    def observe_records(self, records: list[dict]) -> int:
+        """Count a batch of records under one lock; returns how many had an unseen value."""
+        unseen_columns = []
+        with self._lock:
+            for record in records:
+                unseen_columns.append(self._observe(record))
+            self._advance(len(records))
+        for columns in unseen_columns:
+            for col in columns:
+                UNSEEN_CATEGORIES.inc(1, col)
+        return sum(1 for columns in unseen_columns if columns)
+
+    def observe_frame(self, frame: pd.DataFrame) -> None:
+        """Vectorised :meth:`observe` for a whole frame: one pass per column over its distinct values."""
+        added: dict[str, np.ndarray] = {}
+        unseen_values: dict[str, list[tuple[str, int]]] = {}
+        for col, (bins, missing, unseen) in self._categorical.items():
+            values = normalize_column(frame[col], col)
+            positions = np.array([bins.get(value, unseen) for value in values.categories] + [missing], dtype=np.int64)
+            added[col] = np.bincount(positions[values.codes], minlength=unseen + 1)
+            per_category = np.bincount(values.codes[values.codes >= 0], minlength=len(values.categories))
+            unseen_values[col] = [(str(values.categories[i]), int(per_category[i]))
+                                  for i in np.flatnonzero((positions[:-1] == unseen) & (per_category > 0))]
+        for col, (edges, missing, low, high) in self._numeric.items():
+            values = frame[col].to_numpy(dtype=np.float64)
+            nan = np.isnan(values)
+            positions = np.searchsorted(edges, values, side="right")
+            positions[nan] = missing
+            counts = np.bincount(positions, minlength=missing + 3)
+            counts[missing + 1] = int((values < low).sum())
+            counts[missing + 2] = int((values > high).sum())
+            added[col] = counts
+
+        with self._lock:
+            for col, counts in added.items():
+                current = self._current[col]
+                for i, count in enumerate(counts.tolist()):
+                    current[i] += count
+            for col, values in unseen_values.items():
+                for value, count in values:
+                    self.unseen[col].add(value, count)
+            self._advance(len(frame))
+        for col, values in unseen_values.items():
+            if values:
+                UNSEEN_CATEGORIES.inc(sum(count for _, count in values), col)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._current, self._previous = self._empty(), None
+            self._rows = self._previous_rows = self.observed = 0
+            self.unseen = {col: SpaceSaving(sketch.size) for col, sketch in self.unseen.items()}
+
+    # -- reporting -----------------------------------------------------------
+    def _expected(self, col: str) -> np.ndarray | None:
+        """Reference shares in the monitor's bin order, without the range counters."""
+        if self.reference is None:
+            return None
+        if col in self._categorical:
+            summary = self.reference["categorical"][col]
+            shares = np.array(summary["shares"] + [summary["other_share"], summary["missing_share"],
+                                                   summary.get("unseen_share", 0.0)])
+            return shares / shares.sum()
+        summary = self.reference["numeric"][col]
+        return np.array(summary["shares"] + [summary["missing_share"]])
+
+    def report(self) -> dict:
+        """
+        Drift of the current window against the reference.
+
+        Returns
+        -------
+        ``rows`` in the window, ``observed`` since the monitor started, and
+        per column its ``psi``/``status`` plus unseen, missing and
+        out-of-range rates; ``drifted`` lists the columns with major drift.
+        """
+        with self._lock:
+            counts = {col: np.array(values, dtype=np.int64) for col, values in self._current.items()}
+            if self._previous is not None:
+                for col, values in self._previous.items():
+                    counts[col] += np.array(values, dtype=np.int64)
+            rows = self._rows + (self._previous_rows if self._previous is not None else 0)
+            observed = self.observed
+            unseen = {col: sketch.top() for col, sketch in self.unseen.items()}
+
+        columns = {}
+        for col, (_, missing, unseen_bin) in self._categorical.items():
+            column = counts[col]
+            expected = self._expected(col)
+            value = psi(column / rows, expected) if expected is not None and rows >= MIN_ROWS else None
+            columns[col] = {"psi": value, "status": drift_status(value),
+                            "unseen_rate": column[unseen_bin] / rows if rows else 0.0,
+                            "missing_rate": column[missing] / rows if rows else 0.0,
+                            "top_unseen": unseen[col]}
+        for col, (_, missing, _, _) in self._numeric.items():
+            column = counts[col]
+            expected = self._expected(col)
+            value = (psi(column[:missing + 1] / rows, expected)
+                     if expected is not None and rows >= MIN_ROWS else None)
+            columns[col] = {"psi": value, "status": drift_status(value),
+                            "missing_rate": column[missing] / rows if rows else 0.0,
+                            "below_range_rate": column[missing + 1] / rows if rows else 0.0,
+                            "above_range_rate": column[missing + 2] / rows if rows else 0.0}
+
+        for col, column in columns.items():
+            if column["psi"] is not None:
+                INPUT_DRIFT_PSI.set(column["psi"], col)
+        scored = {col: column["psi"] for col, column in columns.items() if column["psi"] is not None}
+        return {
+            "rows": rows,
+            "observed": observed,
+            "window": self.window,
+            "reference_rows": (self.reference or {}).get("rows"),
+            "max_psi": max(scored.values()) if scored else None,
+            "drifted": [col for col, value in scored.items() if value > PSI_MAJOR],
+            "columns": columns,
+        }
+
+
+def format_report(report: dict) -> str:
+    lines = [f"{report['rows']:,} inputs in the window ({report['observed']:,} observed), "
+             f"reference of {report['reference_rows'] or 0:,} training rows",
+             f"{'column':<14}{'PSI':>8}  {'status':<10}{'unseen':>9}{'missing':>9}{'outside':>9}  top unseen"]
+    for col, column in report["columns"].items():
+        value = "—" if column["psi"] is None else f"{column['psi']:.3f}"
+        outside = column.get("below_range_rate", 0.0) + column.get("above_range_rate", 0.0)
+        top = ", ".join(f"{entry['value']} ({'≤' if entry['max_overcount'] else ''}{entry['count']:,})"
+                        for entry in column.get("top_unseen", [])[:3])
+        unseen = f"{column['unseen_rate']:.2%}" if "unseen_rate" in column else ""
+        outside = f"{outside:.2%}" if col in NUMERIC_COLUMNS else ""
+        lines.append(f"{col:<14}{value:>8}  {column['status']:<10}{unseen:>9}{column['missing_rate']:>9.2%}"
+                     f"{outside:>9}  {top}")
+    return "\n".join(lines)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Input drift against the training data.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    report_cmd = commands.add_parser("report", help="Drift of a prediction log against the served version.")
+    report_cmd.add_argument("log", help="Prediction log directory or a single segment file.")
+    report_cmd.add_argument("--registry", help="Model registry; its active version is used (default: registry/).")
+    report_cmd.add_argument("--files-dir", default=FILES_DIR, help="Artefacts when the registry has none.")
+    report_cmd.add_argument("--limit", type=int, help="Read at most this many predictions.")
+    report_cmd.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    reference_cmd = commands.add_parser("reference", help="Write the reference for existing artefacts.")
+    reference_cmd.add_argument("data", help="The training CSV (car_prices.csv format).")
+    reference_cmd.add_argument("--out", default=FILES_DIR)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "reference":
+        from sklearn.model_selection import train_test_split
+
+        from train_pipeline import SPLIT_SEED, TRAIN_SIZE, clean_frame, read_raw
+
+        # The pipeline's split, so the reference describes the rows the encoder was fitted on.
+        train, test = train_test_split(clean_frame(read_raw(args.data)), train_size=TRAIN_SIZE, random_state=SPLIT_SEED)
+        write_reference(build_reference(train, test), args.out)
+        logger.info("Wrote %s/%s from %d training rows.", args.out, REFERENCE_FILE, len(train))
+        return
+
+    from registry import REGISTRY_DIR, ModelWatcher, load_version
+    from replay import iter_frames
+
+    loaded = load_version(*ModelWatcher(args.registry or REGISTRY_DIR, args.files_dir).target())
+    if loaded is None:
+        raise SystemExit("Model artefacts could not be loaded.")
+    if loaded.drift_reference is None:
+        logger.warning("Version %s has no %s; only unseen categories are reported.", loaded.version, REFERENCE_FILE)
+    monitor = DriftMonitor(loaded.transform, loaded.drift_reference, window=2 ** 62)    # the whole log
+    for frame in iter_frames(args.log, limit=args.limit):
+        monitor.observe_frame(frame)
+    report = monitor.report()
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Car Price AI — Inference Core
+=============================
+Artefact loading and vectorised scoring shared by the Streamlit app and the
+headless entry points.
+"""
+
+import contextlib
+import hashlib
+import logging
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from catalogue import load_options
+from metrics import PREDICTION_ERRORS, PREDICTIONS, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+FILES_DIR = "files"
+
+# Column order the encoder and scaler were fitted on.
+FEATURE_COLUMNS: list[str] = [
+    "make", "model", "trim", "body", "transmission", "state", "condition",
+    "odometer", "color", "interior", "seller", "car_age",
+]
+CATEGORICAL_COLUMNS: list[str] = [
+    "make", "model", "trim", "body", "transmission", "state", "color", "interior", "seller",
+]
+NUMERIC_COLUMNS: list[str] = ["condition", "odometer", "car_age"]
+
+# What-if grid: a configured car re-scored over mileage, the next few years
+# and nearby conditions — every scenario in one predict call.
+WHAT_IF_ODOMETER_MAX      = 200_000
+WHAT_IF_ODOMETER_STEPS    = 11
+WHAT_IF_YEARS_AHEAD       = 5
+WHAT_IF_CONDITION_OFFSETS = [-1.0, -0.5, 0.0, 0.5, 1.0]
+
+# Per-field price attribution: one TreeSHAP value per model input plus the
+# model's base value; a row of contributions sums to the predicted price.
+BASE_VALUE = "base_value"
+CONTRIBUTION_COLUMNS: list[str] = FEATURE_COLUMNS + [BASE_VALUE]
+
+MODEL_ARTEFACTS: list[str] = [
+    "xgb_model.joblib", "target_encoder.joblib", "scaler.joblib", "bundle/manifest.json", "tiers.json",
+    "comparables/partitions.json", "drift_reference.json",
+]
+UPDATING_FILE = ".updating"     # present while a writer is replacing artefacts one by one
+
+
+# ---------------------------------------------------------------------------
+# Resource loading
+# ---------------------------------------------------------------------------
+def load_artefacts(files_dir: str = FILES_DIR) -> tuple:
+    """
+    Load ML artefacts from disk.
+
+    Returns
+    -------
+    (ml_model, encoder, scaler, options) or (None, None, None, None) on failure.
+    """
+    def _timed(label: str, loader):
+        started = time.perf_counter()
+        result = loader()
+        logger.info("Loaded %s in %.0f ms.", label, (time.perf_counter() - started) * 1_000)
+        return result
+
+    try:
+        ml_model = _timed("xgb_model.joblib",      lambda: joblib.load(f"{files_dir}/xgb_model.joblib"))
+        encoder  = _timed("target_encoder.joblib", lambda: joblib.load(f"{files_dir}/target_encoder.joblib"))
+        scaler   = _timed("scaler.joblib",         lambda: joblib.load(f"{files_dir}/scaler.joblib"))
+        options  = _timed("options",               lambda: load_options(files_dir))
+        logger.info("All model artefacts loaded successfully.")
+        return ml_model, encoder, scaler, options
+    except FileNotFoundError as exc:
+        logger.error("Artefact not found: %s", exc)
+        return None, None, None, None
+    except Exception as exc:  # noqa: BLE001
+        logger.error("Unexpected error loading artefacts: %s", exc)
+        return None, None, None, None
+
+
+def artefact_fingerprint(files_dir: str = FILES_DIR) -> str:
+    """
+    Cheap identity of the model artefacts currently on disk.
+
+    Built from file sizes and modification times, so it changes whenever an
+    artefact is replaced without having to hash megabytes of pickles.
+    """
+    parts = []
+    for name in MODEL_ARTEFACTS + [UPDATING_FILE]:
+        try:
+            st = os.stat(os.path.join(files_dir, name))
+            parts.append(f"{name}:{st.st_size}:{st.st_mtime_ns}")
+        except FileNotFoundError:
+            parts.append(f"{name}:missing")
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def artefacts_updating(files_dir: str = FILES_DIR) -> bool:
+    """True while :func:`updating_artefacts` holds ``files_dir`` (or a writer inside it failed)."""
+    return os.path.exists(os.path.join(files_dir, UPDATING_FILE))
+
+
+@contextlib.contextmanager
+def updating_artefacts(files_dir: str = FILES_DIR):
+    """
+    Mark ``files_dir`` as being rewritten for the duration of the block.
+
+    Writers replace artefacts one file at a time; the model watcher does not
+    load a marked directory, so it never pairs one version's model with
+    another's encoder.  The marker is only removed when the block succeeds:
+    a failed writer leaves a directory that should not be served.
+    """
+    os.makedirs(files_dir, exist_ok=True)
+    path = os.path.join(files_dir, UPDATING_FILE)
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(str(os.getpid()))
+    yield
+    os.remove(path)
+
+
+# ---------------------------------------------------------------------------
+# Scoring
+# ---------------------------------------------------------------------------
+def _score(predict, build_features, path: str, timings: dict[str, float] | None = None) -> np.ndarray:
+    """
+    Run transform → ``predict``, recording per-stage latency, row and error counts.
+
+    When given, ``timings`` receives this call's ``transform`` and ``predict`` seconds.
+    """
+    stage = "transform"
+    try:
+        started = time.perf_counter()
+        features = build_features()
+        transformed = time.perf_counter()
+        stage = "predict"
+        prices = predict(features)
+        finished = time.perf_counter()
+    except Exception:
+        PREDICTION_ERRORS.inc(1, stage)
+        raise
+    STAGE_SECONDS.observe(transformed - started, "transform")
+    STAGE_SECONDS.observe(finished - transformed, "predict")
+    if timings is not None:
+        timings.update(transform=transformed - started, predict=finished - transformed)
+    PREDICTIONS.inc(len(prices), path)
+    return prices
+
+
+def predict_frame(ml_model, transform, frame: pd.DataFrame) -> np.ndarray:
+    """
+    Score every row of ``frame`` with one transform → predict pass.
+
+    ``transform`` is a ``CompiledTransform``; ``frame`` must contain all of
+    ``FEATURE_COLUMNS`` and extra columns are ignored.
+    """
+    return _score(ml_model.predict, lambda: transform.transform(frame), "frame")
+
+
+def predict_records(ml_model, transform, records: list[dict], timings: dict[str, float] | None = None) -> np.ndarray:
+    """Score a few dict rows without building a DataFrame — the interactive path."""
+    return _score(ml_model.predict, lambda: transform.transform_records(records), "records", timings)
+
+
+def scenario_grid(axes: dict[str, list[float]]) -> pd.DataFrame:
+    """Every combination of the values in ``axes`` (column → values), one row per scenario."""
+    mesh = np.meshgrid(*axes.values(), indexing="ij")
+    return pd.DataFrame({col: values.ravel() for col, values in zip(axes, mesh)})
+
+
+def what_if_axes(record: dict) -> dict[str, list[float]]:
+    """Scenario values for the what-if grid around ``record``."""
+    return {
+        "odometer":  np.linspace(0, max(WHAT_IF_ODOMETER_MAX, record["odometer"]), WHAT_IF_ODOMETER_STEPS).tolist(),
+        "car_age":   [record["car_age"] + years for years in range(WHAT_IF_YEARS_AHEAD + 1)],
+        "condition": sorted({round(min(5.0, max(1.0, record["condition"] + offset)), 1)
+                             for offset in WHAT_IF_CONDITION_OFFSETS}),
+    }
+
+
+def predict_scenarios(ml_model, transform, record: dict, grid: pd.DataFrame) -> np.ndarray:
+    """
+    Score ``record`` under every scenario in ``grid`` with one predict call.
+
+    ``grid`` holds numeric columns only (see :func:`scenario_grid`); the
+    categorical fields are encoded once and shared by all scenarios.
+    """
+    numeric = {col: grid[col].to_numpy() for col in grid.columns}
+    return _score(ml_model.predict, lambda: transform.transform_scenarios(record, numeric), "scenarios")
+
+
+# ---------------------------------------------------------------------------
+# Explanations
+# ---------------------------------------------------------------------------
+def feature_contributions(ml_model, features: np.ndarray, approximate: bool = False) -> np.ndarray:
+    """
+    XGBoost's TreeSHAP (``pred_contribs``) for already-transformed ``features``.
+
+    The encoder and scaler map every input field to exactly one model column,
+    so the values are per field as they are: shape ``(rows, 13)`` in
+    ``CONTRIBUTION_COLUMNS`` order, each row summing to the predicted price.
+    A serving tier (``tiers.TieredModel``) is explained over its own trees.
+
+    Exact TreeSHAP costs trees × leaves × depth² per row — tens of
+    milliseconds on the full 1,000-tree model.  ``approximate`` uses XGBoost's
+    ``approx_contribs`` (Saabas: each split's change in expected value along
+    the row's path) instead, which costs about as much as a few predictions.
+    """
+    if hasattr(ml_model, "contributions"):
+        return ml_model.contributions(features, approximate)
+    from xgboost import DMatrix
+
+    return ml_model.get_booster().predict(DMatrix(features), pred_contribs=True, approx_contribs=approximate)
+
+
+def explain_records(ml_model, transform, records: list[dict], approximate: bool = False,
+                    timings: dict[str, float] | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Prices and per-field contributions of a few dict rows in one model call.
+
+    Returns
+    -------
+    (prices, contributions) — the prices are the contribution row sums.
+    """
+    contributions = _score(lambda x: feature_contributions(ml_model, x, approximate),
+                           lambda: transform.transform_records(records), "explain", timings)
+    return contributions.sum(axis=1), contributions
+
+
+def explain_frame(ml_model, transform, frame: pd.DataFrame,
+                  approximate: bool = False) -> tuple[np.ndarray, np.ndarray]:
+    """:func:`explain_records` for every row of ``frame``."""
+    contributions = _score(lambda x: feature_contributions(ml_model, x, approximate),
+                           lambda: transform.transform(frame), "explain")
+    return contributions.sum(axis=1), contributions
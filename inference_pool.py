@@ -0,0 +1,178 @@
+"""
+Car Price AI — Inference Pool
+=============================
+Process-wide executor every interactive prediction is submitted to.
+
+Streamlit runs each session's script on its own thread; scoring inline there
+lets concurrent users' predictions pile onto the cores at once (each XGBoost
+call spawning a thread per core) and ties a slow prediction to that user's
+page.  :class:`InferencePool` gives the whole process a fixed set of worker
+threads behind a bounded queue instead:
+
+- ``workers`` threads take prediction calls off the queue; XGBoost releases
+  the GIL while it walks the trees, so workers run on separate cores.
+- The model is pinned to ``threads_per_worker`` XGBoost threads, so
+  ``workers × threads_per_worker`` never exceeds the cores available.
+- When ``max_queue`` calls are already waiting, :meth:`InferencePool.submit`
+  raises :class:`ServiceBusy` at once instead of letting the backlog grow.
+
+Usage
+-----
+    pool = InferencePool(ml_model, workers=4, max_queue=64)
+    prices = pool.run(predict_records, ml_model, transform, records)
+    python -m benchmarks.bench_inference_pool          # throughput vs. workers
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+
+from metrics import POOL_REJECTIONS, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+DEFAULT_MAX_QUEUE = 64
+DEFAULT_TIMEOUT   = 30.0   # seconds a caller waits for its result
+
+
+class ServiceBusy(Exception):
+    """Raised when the prediction queue is full."""
+
+
+def available_cores() -> int:
+    """CPUs this process may run on (respects taskset / container CPU sets)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def pin_threads(ml_model, nthread: int | None) -> None:
+    """
+    Limit the XGBoost threads one predict call of ``ml_model`` may use.
+
+    ``None`` restores XGBoost's default of every core; other models are left alone.
+    """
+    if hasattr(ml_model, "get_booster"):
+        ml_model.set_params(n_jobs=nthread)
+
+
+# ---------------------------------------------------------------------------
+# Pool
+# ---------------------------------------------------------------------------
+class InferencePool:
+    """
+    Fixed worker threads draining a bounded queue of prediction calls.
+
+    Parameters
+    ----------
+    ml_model
+        Model whose XGBoost thread count is pinned; tier models cut from it
+        share its booster and so the same setting.
+    workers : int | None
+        Worker threads; defaults to one per available core.
+    threads_per_worker : int | None
+        XGBoost threads per predict call; defaults to the cores left per worker.
+    max_queue : int
+        Calls waiting for a worker before :meth:`submit` refuses new ones.
+    """
+
+    def __init__(self, ml_model, workers: int | None = None, threads_per_worker: int | None = None,
+                 max_queue: int = DEFAULT_MAX_QUEUE) -> None:
+        cores = available_cores()
+        self.workers = workers or cores
+        self.threads_per_worker = threads_per_worker or max(1, cores // self.workers)
+        self.max_queue = max_queue
+        pin_threads(ml_model, self.threads_per_worker)
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self.submitted = self.completed = self.rejected = self.errors = self.active = 0
+        self._threads = [
+            threading.Thread(target=self._work, name=f"inference-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info("Inference pool: %d workers × %d XGBoost threads on %d cores, queue ≤ %d.",
+                    self.workers, self.threads_per_worker, cores, max_queue)
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """
+        Queue ``fn(*args)`` for a worker.
+
+        Raises ``ServiceBusy`` when ``max_queue`` calls are already waiting.
+        """
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((fn, args, future, time.perf_counter()))
+        except queue.Full:
+            POOL_REJECTIONS.inc()
+            with self._lock:
+                self.rejected += 1
+            raise ServiceBusy("Prediction queue is full") from None
+        with self._lock:
+            self.submitted += 1
+        return future
+
+    def run(self, fn: Callable, *args, timeout: float = DEFAULT_TIMEOUT):
+        """:meth:`submit` and wait for the result; a call still queued at ``timeout`` is cancelled."""
+        future = self.submit(fn, *args)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def _work(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            fn, args, future, queued_at = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            STAGE_SECONDS.observe(time.perf_counter() - queued_at, "queue")
+            with self._lock:
+                self.active += 1
+            try:
+                result = fn(*args)
+            except BaseException as exc:  # noqa: BLE001
+                future.set_exception(exc)
+                ok = False
+            else:
+                future.set_result(result)
+                ok = True
+            with self._lock:
+                self.active -= 1
+                self.completed += ok
+                self.errors += not ok
+
+    def close(self) -> None:
+        """Let queued calls finish, then stop the workers."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def stats(self) -> dict:
+        """Configuration, counters and how busy the pool is right now."""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "threads_per_worker": self.threads_per_worker,
+                "max_queue": self.max_queue,
+                "queue_depth": self._queue.qsize(),
+                "active": self.active,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "errors": self.errors,
+            }
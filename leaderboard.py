@@ -0,0 +1,229 @@
+"""
+Car Price AI — Model Leaderboard
+================================
+Trains and scores the notebook's nine candidate models on the training
+pipeline's cached split and writes ``files/leaderboard.json``, which the app's
+accuracy chart and ranking table are rendered from.
+
+Each candidate runs in its own worker process (threads per worker split
+evenly across the machine) and is measured on the same test split for
+
+* fit and full-test-set predict time,
+* single-row latency — the median and p95 of ``LATENCY_CALLS`` one-row
+  predictions, the shape of an interactive request,
+* model size — the pickled size, i.e. what the app would load,
+* MAE, RMSE and R².
+
+The notebook's models use their default parameters; XGBoost uses the
+parameters the pipeline ships (or ``--params``), since that is the model
+being served.  LightGBM and CatBoost are optional: when they are not
+installed the candidate is listed under ``skipped``.
+
+Usage
+-----
+    python leaderboard.py --data car_prices.csv
+    python leaderboard.py --data car_prices.csv --models "Linear Regression" XGBoost --workers 2
+"""
+
+import argparse
+import datetime
+import importlib
+import json
+import logging
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from inference import FEATURE_COLUMNS, FILES_DIR
+from train_pipeline import CACHE_DIR, RAW_CSV, TARGET, XGB_PARAMS, TrainingPipeline, evaluate
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+FORMAT_VERSION   = 1
+LEADERBOARD_FILE = f"{FILES_DIR}/leaderboard.json"
+DEPLOYED_MODEL   = "XGBoost"
+LATENCY_CALLS    = 200
+
+# (name, module, class, constructor params, thread-count parameter) in the notebook's order.
+CANDIDATES: list[tuple[str, str, str, dict, str | None]] = [
+    ("Linear Regression", "sklearn.linear_model", "LinearRegression",          {},                                   None),
+    ("KNN",               "sklearn.neighbors",    "KNeighborsRegressor",       {},                                   "n_jobs"),
+    ("Decision Tree",     "sklearn.tree",         "DecisionTreeRegressor",     {"random_state": 7},                  None),
+    ("Random Forest",     "sklearn.ensemble",     "RandomForestRegressor",     {"random_state": 7},                  "n_jobs"),
+    ("Gradient Boosting", "sklearn.ensemble",     "GradientBoostingRegressor", {"random_state": 7},                  None),
+    ("XGBoost",           "xgboost",              "XGBRegressor",              XGB_PARAMS,                           "n_jobs"),
+    ("LightGBM",          "lightgbm",             "LGBMRegressor",             {"random_state": 7, "verbosity": -1}, "n_jobs"),
+    ("CatBoost",          "catboost",             "CatBoostRegressor",         {"random_state": 7, "silent": True},  "thread_count"),
+    ("AdaBoost",          "sklearn.ensemble",     "AdaBoostRegressor",         {"random_state": 7},                  None),
+]
+
+# Worker-process state, filled once by _init_worker.
+_DATA: dict[str, np.ndarray] = {}
+
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+def _init_worker(scale_dir: str) -> None:
+    for name in ("train", "test"):
+        frame = pd.read_parquet(f"{scale_dir}/{name}.parquet")
+        _DATA[f"x_{name}"] = frame[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+        _DATA[f"y_{name}"] = frame[TARGET].to_numpy(dtype=np.float32)
+
+
+def run_candidate(candidate: tuple, n_jobs: int, latency_calls: int = LATENCY_CALLS) -> dict:
+    """Fit one candidate on the cached training split and measure it on the test split."""
+    name, module, cls, params, thread_param = candidate
+    try:
+        estimator = getattr(importlib.import_module(module), cls)
+    except ImportError:
+        return {"name": name, "error": f"{module} is not installed"}
+
+    params = {**params, thread_param: n_jobs} if thread_param else dict(params)
+    x_train, y_train, x_test, y_test = _DATA["x_train"], _DATA["y_train"], _DATA["x_test"], _DATA["y_test"]
+
+    started = time.perf_counter()
+    ml_model = estimator(**params).fit(x_train, y_train)
+    fit_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    ml_model.predict(x_test)
+    predict_seconds = time.perf_counter() - started
+
+    # One row at a time, cycling through the test split, as the app sends them.
+    latencies = []
+    for i in range(latency_calls):
+        row = x_test[i % len(x_test)][None, :]
+        started = time.perf_counter()
+        ml_model.predict(row)
+        latencies.append(time.perf_counter() - started)
+
+    return {
+        "name": name,
+        **evaluate(ml_model, x_test, y_test),
+        "fit_seconds": round(fit_seconds, 3),
+        "predict_seconds": round(predict_seconds, 3),
+        "row_latency_ms": round(float(np.median(latencies)) * 1_000, 4),
+        "row_latency_p95_ms": round(float(np.percentile(latencies, 95)) * 1_000, 4),
+        "size_bytes": len(pickle.dumps(ml_model, protocol=pickle.HIGHEST_PROTOCOL)),
+        "params": {k: v for k, v in params.items() if k != thread_param},
+    }
+
+
+# ---------------------------------------------------------------------------
+# Harness
+# ---------------------------------------------------------------------------
+def run_leaderboard(scale_dir: str, candidates: list[tuple] = CANDIDATES, workers: int | None = None,
+                    latency_calls: int = LATENCY_CALLS) -> tuple[list[dict], list[dict]]:
+    """
+    Run every candidate on a process pool.
+
+    Returns
+    -------
+    (models sorted by test RMSE, skipped candidates with the reason)
+    """
+    workers = min(workers or os.cpu_count() or 1, len(candidates))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    models, skipped = [], []
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(scale_dir,)) as pool:
+        futures = [pool.submit(run_candidate, c, threads, latency_calls) for c in candidates]
+        for future in as_completed(futures):
+            result = future.result()
+            if "error" in result:
+                logger.warning("Skipping %s: %s", result["name"], result["error"])
+                skipped.append(result)
+                continue
+            logger.info("%-18s  rmse %8.2f  r2 %.4f  fit %7.2f s  row %.3f ms  %6.1f MB",
+                        result["name"], result["rmse"], result["r2"], result["fit_seconds"],
+                        result["row_latency_ms"], result["size_bytes"] / 1e6)
+            models.append(result)
+    return sorted(models, key=lambda m: m["rmse"]), skipped
+
+
+def write_leaderboard(report: dict, path: str = LEADERBOARD_FILE) -> None:
+    """Write ``report`` atomically so the app never reads a half-written file."""
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    os.replace(tmp, path)
+
+
+def load_leaderboard(path: str = LEADERBOARD_FILE) -> dict | None:
+    """The leaderboard report, or ``None`` if it is missing, unreadable or from another format."""
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            report = json.load(fh)
+    except (OSError, ValueError) as exc:
+        logger.error("Leaderboard not loaded: %s", exc)
+        return None
+    if report.get("format_version") != FORMAT_VERSION:
+        logger.error("Leaderboard %s has format %s, expected %d.", path, report.get("format_version"), FORMAT_VERSION)
+        return None
+    return report
+
+
+def leaderboard_version(path: str = LEADERBOARD_FILE) -> str:
+    """Cheap identity of the leaderboard file, for cache keys."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return "missing"
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def main(argv: list[str] | None = None) -> None:
+    names = [c[0] for c in CANDIDATES]
+    parser = argparse.ArgumentParser(description="Benchmark the candidate models and write the app's leaderboard.")
+    parser.add_argument("--data", default=RAW_CSV, help="Raw sales CSV (car_prices.csv).")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="Training pipeline cache.")
+    parser.add_argument("--out", default=LEADERBOARD_FILE, help="Where the leaderboard JSON is written.")
+    parser.add_argument("--models", nargs="+", choices=names, default=names, help="Subset of candidates to run.")
+    parser.add_argument("--workers", type=int, help="Parallel candidates (default: one per CPU).")
+    parser.add_argument("--latency-calls", type=int, default=LATENCY_CALLS, help="Single-row predictions timed.")
+    parser.add_argument("--params", help="JSON file with XGBoost parameters under 'params' (e.g. from tuning.py).")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    xgb_params = XGB_PARAMS
+    if args.params:
+        with open(args.params, "r", encoding="utf-8") as fh:
+            xgb_params = {**XGB_PARAMS, **json.load(fh)["params"]}
+    candidates = [(name, module, cls, xgb_params if name == DEPLOYED_MODEL else params, threads)
+                  for name, module, cls, params, threads in CANDIDATES if name in args.models]
+
+    pipeline = TrainingPipeline(args.data, args.cache_dir)
+    pipeline.run(until="scale")
+    scale_dir = pipeline.stage_dir("scale")
+    models, skipped = run_leaderboard(scale_dir, candidates, args.workers, args.latency_calls)
+
+    rows = {name: len(pd.read_parquet(f"{scale_dir}/{name}.parquet", columns=[TARGET])) for name in ("train", "test")}
+    write_leaderboard({
+        "format_version": FORMAT_VERSION,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "source": "leaderboard.py",
+        "data_key": pipeline.keys["scale"],
+        "rows": rows,
+        "deployed": DEPLOYED_MODEL,
+        "models": models,
+        "skipped": skipped,
+    }, args.out)
+
+    print(f"{'Model':<18} {'RMSE':>9} {'MAE':>9} {'R²':>7} {'fit s':>8} {'ms/row':>8} {'MB':>7}")
+    for m in models:
+        print(f"{m['name']:<18} {m['rmse']:>9.2f} {m['mae']:>9.2f} {m['r2']:>7.4f} "
+              f"{m['fit_seconds']:>8.2f} {m['row_latency_ms']:>8.3f} {m['size_bytes'] / 1e6:>7.1f}")
+    print(f"Leaderboard written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
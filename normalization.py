@@ -0,0 +1,74 @@
+"""
+Car Price AI — Category Normalisation
+=====================================
+One definition of the canonical spelling of every categorical value, shared
+by training, the app, batch scoring and the JSON service.
+
+The canonical form is the one the notebook's options export produced —
+``str.title().strip()``, or ``str.upper().strip()`` for ``state`` — so
+"BMW", "bmw" and "Bmw" all become "Bmw" and "ca" becomes "CA".  Missing
+values stay missing so the encoder's missing-value handling still applies.
+
+Columns are normalised through their categories: a column is converted to
+``category`` once, only its distinct values are case-mapped (vectorised),
+and the integer codes are remapped onto the merged categories.  For the
+sales data that is ~15k string operations instead of millions.
+
+Usage
+-----
+    python -m benchmarks.bench_normalization --data car_prices.csv
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from inference import CATEGORICAL_COLUMNS
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+UPPER_COLUMNS: frozenset[str] = frozenset({"state"})
+
+
+def is_missing(value) -> bool:
+    """True for a single missing value (``None`` or NaN), which keeps the encoder's missing encoding."""
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def canonical(col: str, value) -> str:
+    """Canonical spelling of a single value of ``col``."""
+    text = str(value)
+    return (text.upper() if col in UPPER_COLUMNS else text.title()).strip()
+
+
+def canonical_categories(col: str, categories: pd.Index) -> pd.Index:
+    """Vectorised :func:`canonical` over an index of distinct values (may contain duplicates after mapping)."""
+    text = categories.astype(str)
+    return (text.str.upper() if col in UPPER_COLUMNS else text.str.title()).str.strip()
+
+
+def normalize_column(values: pd.Series, col: str) -> pd.Categorical:
+    """
+    Canonical categorical version of ``values``.
+
+    Categories that collapse onto the same canonical spelling are merged, so
+    the result has one category per canonical value.
+    """
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype("category")
+    mapped = canonical_categories(col, values.cat.categories)
+    remap, merged = pd.factorize(mapped)
+    codes = values.cat.codes.to_numpy()
+    # Code -1 (missing) must stay -1 rather than index the last category.
+    new_codes = np.full(len(codes), -1, dtype=remap.dtype)
+    present = codes >= 0
+    new_codes[present] = remap[codes[present]]
+    return pd.Categorical.from_codes(new_codes, categories=pd.Index(merged, dtype=object))
+
+
+def normalize_frame(df: pd.DataFrame, columns: list[str] = CATEGORICAL_COLUMNS) -> pd.DataFrame:
+    """Copy of ``df`` with ``columns`` replaced by their canonical categoricals."""
+    return df.assign(**{col: normalize_column(df[col], col) for col in columns if col in df.columns})
+
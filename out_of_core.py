@@ -0,0 +1,432 @@
+"""
+Car Price AI — Out-of-core Training
+===================================
+Trains the production model from a sales file larger than memory and writes
+the same artefacts as the training pipeline, ready for ``load_resources``.
+
+The in-memory pipeline holds the whole CSV plus its split, encoded and
+scaled copies.  Here the file is only ever read ``--chunk-rows`` rows at a
+time, in five passes:
+
+    fill    missing odometer/condition medians, from merged value counts
+    split   clean each chunk and route every row to train or test by a hash
+            of its contents (deterministic, no shuffle of the whole file);
+            cleaned chunks are written as Parquet shards under the work dir,
+            while the target encoder's per-category counts/sums and the
+            option lists are accumulated, and the drift reference counted
+    scale   ``StandardScaler.partial_fit`` over the encoded training shards
+    train   XGBoost reads the shards through a ``DataIter`` into an
+            ``ExtMemQuantileDMatrix`` whose pages are cached on disk; test
+            metrics are accumulated shard by shard
+    index   the comparables index of the training shards: every row is
+            written straight to its ``(make, model)`` position in
+            memory-mapped arrays, so no sort of the whole split is needed
+
+The target encoder is rebuilt from the merged statistics with the same
+formula ``refresh.py`` uses, so the result matches fitting it on the whole
+training split.  Peak memory is set by the chunk size and the number of
+distinct categories, not by the number of rows.
+
+Usage
+-----
+    python out_of_core.py --data sales_history.csv --out files
+    python out_of_core.py --data sales_history.parquet --out /tmp/files --chunk-rows 100000
+    python out_of_core.py --data sales_history.csv --out files --params tuned_params.json
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from collections.abc import Iterator
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from catalogue import Catalogue, build_from_frame, build_from_options
+from comparables import INDEX_DIR, SEARCH_COLUMNS, SEARCH_POSITIONS, write_partitions
+from compiled_transform import CompiledTransform
+from drift import ReferenceBuilder, write_reference
+from inference import CATEGORICAL_COLUMNS, FEATURE_COLUMNS, FILES_DIR, NUMERIC_COLUMNS, updating_artefacts
+from refresh import STATS_FILE, encoder_from_stats, encoder_stats, merge_options, merge_stats
+from tiers import EVAL_ROWS, measure_tiers, write_tiers
+from train_pipeline import (CACHE_DIR, RAW_DTYPES, RUN_FILE, TARGET, TRAIN_SIZE, XGB_PARAMS, TrainingPipeline,
+                            _peak_rss_kib, _reset_peak_rss, clean_frame, filter_sales)
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+CHUNK_ROWS    = 250_000
+SPLIT_BUCKETS = 1_000      # rows hash into this many buckets; the first (1 - TRAIN_SIZE) share is test
+MAX_BIN       = 256
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+def iter_raw(path: str, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Chunks of a raw sales CSV or Parquet file, with the dtypes of ``read_raw``."""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=list(RAW_DTYPES)):
+            yield batch.to_pandas().astype(RAW_DTYPES)
+        return
+    yield from pd.read_csv(path, usecols=list(RAW_DTYPES), dtype=RAW_DTYPES, on_bad_lines="skip",
+                           chunksize=chunk_rows)
+
+
+def _median_from_counts(counts: pd.Series) -> float:
+    """Median of the values counted in ``counts`` (value → rows), as ``Series.median`` computes it."""
+    counts = counts.sort_index()
+    cumulative = counts.to_numpy().cumsum()
+    n = int(cumulative[-1])
+    lower, upper = np.searchsorted(cumulative, [(n - 1) // 2 + 1, n // 2 + 1])
+    return float((counts.index[lower] + counts.index[upper]) / 2)
+
+
+def is_test(frame: pd.DataFrame) -> np.ndarray:
+    """
+    Test-split mask from a hash of each row's contents.
+
+    The same row always lands on the same side, whichever chunk it is read in
+    and however the file is ordered.
+    """
+    buckets = pd.util.hash_pandas_object(frame[FEATURE_COLUMNS + [TARGET]], index=False).to_numpy() % SPLIT_BUCKETS
+    return buckets < round((1 - TRAIN_SIZE) * SPLIT_BUCKETS)
+
+
+# ---------------------------------------------------------------------------
+# Passes
+# ---------------------------------------------------------------------------
+def fill_values(path: str, chunk_rows: int = CHUNK_ROWS) -> dict[str, float]:
+    """Medians of ``odometer`` and ``condition`` over the usable rows, as ``clean_frame`` would fill them."""
+    counts: dict[str, pd.Series] = {}
+    for chunk in iter_raw(path, chunk_rows):
+        usable = filter_sales(chunk)
+        for col in ("odometer", "condition"):
+            chunk_counts = usable[col].value_counts()
+            counts[col] = chunk_counts if col not in counts else counts[col].add(chunk_counts, fill_value=0)
+    return {col: _median_from_counts(c) for col, c in counts.items()}
+
+
+def split_shards(path: str, work_dir: str, fills: dict[str, float],
+                 chunk_rows: int = CHUNK_ROWS) -> tuple[dict[str, list[str]], pd.DataFrame, dict, object, dict]:
+    """
+    Clean and split the file into Parquet shards.
+
+    Returns
+    -------
+    (shard paths per split, encoder statistics of the training rows, options
+    dict, target encoder fitted on the first training shard — a template
+    whose mappings :func:`encoder_from_stats` replaces — and the drift
+    reference of the training rows, with the test rows as its holdout)
+    """
+    import category_encoders as ce
+
+    shards: dict[str, list[str]] = {"train": [], "test": []}
+    stats, options, template = None, None, None
+    reference = ReferenceBuilder()
+    for i, chunk in enumerate(iter_raw(path, chunk_rows)):
+        frame = clean_frame(chunk, fills)
+        test = is_test(frame)
+        for name, rows in (("train", frame[~test]), ("test", frame[test])):
+            if len(rows):
+                shards[name].append(f"{work_dir}/{name}-{i:05d}.parquet")
+                rows.to_parquet(shards[name][-1], index=False)
+
+        train = frame[~test]
+        reference.add(train)
+        reference.add_holdout(frame[test])
+        chunk_stats = encoder_stats(train[FEATURE_COLUMNS], train[TARGET])
+        stats = chunk_stats if stats is None else merge_stats(stats, chunk_stats)
+        if template is None and len(train):
+            template = ce.TargetEncoder(cols=CATEGORICAL_COLUMNS, handle_unknown="value")
+            template.fit(train[FEATURE_COLUMNS], train[TARGET])
+
+        build_from_frame(frame[CATEGORICAL_COLUMNS], f"{work_dir}/catalogue-chunk")
+        chunk_options = Catalogue(f"{work_dir}/catalogue-chunk").to_dict()
+        options = chunk_options if options is None else merge_options(options, chunk_options)
+        shutil.rmtree(f"{work_dir}/catalogue-chunk")
+        logger.info("Chunk %d: %d train / %d test rows", i, int((~test).sum()), int(test.sum()))
+    return shards, stats, options, template, reference.reference()
+
+
+def _target_stats(shards: list[str]) -> tuple[int, float]:
+    rows, total = 0, 0.0
+    for shard in shards:
+        y = pd.read_parquet(shard, columns=[TARGET])[TARGET]
+        rows, total = rows + len(y), total + float(y.to_numpy(dtype=np.float64).sum())
+    return rows, total
+
+
+def fit_scaler(encoder, shards: list[str]):
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    for shard in shards:
+        frame = pd.read_parquet(shard)
+        scaler.partial_fit(encoder.transform(frame[FEATURE_COLUMNS]).astype(np.float32))
+    return scaler
+
+
+def _shard_iter(shards: list[str], transform: CompiledTransform, cache_prefix: str):
+    """An ``xgboost.DataIter`` feeding one transformed shard per batch."""
+    from xgboost import DataIter
+
+    class ShardIter(DataIter):
+        def __init__(self) -> None:
+            self._next = 0
+            super().__init__(cache_prefix=cache_prefix)
+
+        def next(self, input_data) -> bool:
+            if self._next == len(shards):
+                return False
+            frame = pd.read_parquet(shards[self._next])
+            input_data(data=transform.transform(frame), label=frame[TARGET].to_numpy(dtype=np.float32))
+            self._next += 1
+            return True
+
+        def reset(self) -> None:
+            self._next = 0
+
+    return ShardIter()
+
+
+def train_booster(shards: list[str], transform: CompiledTransform, xgb_params: dict, cache_prefix: str):
+    """Train the sklearn-wrapped model on the shards through XGBoost's external memory."""
+    import xgboost as xgb
+
+    ml_model = xgb.XGBRegressor(**xgb_params)
+    dtrain = xgb.ExtMemQuantileDMatrix(_shard_iter(shards, transform, cache_prefix), max_bin=MAX_BIN)
+    booster = xgb.train(ml_model.get_xgb_params(), dtrain, num_boost_round=xgb_params["n_estimators"])
+    ml_model.load_model(bytearray(booster.save_raw("ubj")))
+    return ml_model
+
+
+def streaming_metrics(ml_model, transform: CompiledTransform, shards: list[str]) -> dict[str, float]:
+    """R², MAE and RMSE over the shards, accumulated one shard at a time."""
+    n, abs_err, sq_err, y_sum, y_sq = 0, 0.0, 0.0, 0.0, 0.0
+    for shard in shards:
+        frame = pd.read_parquet(shard)
+        y = frame[TARGET].to_numpy(dtype=np.float64)
+        residual = y - ml_model.predict(transform.transform(frame))
+        n += len(y)
+        abs_err += float(np.abs(residual).sum())
+        sq_err += float((residual ** 2).sum())
+        y_sum += float(y.sum())
+        y_sq += float((y ** 2).sum())
+    return {
+        "r2": 1 - sq_err / (y_sq - y_sum ** 2 / n),
+        "mae": abs_err / n,
+        "rmse": float(np.sqrt(sq_err / n)),
+    }
+
+
+def index_shards(shards: list[str], transform: CompiledTransform, out_dir: str, work_dir: str,
+                 chunk_rows: int = CHUNK_ROWS) -> dict:
+    """
+    Write the comparables index of the shards into ``out_dir``, as ``comparables.build_index`` would.
+
+    A read of the make/model columns gives every partition's row range and
+    every column's categories.  Each shard is then transformed and its rows
+    written to their final positions in memory-mapped arrays (features into
+    ``features.npy``, sale fields into scratch files under ``work_dir``), and
+    ``sales.parquet`` is written from those ``chunk_rows`` rows at a time.
+
+    Returns
+    -------
+    The ``partitions.json`` contents.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sizes, categories = None, {col: set() for col in CATEGORICAL_COLUMNS}
+    for shard in shards:
+        frame = pd.read_parquet(shard, columns=CATEGORICAL_COLUMNS)
+        counts = frame.groupby([frame["make"].astype(str), frame["model"].astype(str)]).size()
+        sizes = counts if sizes is None else sizes.add(counts, fill_value=0)
+        for col in CATEGORICAL_COLUMNS:
+            categories[col].update(frame[col].cat.categories)
+    sizes = sizes.sort_index().astype(np.int64)
+    categories = {col: pd.Index(sorted(values), dtype=object) for col, values in categories.items()}
+    rows = int(sizes.sum())
+
+    schema = pq.read_schema(shards[0])
+    features = np.lib.format.open_memmap(f"{out_dir}/features.npy", mode="w+", dtype=np.float32,
+                                         shape=(rows, len(SEARCH_COLUMNS)))
+    columns = {col: np.lib.format.open_memmap(f"{work_dir}/index-{col}.npy", mode="w+", shape=(rows,),
+                                              dtype=np.int32 if col in categories else
+                                              schema.field(col).type.to_pandas_dtype())
+               for col in FEATURE_COLUMNS + [TARGET]}
+    cursor = np.r_[0, sizes.to_numpy().cumsum()[:-1]]
+    for shard in shards:
+        frame = pd.read_parquet(shard)
+        partition = sizes.index.get_indexer(pd.MultiIndex.from_arrays(
+            [frame["make"].astype(str), frame["model"].astype(str)]))
+        # Rows keep their shard order within a partition, as the stable sort in build_index keeps it.
+        order = np.argsort(partition, kind="stable")
+        ordered = partition[order]
+        position = np.empty(len(frame), dtype=np.int64)
+        position[order] = cursor[ordered] + np.arange(len(ordered)) - np.searchsorted(ordered, ordered)
+        cursor += np.bincount(partition, minlength=len(cursor))
+        features[position] = transform.transform(frame)[:, SEARCH_POSITIONS]
+        for col in CATEGORICAL_COLUMNS:
+            remap = np.append(categories[col].get_indexer(frame[col].cat.categories), -1)
+            columns[col][position] = remap[frame[col].cat.codes.to_numpy()]
+        for col in NUMERIC_COLUMNS + [TARGET]:
+            columns[col][position] = frame[col].to_numpy()
+    features.flush()
+
+    writer = None
+    for start in range(0, rows, chunk_rows):
+        block = pd.DataFrame({
+            col: pd.Categorical.from_codes(values[start:start + chunk_rows], categories=categories[col])
+            if col in categories else values[start:start + chunk_rows]
+            for col, values in columns.items()
+        })
+        table = pa.Table.from_pandas(block, preserve_index=False)
+        writer = writer or pq.ParquetWriter(f"{out_dir}/sales.parquet", table.schema)
+        writer.write_table(table)
+    writer.close()
+    del features, columns
+
+    makes, models = zip(*sizes.index)
+    return write_partitions(out_dir, list(makes), list(models), sizes.tolist())
+
+
+def _head(shards: list[str], rows: int) -> pd.DataFrame:
+    frames, total = [], 0
+    for shard in shards:
+        if total >= rows:
+            break
+        frames.append(pd.read_parquet(shard))
+        total += len(frames[-1])
+    return pd.concat(frames, ignore_index=True).head(rows)
+
+
+def _dump(obj, path: str) -> None:
+    joblib.dump(obj, f"{path}.tmp")
+    os.replace(f"{path}.tmp", path)
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+def train_out_of_core(data_path: str, out_dir: str = FILES_DIR, cache_dir: str = CACHE_DIR,
+                      chunk_rows: int = CHUNK_ROWS, xgb_params: dict | None = None) -> dict:
+    """
+    Run the five passes and write the artefacts to ``out_dir``.
+
+    Returns
+    -------
+    The ``training_run.json`` contents, including wall time and peak RSS per pass.
+    """
+    xgb_params = {**XGB_PARAMS, **(xgb_params or {})}
+    passes: list[dict] = []
+
+    def _timed(name: str, body):
+        _reset_peak_rss()
+        started = time.perf_counter()
+        result = body()
+        passes.append({"pass": name, "seconds": round(time.perf_counter() - started, 3),
+                       "peak_rss_mib": round(_peak_rss_kib() / 1024, 1)})
+        logger.info("%-5s ran in %.1f s, peak RSS %.0f MiB", name, passes[-1]["seconds"], passes[-1]["peak_rss_mib"])
+        return result
+
+    os.makedirs(cache_dir, exist_ok=True)
+    os.makedirs(out_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="out-of-core-", dir=cache_dir) as work_dir:
+        fills = _timed("fill", lambda: fill_values(data_path, chunk_rows))
+        shards, stats, options, template, reference = _timed(
+            "split", lambda: split_shards(data_path, work_dir, fills, chunk_rows))
+        rows, total = _target_stats(shards["train"])
+        encoder = encoder_from_stats(template, stats, total / rows)
+        scaler = _timed("scale", lambda: fit_scaler(encoder, shards["train"]))
+
+        transform = CompiledTransform.from_artefacts(encoder, scaler)
+        ml_model = _timed("train", lambda: train_booster(shards["train"], transform, xgb_params, f"{work_dir}/xgb"))
+        metrics = streaming_metrics(ml_model, transform, shards["test"])
+        logger.info("Test R² %.4f, MAE %.2f $, RMSE %.2f $", metrics["r2"], metrics["mae"], metrics["rmse"])
+        sample = _head(shards["test"], EVAL_ROWS)
+        tiers = measure_tiers(ml_model, transform.transform(sample), sample[TARGET].to_numpy(dtype=np.float32))
+        test_rows = sum(len(pd.read_parquet(s, columns=[TARGET])) for s in shards["test"])
+        index_dir = f"{out_dir}/{INDEX_DIR}.tmp-{os.getpid()}"
+        shutil.rmtree(index_dir, ignore_errors=True)
+        os.makedirs(index_dir)
+        _timed("index", lambda: index_shards(shards["train"], transform, index_dir, work_dir, chunk_rows))
+
+    with updating_artefacts(out_dir):
+        _dump(ml_model, f"{out_dir}/xgb_model.joblib")
+        _dump(encoder, f"{out_dir}/target_encoder.joblib")
+        _dump(scaler, f"{out_dir}/scaler.joblib")
+        stats.to_parquet(f"{out_dir}/{STATS_FILE}", index=False)
+        write_reference(reference, out_dir)
+        write_tiers(tiers, out_dir)
+        shutil.rmtree(f"{out_dir}/{INDEX_DIR}", ignore_errors=True)
+        os.replace(index_dir, f"{out_dir}/{INDEX_DIR}")
+        staging = f"{out_dir}/catalogue.tmp-{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        build_from_options(options, staging)
+        shutil.rmtree(f"{out_dir}/catalogue", ignore_errors=True)
+        os.replace(staging, f"{out_dir}/catalogue")
+        with open(f"{out_dir}/options.json", "w", encoding="utf-8") as fh:
+            json.dump(options, fh)
+        TrainingPipeline._refresh_bundle(out_dir)
+
+    run = {
+        "pipeline": "out_of_core",
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "data": os.path.abspath(data_path),
+        "chunk_rows": chunk_rows,
+        "rows": {"train": rows, "test": test_rows},
+        "fill_values": fills,
+        "xgb_params": xgb_params,
+        "metrics": metrics,
+        "passes": passes,
+    }
+    with open(f"{out_dir}/{RUN_FILE}", "w", encoding="utf-8") as fh:
+        json.dump(run, fh, indent=2)
+    return run
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Train the model from a sales file larger than memory.")
+    parser.add_argument("--data", required=True, help="Raw sales CSV or Parquet in the car_prices.csv format.")
+    parser.add_argument("--out", default=FILES_DIR, help="Where the artefacts are written.")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="Parent of the temporary shard and page cache.")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Rows read per chunk.")
+    parser.add_argument("--n-estimators", type=int, help="Override XGB_PARAMS['n_estimators'].")
+    parser.add_argument("--params", help="JSON file with XGBoost parameters under 'params' (e.g. from tuning.py).")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    overrides = {}
+    if args.params:
+        with open(args.params, "r", encoding="utf-8") as fh:
+            overrides.update(json.load(fh)["params"])
+    if args.n_estimators:
+        overrides["n_estimators"] = args.n_estimators
+
+    run = train_out_of_core(args.data, args.out, args.cache_dir, args.chunk_rows, overrides)
+    print(f"{'pass':<7} {'seconds':>8} {'peak RSS':>11}")
+    for p in run["passes"]:
+        print(f"{p['pass']:<7} {p['seconds']:>8.1f} {p['peak_rss_mib']:>7.0f} MiB")
+    m = run["metrics"]
+    print(f"{run['rows']['train']:,} train / {run['rows']['test']:,} test rows  "
+          f"R² {m['r2']:.4f}  MAE {m['mae']:.2f} $  RMSE {m['rmse']:.2f} $")
+    print(f"Artefacts written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Car Price AI — Prediction Cache
+===============================
+Process-wide, size-bounded LRU cache of predicted prices keyed on the
+normalised 12-field vehicle configuration and the serving tier that priced it.
+
+Entries are tagged with the artefact version they were computed under; when
+a different version is served, the whole cache is dropped on next use.  The
+tiers of one version share the cache side by side.
+An entry may also hold the price's per-field contributions (see
+``inference.explain_records``), so an explained valuation is cached whole.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Mapping
+
+import numpy as np
+
+from inference import FEATURE_COLUMNS, NUMERIC_COLUMNS
+from normalization import canonical
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+DEFAULT_MAXSIZE = 10_000
+
+
+def make_key(record: Mapping, tier: str = "") -> tuple:
+    """
+    Canonical, hashable form of a model input priced with ``tier``.
+
+    Numeric fields are coerced to float and rounded to the precision the UI
+    can produce (``condition`` moves in 0.1 steps), so ``45000`` and ``45000.0``
+    share one entry; categorical fields use their canonical spelling, so
+    "BMW" and "Bmw" do too.
+    """
+    return (tier, *(
+        round(float(record[col]), 1) if col in NUMERIC_COLUMNS else canonical(col, record[col])
+        for col in FEATURE_COLUMNS
+    ))
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+class PredictionCache:
+    """
+    Thread-safe LRU cache with optional time-to-live.
+
+    Parameters
+    ----------
+    maxsize : int
+        Entries kept before the least recently used one is evicted.
+    ttl : float | None
+        Seconds an entry stays valid; ``None`` disables expiry.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE, ttl: float | None = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key → (price, contributions or None, expires_at)
+        self._entries: OrderedDict[tuple, tuple[float, np.ndarray | None, float]] = OrderedDict()
+        self._version: str | None = None
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def _check_version(self, version: str) -> None:
+        # Caller holds the lock.
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+                self._entries.clear()
+            self._version = version
+
+    def _lookup(self, record: Mapping, version: str, tier: str, explained: bool) -> tuple | None:
+        key = make_key(record, tier)
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None or (explained and entry[1] is None):
+                self.misses += 1
+                return None
+            value, contributions, expires_at = entry
+            if expires_at < self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value, contributions
+
+    def get(self, record: Mapping, version: str, tier: str = "") -> float | None:
+        """Cached price for ``record`` under artefact ``version`` and ``tier``, or ``None``."""
+        entry = self._lookup(record, version, tier, explained=False)
+        return None if entry is None else entry[0]
+
+    def get_explained(self, record: Mapping, version: str, tier: str = "") -> tuple[float, np.ndarray] | None:
+        """Cached price and contributions, or ``None`` unless both are cached."""
+        return self._lookup(record, version, tier, explained=True)
+
+    def put(self, record: Mapping, version: str, value: float, contributions: np.ndarray | None = None,
+            tier: str = "") -> None:
+        key = make_key(record, tier)
+        expires_at = self._clock() + self.ttl if self.ttl is not None else float("inf")
+        if contributions is not None:
+            contributions = np.array(contributions, dtype=np.float32)
+            contributions.flags.writeable = False        # shared by every session that hits the entry
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (float(value), contributions, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, record: Mapping, version: str, compute: Callable[[], float], tier: str = "") -> float:
+        """Return the cached price or call ``compute()`` and remember its result."""
+        value = self.get(record, version, tier)
+        if value is None:
+            value = float(compute())
+            self.put(record, version, value, tier=tier)
+        return value
+
+    def get_or_explain(self, record: Mapping, version: str, compute: Callable[[], tuple[float, np.ndarray]],
+                       tier: str = "") -> tuple[float, np.ndarray]:
+        """Return the cached price and contributions or call ``compute()`` for both and remember them."""
+        entry = self.get_explained(record, version, tier)
+        if entry is None:
+            value, contributions = compute()
+            self.put(record, version, value, contributions, tier)
+            entry = float(value), np.asarray(contributions, dtype=np.float32)
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
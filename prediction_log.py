@@ -0,0 +1,224 @@
+"""
+Car Price AI — Prediction Log
+=============================
+Append-only record of every valuation served: the twelve input fields, the
+model version and tier, the price and the stage latencies.
+
+Logging must not slow a prediction down, so :meth:`PredictionLog.log` only
+puts a tuple on a bounded queue.  A writer thread wakes on the first entry,
+lingers briefly so more can arrive, then encodes everything queued as JSON
+lines and appends it to the current segment in one write.  When the queue is full the entry is dropped and
+counted instead of blocking the request.
+
+Segments are named ``predictions-<started>-<pid>-<n>.jsonl[.gz]`` so several
+processes can share a directory.  A segment is closed and a new one started
+once it reaches ``max_bytes`` on disk.  With ``compress`` each segment is a
+gzip stream that is sync-flushed whenever the writer goes idle, so the open
+segment can be read while it is still being written.
+
+One line per prediction::
+
+    {"ts": 1760000000.123, "version": "3f2a9c1b7d40", "path": "app", "tier": "fast",
+     "input": {"make": "Kia", ...}, "price": 14250.5,
+     "stages_ms": {"transform": 0.05, "predict": 0.4, "total": 1.2}}
+
+Usage
+-----
+    log = PredictionLog("logs", compress=True)
+    log.log(record, price, version, tier="fast", path="app", stages={"predict": 0.0004})
+    for entry in iter_log("logs"): ...
+    python replay.py logs --candidate files-next          # re-score logged traffic
+    python -m benchmarks.bench_prediction_log             # logging cost per request
+"""
+
+import atexit
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections.abc import Iterator
+
+from metrics import PREDICTION_LOG_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+SEGMENT_PREFIX    = "predictions-"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_QUEUE = 100_000     # entries waiting for the writer before new ones are dropped
+MAX_BATCH         = 10_000      # entries encoded and written per write call
+LINGER            = 0.05        # seconds the writer waits after the first entry so a batch can build up
+FLUSH_INTERVAL    = 1.0         # seconds of idleness before buffered lines are flushed to disk
+WRITE_BUFFER      = 1 << 20
+COMPRESS_LEVEL    = 1           # zlib level: ~6.5× smaller than plain JSON, 15% faster to write than level 6
+
+
+def _plain(value):
+    """JSON fallback for numpy scalars in records or prices."""
+    return value.item()
+
+
+# ---------------------------------------------------------------------------
+# Writer
+# ---------------------------------------------------------------------------
+class PredictionLog:
+    """Non-blocking, batched, size-rotated prediction log in ``directory``."""
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES, compress: bool = False,
+                 max_queue: int = DEFAULT_MAX_QUEUE, flush_interval: float = FLUSH_INTERVAL) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._started = time.strftime("%Y%m%d-%H%M%S")
+        self._segments = 0
+        self._raw = None        # the segment file
+        self._fh = None         # the same, or a GzipFile over it
+        self._dirty = False     # written since the last flush
+        self._lock = threading.Lock()
+        self.logged = self.dropped = self.written = self.bytes_written = 0
+        os.makedirs(directory, exist_ok=True)
+
+        self._thread = threading.Thread(target=self._run, name="prediction-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(self, record: dict, price: float, version: str, tier: str = "full", path: str = "",
+            stages: dict[str, float] | None = None) -> bool:
+        """
+        Queue one prediction; ``stages`` are in seconds.
+
+        Returns
+        -------
+        False when the queue was full and the entry was dropped.
+        """
+        try:
+            self._queue.put_nowait((time.time(), version, path, tier, record, price, stages))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            PREDICTION_LOG_ENTRIES.inc(1, "dropped")
+            return False
+        with self._lock:
+            self.logged += 1
+        return True
+
+    def _open_segment(self) -> None:
+        self._segments += 1
+        suffix = ".jsonl.gz" if self.compress else ".jsonl"
+        name = f"{SEGMENT_PREFIX}{self._started}-{os.getpid()}-{self._segments:04d}{suffix}"
+        self._raw = open(os.path.join(self.directory, name), "ab", buffering=WRITE_BUFFER)
+        self._fh = (gzip.GzipFile(fileobj=self._raw, mode="ab", compresslevel=COMPRESS_LEVEL)
+                    if self.compress else self._raw)
+
+    def _close_segment(self) -> None:
+        if self._fh is None:
+            return
+        if self._fh is not self._raw:
+            self._fh.close()
+        self._raw.close()
+        self._raw = self._fh = None
+
+    def _flush(self) -> None:
+        if self._fh is not None and self._dirty:
+            self._fh.flush()          # GzipFile: zlib sync flush, so readers get every complete line
+            if self._fh is not self._raw:
+                self._raw.flush()
+            self._dirty = False
+
+    def _write(self, batch: list[tuple]) -> None:
+        lines = "".join(
+            json.dumps({"ts": round(ts, 3), "version": version, "path": path, "tier": tier, "input": record,
+                        "price": price,
+                        "stages_ms": {k: round(v * 1_000, 4) for k, v in (stages or {}).items()}},
+                       separators=(",", ":"), default=_plain) + "\n"
+            for ts, version, path, tier, record, price, stages in batch
+        ).encode("utf-8")
+        if self._fh is None:
+            self._open_segment()
+        self._fh.write(lines)
+        self._dirty = True
+        size = self._raw.tell()
+        with self._lock:
+            self.written += len(batch)
+            self.bytes_written += len(lines)
+        PREDICTION_LOG_ENTRIES.inc(len(batch), "written")
+        if size >= self.max_bytes:
+            self._close_segment()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._flush()
+                continue
+            if item is not None and self._queue.qsize() < MAX_BATCH:
+                # One wake-up per batch rather than one per entry.
+                time.sleep(LINGER)
+            batch, stop = [], item is None
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= MAX_BATCH:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                stop = item is None
+            try:
+                if batch:
+                    self._write(batch)
+            except Exception as exc:  # noqa: BLE001
+                logger.error("Prediction log write failed, %d entries lost: %s", len(batch), exc)
+            if stop:
+                self._close_segment()
+                return
+
+    def close(self) -> None:
+        """Write everything queued, close the segment and stop the writer."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"logged": self.logged, "written": self.written, "dropped": self.dropped,
+                    "queue_depth": self._queue.qsize(), "bytes_written": self.bytes_written,
+                    "segments": self._segments}
+
+
+# ---------------------------------------------------------------------------
+# Reader
+# ---------------------------------------------------------------------------
+def segments(directory: str) -> list[str]:
+    """Log segments in ``directory`` (or a single segment file), oldest first."""
+    if os.path.isfile(directory):
+        return [directory]
+    return sorted(glob.glob(os.path.join(directory, f"{SEGMENT_PREFIX}*.jsonl*")))
+
+
+def iter_log(directory: str) -> Iterator[dict]:
+    """
+    Every logged prediction, oldest segment first.
+
+    A segment that is still being written ends in an incomplete line or
+    without a gzip trailer; reading stops quietly at that point.
+    """
+    for path in segments(directory):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rb") as fh:
+            try:
+                for line in fh:
+                    if not line.endswith(b"\n"):
+                        break
+                    yield json.loads(line)
+            except EOFError:
+                pass
@@ -0,0 +1,374 @@
+"""
+Car Price AI — Incremental Refresh
+==================================
+Folds a batch of new sales into the exported artefacts without a full
+pipeline run, and writes the result as a new artefact version.
+
+* Target encoder — per-category row count and target sum are kept as
+  sufficient statistics (``encoder_stats.parquet``, written by the training
+  pipeline).  The batch's statistics are added and the smoothed encodings
+  recomputed with category_encoders' own formula, new categories included.
+* Scaler — ``StandardScaler.partial_fit`` combines the stored running
+  count/mean/variance with the batch's.
+* Model — the existing trees' split thresholds are rebased onto the updated
+  scaler (scaling is affine, so the old trees route rows as before) and
+  boosting continues for ``REFRESH_TREES`` trees on the batch via XGBoost's
+  ``xgb_model`` warm start, at a reduced learning rate.
+* Comparables — the indexed sales plus the batch's are re-embedded with the
+  updated encoder and scaler, so stored rows and queries share one space.
+* Drift reference — carried over unchanged: the refreshed model is still
+  fitted mostly on the original training data it describes.
+
+A holdout carved from the batch is kept out of every update and scored with
+both the previous and the refreshed artefacts; the comparison is written to
+``refresh_report.json`` in the new version.  ``--promote`` copies the new
+version into ``files/`` only when its holdout RMSE is no worse.
+
+Usage
+-----
+    python refresh.py new_sales.csv --out files-next
+    python refresh.py new_sales.csv --out files-next --promote
+    python refresh.py new_sales.csv --out files-next --base-data car_prices.csv   # no encoder_stats.parquet yet
+"""
+
+import argparse
+import copy
+import datetime
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from catalogue import Catalogue, build_from_frame, build_from_options, load_options
+from comparables import INDEX_DIR, build_index
+from compiled_transform import CompiledTransform, scale_float32
+from drift import REFERENCE_FILE
+from inference import CATEGORICAL_COLUMNS, FEATURE_COLUMNS, FILES_DIR, artefact_fingerprint, updating_artefacts
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+STATS_FILE       = "encoder_stats.parquet"
+REPORT_FILE      = "refresh_report.json"
+REFRESH_TREES    = 100
+REFRESH_LR       = 0.01   # small steps: a week of sales corrects the model rather than overwriting it
+HOLDOUT_SIZE     = 0.2
+SEED             = 7
+CUT_SEARCH_STEPS = 4      # float32 steps searched either side of a rebased split threshold
+
+# Copied into the new version; the catalogue and comparables directories are handled separately.
+ARTEFACT_FILES: list[str] = [
+    "xgb_model.joblib", "target_encoder.joblib", "scaler.joblib", STATS_FILE, "options.json", "tiers.json",
+    REFERENCE_FILE,
+]
+
+
+# ---------------------------------------------------------------------------
+# Target encoder statistics
+# ---------------------------------------------------------------------------
+def encoder_stats(x: pd.DataFrame, y: pd.Series) -> pd.DataFrame:
+    """Row count and target sum per category of every categorical column (missing values skipped)."""
+    frames = []
+    target = y.to_numpy(dtype=np.float64)
+    for col in CATEGORICAL_COLUMNS:
+        grouped = pd.Series(target).groupby(x[col].astype(object).to_numpy(), sort=False).agg(["count", "sum"])
+        frames.append(pd.DataFrame({"column": col, "category": grouped.index.astype(str),
+                                    "count": grouped["count"].to_numpy(np.int64), "sum": grouped["sum"].to_numpy()}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def merge_stats(base: pd.DataFrame, update: pd.DataFrame) -> pd.DataFrame:
+    """Add ``update``'s counts and sums to ``base``; categories new to ``base`` are appended."""
+    merged = pd.concat([base, update], ignore_index=True)
+    return merged.groupby(["column", "category"], sort=False, as_index=False)[["count", "sum"]].sum()
+
+
+def encoder_from_stats(template, stats: pd.DataFrame, prior: float):
+    """
+    ``template`` (a fitted ``ce.TargetEncoder``) with its mappings rebuilt from ``stats``.
+
+    Uses the encoder's own smoothing (``min_samples_leaf``, ``smoothing``), so
+    statistics of the training split reproduce what ``fit`` would learn.
+    """
+    from scipy.special import expit
+
+    encoder = copy.deepcopy(template)
+    for entry in encoder.ordinal_encoder.mapping:
+        col = entry["col"]
+        col_stats = stats[stats["column"] == col]
+        codes = np.arange(1, len(col_stats) + 1)
+        entry["mapping"] = pd.concat([pd.Series(codes, index=pd.Index(col_stats["category"], dtype=object)),
+                                      pd.Series([-2], index=pd.Index([np.nan], dtype=object))])
+        counts = col_stats["count"].to_numpy(np.float64)
+        smoove = expit((counts - encoder.min_samples_leaf) / encoder.smoothing)
+        encoded = prior * (1 - smoove) + col_stats["sum"].to_numpy() / counts * smoove
+        encoder.mapping[col] = pd.Series(np.r_[encoded, prior, prior], index=np.r_[codes, -1, -2])
+    encoder._mean = prior
+    return encoder
+
+
+# ---------------------------------------------------------------------------
+# Model
+# ---------------------------------------------------------------------------
+def rebase_thresholds(booster, old_scaler, new_scaler):
+    """
+    Copy of ``booster`` whose split thresholds are expressed in ``new_scaler``'s space.
+
+    A split ``(x - m1) / s1 < t`` is the same split as
+    ``(x - m2) / s2 < (t·s1 + m1 - m2) / s2``; thresholds are snapped so that
+    training values keep their side of every split under float32 rounding.
+    The booster passed in is not modified.
+    """
+    from xgboost import Booster
+
+    model = json.loads(booster.save_raw("json"))
+    m1, s1 = old_scaler.mean_, old_scaler.scale_
+    m2, s2 = new_scaler.mean_, new_scaler.scale_
+    for tree in model["learner"]["gradient_booster"]["model"]["trees"]:
+        features = np.asarray(tree["split_indices"])
+        conditions = np.asarray(tree["split_conditions"], dtype=np.float64)
+        internal = np.asarray(tree["left_children"]) != -1          # leaves hold values, not thresholds
+        f = features[internal]
+        t = conditions[internal].astype(np.float32)
+        # Smallest unscaled float32 value the old split sends right, found a few steps around the
+        # algebraic inverse, then scaled exactly as the pipeline scales data: every training value
+        # keeps its side of the split despite float32 rounding on both sides.
+        raw = (t * s1[f] + m1[f]).astype(np.float32)
+        for _ in range(CUT_SEARCH_STEPS):
+            raw = np.nextafter(raw, np.float32(-np.inf))
+        for _ in range(2 * CUT_SEARCH_STEPS):
+            below = scale_float32(raw, m1[f], s1[f]) < t
+            raw[below] = np.nextafter(raw[below], np.float32(np.inf))
+        rebased = scale_float32(raw, m2[f], s2[f])
+        conditions[internal] = rebased
+        tree["split_conditions"] = conditions.tolist()
+
+    booster = Booster()
+    booster.load_model(bytearray(json.dumps(model).encode("utf-8")))
+    return booster
+
+
+def _score(ml_model, transform: CompiledTransform, frame: pd.DataFrame) -> dict[str, float]:
+    from train_pipeline import TARGET, evaluate
+
+    return evaluate(ml_model, transform.transform(frame), frame[TARGET].to_numpy())
+
+
+# ---------------------------------------------------------------------------
+# Refresh
+# ---------------------------------------------------------------------------
+def refresh(files_dir: str, batch: pd.DataFrame, out_dir: str, stats: pd.DataFrame | None = None,
+            reference: pd.DataFrame | None = None, refresh_trees: int = REFRESH_TREES,
+            learning_rate: float = REFRESH_LR) -> dict:
+    """
+    Fold the cleaned sales in ``batch`` into the artefacts in ``files_dir``.
+
+    ``stats`` overrides ``files_dir/encoder_stats.parquet``; ``reference``
+    (e.g. the original test split) is scored as a second holdout to catch
+    forgetting.  The new version is written to ``out_dir``.
+
+    Returns
+    -------
+    The refresh report (also written to ``out_dir/refresh_report.json``).
+    """
+    from sklearn.model_selection import train_test_split
+    from xgboost import XGBRegressor
+
+    from tiers import measure_tiers, write_tiers
+    from train_pipeline import TARGET
+
+    started = time.perf_counter()
+    ml_model = joblib.load(f"{files_dir}/xgb_model.joblib")
+    encoder = joblib.load(f"{files_dir}/target_encoder.joblib")
+    scaler = joblib.load(f"{files_dir}/scaler.joblib")
+    if stats is None:
+        stats = pd.read_parquet(f"{files_dir}/{STATS_FILE}")
+
+    train, holdout = train_test_split(batch, test_size=HOLDOUT_SIZE, random_state=SEED)
+    x_new, y_new = train[FEATURE_COLUMNS], train[TARGET]
+
+    # Encoder: merged sufficient statistics; the prior is tracked through the scaler's row count.
+    seen = int(scaler.n_samples_seen_) if np.ndim(scaler.n_samples_seen_) == 0 else int(scaler.n_samples_seen_[0])
+    prior = (encoder._mean * seen + float(y_new.sum())) / (seen + len(y_new))
+    merged_stats = merge_stats(stats, encoder_stats(x_new, y_new))
+    new_encoder = encoder_from_stats(encoder, merged_stats, prior)
+    encoded = new_encoder.transform(x_new).astype(np.float32)
+
+    # Scaler: running moments.
+    new_scaler = copy.deepcopy(scaler).partial_fit(encoded)
+    x_scaled = new_scaler.transform(encoded).astype(np.float32)
+
+    # Model: old trees moved into the new feature space, then more trees on the batch.
+    params = {**ml_model.get_params(), "n_estimators": refresh_trees, "learning_rate": learning_rate}
+    new_model = XGBRegressor(**params).fit(x_scaled, y_new.to_numpy(),
+                                           xgb_model=rebase_thresholds(ml_model.get_booster(), scaler, new_scaler))
+    fit_seconds = time.perf_counter() - started
+
+    old_transform = CompiledTransform.from_artefacts(encoder, scaler)
+    new_transform = CompiledTransform.from_artefacts(new_encoder, new_scaler)
+    comparison = {"holdout": {"rows": len(holdout),
+                              "previous": _score(ml_model, old_transform, holdout),
+                              "refreshed": _score(new_model, new_transform, holdout)}}
+    if reference is not None:
+        comparison["reference"] = {"rows": len(reference),
+                                   "previous": _score(ml_model, old_transform, reference),
+                                   "refreshed": _score(new_model, new_transform, reference)}
+
+    # New version: model, encoder, scaler, statistics, tiers, comparables, options with the batch's new values.
+    staging = f"{out_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    joblib.dump(new_model, f"{staging}/xgb_model.joblib")
+    joblib.dump(new_encoder, f"{staging}/target_encoder.joblib")
+    joblib.dump(new_scaler, f"{staging}/scaler.joblib")
+    merged_stats.to_parquet(f"{staging}/{STATS_FILE}", index=False)
+    # The refreshed model still mostly reflects the original training data, so its drift reference carries over.
+    if os.path.exists(f"{files_dir}/{REFERENCE_FILE}"):
+        shutil.copyfile(f"{files_dir}/{REFERENCE_FILE}", f"{staging}/{REFERENCE_FILE}")
+    else:
+        logger.warning("No %s in %s; the refreshed version will serve without drift monitoring.",
+                       REFERENCE_FILE, files_dir)
+    write_tiers(measure_tiers(new_model, new_transform.transform(holdout), holdout[TARGET].to_numpy()), staging)
+
+    # The index stores transformed features, so every sale is re-embedded with the new transform.
+    sales = train[FEATURE_COLUMNS + [TARGET]]
+    if os.path.exists(f"{files_dir}/{INDEX_DIR}/sales.parquet"):
+        sales = pd.concat([pd.read_parquet(f"{files_dir}/{INDEX_DIR}/sales.parquet"), sales], ignore_index=True)
+    else:
+        logger.warning("No comparables index in %s; indexing the batch's sales only.", files_dir)
+    build_index(sales, new_transform.transform(sales), f"{staging}/{INDEX_DIR}")
+
+    options = load_options(files_dir)
+    options = options.to_dict() if isinstance(options, Catalogue) else options
+    build_from_frame(batch[CATEGORICAL_COLUMNS], f"{staging}/catalogue.batch")
+    options = merge_options(options, Catalogue(f"{staging}/catalogue.batch").to_dict())
+    shutil.rmtree(f"{staging}/catalogue.batch")
+    build_from_options(options, f"{staging}/catalogue")
+    with open(f"{staging}/options.json", "w", encoding="utf-8") as fh:
+        json.dump(options, fh)
+
+    digest = hashlib.sha256()
+    for name in ("xgb_model.joblib", "target_encoder.joblib", "scaler.joblib"):
+        with open(f"{staging}/{name}", "rb") as fh:
+            digest.update(hashlib.sha256(fh.read()).digest())
+    version = digest.hexdigest()[:12]
+    report = {
+        "version": version,
+        "previous_version": artefact_fingerprint(files_dir),
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "batch_rows": len(batch),
+        "trained_rows": len(train),
+        "new_categories": int(len(merged_stats) - len(stats)),
+        "indexed_sales": len(sales),
+        "trees": {"previous": int(ml_model.get_booster().num_boosted_rounds()),
+                  "refreshed": int(new_model.get_booster().num_boosted_rounds())},
+        "learning_rate": learning_rate,
+        "fit_seconds": round(fit_seconds, 2),
+        "comparison": comparison,
+    }
+    with open(f"{staging}/{REPORT_FILE}", "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(staging, out_dir)
+    return report
+
+
+def merge_options(base: dict, update: dict) -> dict:
+    """Union of two ``options.json`` dicts; lists stay sorted and relation values deduplicated."""
+    merged = {}
+    for name, values in base.items():
+        extra = update.get(name, {} if isinstance(values, dict) else [])
+        if name == "states_map":
+            merged[name] = {**values, **extra}
+        elif isinstance(values, dict):
+            merged[name] = {key: sorted(set(values.get(key, [])) | set(extra.get(key, [])))
+                            for key in sorted(values.keys() | extra.keys())}
+        else:
+            merged[name] = sorted(set(values) | set(extra))
+    return merged
+
+
+def promote(version_dir: str, files_dir: str = FILES_DIR) -> None:
+    """
+    Copy a refreshed version over the serving artefacts, file by file with atomic renames.
+
+    ``files_dir`` is marked as being updated throughout (``inference.updating_artefacts``),
+    so a model watcher never loads a half-promoted set.
+    """
+    from train_pipeline import TrainingPipeline
+
+    with updating_artefacts(files_dir):
+        for name in ARTEFACT_FILES + [REPORT_FILE]:
+            if name == REFERENCE_FILE and not os.path.exists(f"{version_dir}/{name}"):
+                continue
+            shutil.copyfile(f"{version_dir}/{name}", f"{files_dir}/{name}.tmp")
+            os.replace(f"{files_dir}/{name}.tmp", f"{files_dir}/{name}")
+        for name in ("catalogue", INDEX_DIR):
+            staging = f"{files_dir}/{name}.tmp-{os.getpid()}"
+            shutil.rmtree(staging, ignore_errors=True)
+            shutil.copytree(f"{version_dir}/{name}", staging)
+            shutil.rmtree(f"{files_dir}/{name}", ignore_errors=True)
+            os.replace(staging, f"{files_dir}/{name}")
+        TrainingPipeline._refresh_bundle(files_dir)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def main(argv: list[str] | None = None) -> None:
+    from train_pipeline import CACHE_DIR, TARGET, TrainingPipeline, clean_frame, read_raw
+
+    parser = argparse.ArgumentParser(description="Fold new sales into the model without a full retrain.")
+    parser.add_argument("sales", help="New sales CSV in the car_prices.csv format.")
+    parser.add_argument("--files-dir", default=FILES_DIR, help="Artefacts to refresh.")
+    parser.add_argument("--out", required=True, help="Directory for the refreshed artefact version.")
+    parser.add_argument("--trees", type=int, default=REFRESH_TREES, help="Trees added on the new batch.")
+    parser.add_argument("--learning-rate", type=float, default=REFRESH_LR, help="Learning rate of the added trees.")
+    parser.add_argument("--base-data", help="Original training CSV: bootstraps encoder statistics when "
+                                            f"{STATS_FILE} is missing and adds its test split as a second holdout.")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="Training pipeline cache (with --base-data).")
+    parser.add_argument("--promote", action="store_true",
+                        help="Copy the new version into --files-dir if its holdout RMSE is no worse.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    batch = clean_frame(read_raw(args.sales))
+    stats = reference = None
+    if args.base_data:
+        pipeline = TrainingPipeline(args.base_data, args.cache_dir)
+        pipeline.run(until="split")
+        reference = pd.read_parquet(f"{pipeline.stage_dir('split')}/test.parquet")
+        if not os.path.exists(f"{args.files_dir}/{STATS_FILE}"):
+            train = pd.read_parquet(f"{pipeline.stage_dir('split')}/train.parquet")
+            stats = encoder_stats(train[FEATURE_COLUMNS], train[TARGET])
+    elif not os.path.exists(f"{args.files_dir}/{STATS_FILE}"):
+        raise SystemExit(f"{args.files_dir}/{STATS_FILE} is missing; pass --base-data to rebuild it.")
+
+    report = refresh(args.files_dir, batch, args.out, stats, reference, args.trees, args.learning_rate)
+    for name, result in report["comparison"].items():
+        prev, new = result["previous"], result["refreshed"]
+        print(f"{name:<10} {result['rows']:>8,} rows  RMSE {prev['rmse']:>9.2f} → {new['rmse']:>9.2f} $  "
+              f"MAE {prev['mae']:>9.2f} → {new['mae']:>9.2f} $")
+    print(f"Version {report['version']} ({report['trees']['refreshed']} trees, "
+          f"{report['new_categories']} new categories) written to {args.out} in {report['fit_seconds']:.1f} s")
+
+    if args.promote:
+        holdout = report["comparison"]["holdout"]
+        if holdout["refreshed"]["rmse"] <= holdout["previous"]["rmse"]:
+            promote(args.out, args.files_dir)
+            print(f"Promoted to {args.files_dir}")
+        else:
+            print("Not promoted: the holdout RMSE got worse.")
+
+
+if __name__ == "__main__":
+    main()
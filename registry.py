@@ -0,0 +1,506 @@
+"""
+Car Price AI — Model Registry
+=============================
+Versioned artefact directories, an "active" pointer, and a watcher that
+swaps in a new version while the app keeps serving.
+
+    registry/
+        versions/<version>/   one complete artefact directory, as export writes it
+        active.json           {"version": ..., "previous": [...], "activated": ...}
+        canary.parquet        optional: recent sales with known prices
+
+Publishing copies a directory under a temporary name and renames it into
+``versions/``, so a version directory is either complete or absent.
+``active.json`` is replaced with ``os.replace``, so readers see the old
+pointer or the new one.  Versions stay on disk after they are deactivated,
+and ``rollback`` re-points to the previously active one.
+
+``ModelWatcher`` polls the pointer on a daemon thread.  When it moves, the
+new version is loaded and warmed (``startup.load_and_warm``) together with its
+serving tiers, comparables index and drift reference, then scored on the canary set.  Only a
+version that passes replaces the served ``LoadedModel``, in a single
+attribute assignment.  A request reads the current ``LoadedModel`` once and
+uses it throughout, so it never sees one version's encoder with another's
+model.  The previously served version stays loaded, which makes switching
+back to it instant.
+
+Without an active version in the registry the watcher serves ``files/`` and
+reloads it when the artefact fingerprint changes.  Writers replace those
+files one at a time, so a load only counts when the fingerprint is the same
+before and after it, and a directory a writer has marked as being updated
+(``inference.updating_artefacts``) is not loaded at all while a version is
+being served.
+
+Usage
+-----
+    python registry.py publish files-next --activate
+    python registry.py activate 3f2a9c1b7d40
+    python registry.py rollback
+    python registry.py list
+    python registry.py canary new_sales.csv --rows 500     # raw car_prices.csv format
+    python registry.py prune --keep 5
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+
+import numpy as np
+import pandas as pd
+
+from comparables import PRICE_COLUMN, ComparablesIndex, load_comparables
+from drift import load_reference
+from inference import FEATURE_COLUMNS, FILES_DIR, artefact_fingerprint, artefacts_updating
+from metrics import MODEL_RELOADS
+from startup import load_and_warm
+from tiers import available_tiers, load_tiers, tier_model
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+REGISTRY_DIR     = "registry"
+VERSIONS_DIR     = "versions"
+ACTIVE_FILE      = "active.json"
+CANARY_FILE      = "canary.parquet"
+CANARY_ROWS      = 500
+CANARY_TOLERANCE = 0.10     # a new version's canary MAE may exceed the served one's by at most 10%
+HISTORY_SIZE     = 20       # previously active versions remembered for rollback
+WATCH_INTERVAL   = 5.0      # seconds between polls of the active pointer
+RETAINED_MODELS  = 1        # previously served versions kept loaded
+LOAD_ATTEMPTS    = 3        # loads of files/ per poll while its fingerprint keeps changing underneath
+SEED             = 7
+
+# Files whose contents identify a version (the same hash refresh.py reports).
+VERSION_FILES: list[str] = ["xgb_model.joblib", "target_encoder.joblib", "scaler.joblib"]
+
+
+def _write_json(path: str, payload: dict) -> None:
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(payload, fh, indent=2)
+    os.replace(tmp, path)
+
+
+def content_version(directory: str) -> str:
+    """Short content hash of the model, encoder and scaler in ``directory``."""
+    digest = hashlib.sha256()
+    for name in VERSION_FILES:
+        with open(f"{directory}/{name}", "rb") as fh:
+            digest.update(hashlib.sha256(fh.read()).digest())
+    return digest.hexdigest()[:12]
+
+
+# ---------------------------------------------------------------------------
+# Registry on disk
+# ---------------------------------------------------------------------------
+class ModelRegistry:
+    """
+    Versioned artefact directories under ``root`` and the pointer to the active one.
+
+    Meant for one operator at a time; concurrent ``activate`` calls are not
+    serialised against each other.
+    """
+
+    def __init__(self, root: str = REGISTRY_DIR) -> None:
+        self.root = root
+
+    def path(self, version: str) -> str:
+        return os.path.join(self.root, VERSIONS_DIR, version)
+
+    def _pointer(self) -> dict:
+        try:
+            with open(os.path.join(self.root, ACTIVE_FILE), "r", encoding="utf-8") as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return {}
+
+    def active(self) -> str | None:
+        """The active version, or ``None`` when nothing has been activated."""
+        return self._pointer().get("version")
+
+    def previous(self) -> list[str]:
+        """Previously active versions, most recent first."""
+        return self._pointer().get("previous", [])
+
+    def versions(self) -> list[str]:
+        """Published versions, oldest first."""
+        directory = os.path.join(self.root, VERSIONS_DIR)
+        if not os.path.isdir(directory):
+            return []
+        names = [name for name in os.listdir(directory) if not name.startswith(".")]
+        return sorted(names, key=lambda name: os.stat(os.path.join(directory, name)).st_mtime_ns)
+
+    def publish(self, source_dir: str) -> str:
+        """
+        Copy the artefacts in ``source_dir`` into the registry.
+
+        Publishing the same artefacts twice is a no-op.
+
+        Returns
+        -------
+        The version name (content hash of ``VERSION_FILES``).
+        """
+        version = content_version(source_dir)
+        target = self.path(version)
+        if os.path.isdir(target):
+            logger.info("Version %s is already published.", version)
+            return version
+        staging = os.path.join(self.root, VERSIONS_DIR, f".tmp-{version}-{os.getpid()}")
+        shutil.rmtree(staging, ignore_errors=True)
+        shutil.copytree(source_dir, staging)
+        os.utime(staging)                       # copytree keeps the source's mtime; versions sort by publish time
+        os.replace(staging, target)
+        logger.info("Published %s as version %s.", source_dir, version)
+        return version
+
+    def activate(self, version: str) -> None:
+        """Point the registry at ``version``; the current one becomes the rollback target."""
+        if not os.path.isdir(self.path(version)):
+            raise ValueError(f"Unknown version '{version}'; published: {self.versions()}")
+        pointer = self._pointer()
+        current = pointer.get("version")
+        previous = pointer.get("previous", [])
+        if current is not None and current != version:
+            previous = [current] + [v for v in previous if v not in (current, version)]
+        _write_json(os.path.join(self.root, ACTIVE_FILE), {
+            "version": version,
+            "previous": previous[:HISTORY_SIZE],
+            "activated": datetime.datetime.now().isoformat(timespec="seconds"),
+        })
+        logger.info("Activated version %s (was %s).", version, current)
+
+    def rollback(self) -> str:
+        """Re-activate the most recent previously active version that is still published."""
+        pointer = self._pointer()
+        remaining = [v for v in pointer.get("previous", []) if os.path.isdir(self.path(v))]
+        if not remaining:
+            raise ValueError("No previous version to roll back to.")
+        version = remaining[0]
+        _write_json(os.path.join(self.root, ACTIVE_FILE), {
+            "version": version,
+            "previous": remaining[1:],
+            "activated": datetime.datetime.now().isoformat(timespec="seconds"),
+        })
+        logger.info("Rolled back from %s to %s.", pointer.get("version"), version)
+        return version
+
+    def prune(self, keep: int) -> list[str]:
+        """Delete all but the ``keep`` newest versions; the active and rollback versions are kept."""
+        protected = {self.active(), *self.previous()[:1]}
+        versions = self.versions()
+        removed = [v for v in versions[:max(0, len(versions) - keep)] if v not in protected]
+        for version in removed:
+            shutil.rmtree(self.path(version))
+        return removed
+
+    def load_canary(self) -> pd.DataFrame | None:
+        path = os.path.join(self.root, CANARY_FILE)
+        return pd.read_parquet(path) if os.path.exists(path) else None
+
+    def write_canary(self, sales: pd.DataFrame, rows: int = CANARY_ROWS) -> int:
+        """Store a sample of cleaned ``sales`` (``FEATURE_COLUMNS`` + price) as the canary set."""
+        sample = sales.sample(min(rows, len(sales)), random_state=SEED)[FEATURE_COLUMNS + [PRICE_COLUMN]]
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, CANARY_FILE)
+        sample.reset_index(drop=True).to_parquet(f"{path}.tmp", index=False)
+        os.replace(f"{path}.tmp", path)
+        return len(sample)
+
+
+# ---------------------------------------------------------------------------
+# Loaded versions
+# ---------------------------------------------------------------------------
+class LoadedModel:
+    """Everything a request needs from one artefact version; replaced as a whole, never mutated."""
+
+    def __init__(self, version: str, directory: str, ml_model, transform, options,
+                 tiers: dict[str, dict], comparables: ComparablesIndex | None,
+                 drift_reference: dict | None = None) -> None:
+        self.version = version
+        self.directory = directory
+        self.ml_model = ml_model
+        self.transform = transform
+        self.options = options
+        self.tiers = tiers
+        self.comparables = comparables
+        self.drift_reference = drift_reference
+        self.loaded_at = time.time()
+
+
+def load_version(version: str, directory: str) -> LoadedModel | None:
+    """Load and warm the artefacts in ``directory``; ``None`` when they cannot be loaded."""
+    ml_model, transform, options = load_and_warm(directory)
+    if ml_model is None:
+        return None
+    return LoadedModel(version, directory, ml_model, transform, options,
+                       load_tiers(directory, ml_model), load_comparables(directory), load_reference(directory))
+
+
+def _canary_mae(loaded: LoadedModel, canary: pd.DataFrame) -> float:
+    predicted = loaded.ml_model.predict(loaded.transform.transform(canary))
+    return float(np.abs(predicted - canary[PRICE_COLUMN].to_numpy()).mean())
+
+
+def validate(candidate: LoadedModel, served: LoadedModel | None, canary: pd.DataFrame | None,
+             tolerance: float = CANARY_TOLERANCE) -> dict:
+    """
+    Check ``candidate`` before it is served.
+
+    Every serving tier must return finite prices for the canary rows.  When
+    the canary has prices and a version is being served, the candidate's MAE
+    may exceed the served version's by at most ``tolerance``.  Without a
+    canary set only ``load_and_warm``'s warm-up row has been scored.
+
+    Returns
+    -------
+    {"passed": bool, "reason": str, "canary_rows": int, "mae": float | None, "served_mae": float | None}
+    """
+    report = {"passed": True, "reason": "", "canary_rows": 0, "mae": None, "served_mae": None}
+    if canary is None:
+        return report
+    report["canary_rows"] = len(canary)
+    features = candidate.transform.transform(canary)
+    for tier in available_tiers(candidate.tiers):
+        if not np.isfinite(tier_model(candidate.ml_model, tier, candidate.tiers).predict(features)).all():
+            return {**report, "passed": False, "reason": f"non-finite prices from the {tier} tier"}
+    report["mae"] = _canary_mae(candidate, canary)
+    if served is not None:
+        report["served_mae"] = _canary_mae(served, canary)
+        if report["mae"] > report["served_mae"] * (1 + tolerance):
+            return {**report, "passed": False,
+                    "reason": f"canary MAE ${report['mae']:,.0f} vs. ${report['served_mae']:,.0f} served"}
+    return report
+
+
+# ---------------------------------------------------------------------------
+# Watcher
+# ---------------------------------------------------------------------------
+class ModelWatcher:
+    """
+    Serve the active version and hot-swap new ones once they are loaded and validated.
+
+    ``current()`` is a plain attribute read; take it once per request.
+    """
+
+    def __init__(self, registry_dir: str = REGISTRY_DIR, files_dir: str = FILES_DIR,
+                 interval: float = WATCH_INTERVAL, tolerance: float = CANARY_TOLERANCE,
+                 retained: int = RETAINED_MODELS) -> None:
+        self.registry = ModelRegistry(registry_dir)
+        self.files_dir = files_dir
+        self.interval = interval
+        self.tolerance = tolerance
+        self.retained = retained
+        self._current: LoadedModel | None = None
+        self._retired: OrderedDict[str, LoadedModel] = OrderedDict()
+        self._rejected: set[str] = set()
+        self._listeners: list[Callable[[LoadedModel], None]] = []
+        self._check_lock = threading.Lock()
+        self._first_check = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.swaps = self.rejections = self.failures = 0
+        self.last_error = ""
+
+    def target(self) -> tuple[str, str]:
+        """``(version, directory)`` that should be served right now."""
+        version = self.registry.active()
+        if version is not None:
+            return version, self.registry.path(version)
+        return artefact_fingerprint(self.files_dir), self.files_dir
+
+    def current(self) -> LoadedModel | None:
+        return self._current
+
+    def wait(self, timeout: float | None = None) -> LoadedModel | None:
+        """Block until the first load attempt has finished, then return the served version."""
+        self._first_check.wait(timeout)
+        return self._current
+
+    def subscribe(self, callback: Callable[[LoadedModel], None]) -> None:
+        """Call ``callback(loaded)`` on the watcher thread after every swap."""
+        self._listeners.append(callback)
+
+    def check(self) -> bool:
+        """
+        Poll once: load, validate and swap in the target version if it changed.
+
+        Returns
+        -------
+        True when a different version is now being served.
+        """
+        with self._check_lock:
+            try:
+                return self._check()
+            finally:
+                self._first_check.set()
+
+    def _check(self) -> bool:
+        version, directory = self.target()
+        served = self._current
+        if (served is not None and served.version == version) or version in self._rejected:
+            return False
+
+        candidate = self._retired.pop(version, None)
+        if candidate is not None:
+            MODEL_RELOADS.inc(1, "restored")
+        else:
+            started = time.perf_counter()
+            candidate = self._load(version, directory, served)
+            if candidate is None:
+                return False
+            version = candidate.version
+            report = validate(candidate, served, self.registry.load_canary(), self.tolerance)
+            if not report["passed"]:
+                return self._refuse(version, "rejected", report["reason"])
+            logger.info("Version %s loaded and validated in %.1f s (%d canary rows, MAE %s).",
+                        version, time.perf_counter() - started, report["canary_rows"],
+                        "n/a" if report["mae"] is None else f"${report['mae']:,.0f}")
+            MODEL_RELOADS.inc(1, "swapped")
+
+        self._current = candidate
+        self.swaps += 1
+        if served is not None:
+            self._retired[served.version] = served
+            while len(self._retired) > self.retained:
+                self._retired.popitem(last=False)
+        logger.info("Now serving version %s (was %s).", version, served.version if served else None)
+        for callback in self._listeners:
+            try:
+                callback(candidate)
+            except Exception as exc:  # noqa: BLE001
+                logger.error("Model swap listener failed: %s", exc)
+        return True
+
+    def _load(self, version: str, directory: str, served: LoadedModel | None) -> LoadedModel | None:
+        """
+        Load ``version``, again whenever the target moved underneath; ``None`` to retry on the next poll.
+
+        A load is kept only when the target is the same before and after it.
+        """
+        for _ in range(LOAD_ATTEMPTS):
+            if directory == self.files_dir and artefacts_updating(directory):
+                if served is not None:
+                    logger.info("%s is being updated; keeping version %s.", directory, served.version)
+                    return None
+                logger.warning("%s is marked as being updated; loading it as there is nothing else to serve.",
+                               directory)
+            candidate = load_version(version, directory)
+            latest = self.target()
+            if latest[0] == version:
+                if candidate is None:
+                    self._refuse(version, "failed", "artefacts could not be loaded")
+                return candidate
+            # The pointer moved or files/ changed while loading: one version's files may be mixed with another's.
+            logger.info("Version %s changed while loading; loading %s.", version, latest[0])
+            version, directory = latest
+            if version in self._rejected or (served is not None and served.version == version):
+                return None
+        return None
+
+    def _refuse(self, version: str, outcome: str, reason: str) -> bool:
+        self._rejected.add(version)
+        if outcome == "failed":
+            self.failures += 1
+        else:
+            self.rejections += 1
+        self.last_error = f"{version}: {reason}"
+        MODEL_RELOADS.inc(1, outcome)
+        logger.error("Not serving version %s: %s.", version, reason)
+        return False
+
+    def start(self) -> "ModelWatcher":
+        """Load the target version and keep polling on a daemon thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.check()
+            except Exception as exc:  # noqa: BLE001
+                logger.error("Model watcher poll failed: %s", exc)
+            if self._stop.wait(self.interval):
+                return
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> dict:
+        served = self._current
+        return {
+            "version": served.version if served else None,
+            "loaded_at": served.loaded_at if served else None,
+            "retained": list(self._retired),
+            "swaps": self.swaps,
+            "rejections": self.rejections,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Publish, activate and roll back model versions.")
+    parser.add_argument("--registry", default=REGISTRY_DIR, help="Registry directory.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    publish = commands.add_parser("publish", help="Copy an artefact directory in as a new version.")
+    publish.add_argument("source", help="Artefact directory, e.g. the output of train_pipeline.py or refresh.py.")
+    publish.add_argument("--activate", action="store_true", help="Also make it the active version.")
+    activate = commands.add_parser("activate", help="Serve a published version.")
+    activate.add_argument("version")
+    commands.add_parser("rollback", help="Serve the previously active version again.")
+    commands.add_parser("list", help="Show published versions.")
+    canary = commands.add_parser("canary", help="Sample sales with known prices as the canary set.")
+    canary.add_argument("sales", help="Sales CSV in the car_prices.csv format.")
+    canary.add_argument("--rows", type=int, default=CANARY_ROWS)
+    prune = commands.add_parser("prune", help="Delete old versions.")
+    prune.add_argument("--keep", type=int, default=5, help="Newest versions kept (plus active and rollback).")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    registry = ModelRegistry(args.registry)
+    try:
+        if args.command == "publish":
+            version = registry.publish(args.source)
+            if args.activate:
+                registry.activate(version)
+            print(version)
+        elif args.command == "activate":
+            registry.activate(args.version)
+        elif args.command == "rollback":
+            print(registry.rollback())
+        elif args.command == "list":
+            active, previous = registry.active(), registry.previous()
+            for version in registry.versions():
+                mark = "active" if version == active else "rollback" if previous[:1] == [version] else ""
+                print(f"{version}  {mark}")
+        elif args.command == "canary":
+            from train_pipeline import clean_frame, read_raw
+
+            print(f"{registry.write_canary(clean_frame(read_raw(args.sales)), args.rows)} canary rows written.")
+        elif args.command == "prune":
+            for version in registry.prune(args.keep):
+                print(f"removed {version}")
+    except (ValueError, FileNotFoundError) as exc:
+        raise SystemExit(str(exc)) from None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Car Price AI — Prediction Replay
+================================
+Streams a prediction log (see ``prediction_log.py``) back through the
+served model and, optionally, a candidate, in large vectorised batches.
+
+- Against the served model, rows logged under the same version should give
+  the same price again; any that do not are counted as mismatches.
+- Against a candidate, the report shows how its prices would differ from the
+  served model's on real traffic: mean shift, mean and p95 absolute change,
+  and the share of valuations that move by more than 5%.
+
+Each row is scored with the tier it was logged with, unless ``--tier`` is
+given.  Rows/s for decoding and for each model are reported, so a log also
+serves as a realistic benchmark workload.
+
+Usage
+-----
+    python replay.py logs                                   # served model vs. logged prices
+    python replay.py logs --candidate files-next            # a directory or a registry version
+    python replay.py logs --candidate 3f2a9c1b7d40 --out replayed.parquet --limit 1000000
+"""
+
+import argparse
+import itertools
+import logging
+import os
+import time
+from collections.abc import Iterator
+
+import numpy as np
+import pandas as pd
+
+from batch_score import _ChunkWriter
+from inference import FEATURE_COLUMNS, FILES_DIR, predict_frame
+from prediction_log import iter_log
+from registry import REGISTRY_DIR, LoadedModel, ModelRegistry, ModelWatcher, content_version, load_version
+from tiers import FULL_TIER, tier_model
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+DEFAULT_BATCH_SIZE = 50_000
+LOGGED_COLUMN      = "logged_price"
+SERVED_COLUMN      = "served_price"
+CANDIDATE_COLUMN   = "candidate_price"
+CHANGE_THRESHOLD   = 0.05       # relative price change reported as "moved"
+MATCH_TOLERANCE    = 0.01       # dollars; float32 model output rounding
+
+
+def iter_frames(log_dir: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                limit: int | None = None) -> Iterator[pd.DataFrame]:
+    """The log as DataFrames of ``FEATURE_COLUMNS`` plus the logged price, version and tier."""
+    entries = iter_log(log_dir)
+    if limit is not None:
+        entries = itertools.islice(entries, limit)
+    while True:
+        chunk = list(itertools.islice(entries, batch_size))
+        if not chunk:
+            return
+        frame = pd.DataFrame.from_records([entry["input"] for entry in chunk], columns=FEATURE_COLUMNS)
+        frame[LOGGED_COLUMN] = np.array([entry["price"] for entry in chunk], dtype=np.float64)
+        frame["version"] = [entry["version"] for entry in chunk]
+        frame["tier"] = [entry["tier"] for entry in chunk]
+        yield frame
+
+
+def score(loaded: LoadedModel, frame: pd.DataFrame, tier: str | None = None) -> np.ndarray:
+    """Prices for ``frame`` from ``loaded``, one predict call per tier present."""
+    prices = np.empty(len(frame), dtype=np.float64)
+    tiers = pd.Series([tier] * len(frame)) if tier else frame["tier"].reset_index(drop=True)
+    for name, positions in tiers.groupby(tiers, sort=False).indices.items():
+        model = tier_model(loaded.ml_model, name if name in loaded.tiers else FULL_TIER, loaded.tiers)
+        prices[positions] = predict_frame(model, loaded.transform, frame.iloc[positions])
+    return prices
+
+
+def _load(version: str, directory: str) -> LoadedModel:
+    loaded = load_version(version, directory)
+    if loaded is None:
+        raise SystemExit(f"Model artefacts could not be loaded from '{directory}'.")
+    return loaded
+
+
+def replay(log_dir: str, served: LoadedModel, candidate: LoadedModel | None = None, tier: str | None = None,
+           batch_size: int = DEFAULT_BATCH_SIZE, limit: int | None = None, out_path: str | None = None) -> dict:
+    """
+    Re-score every logged prediction in ``log_dir``.
+
+    Returns
+    -------
+    Row count, timings and price comparisons (see the module docstring).
+    """
+    writer = _ChunkWriter(out_path) if out_path else None
+    rows = same_version = mismatches = 0
+    decode_seconds = served_seconds = candidate_seconds = 0.0
+    shifts, changes = [], []
+    started = time.perf_counter()
+    try:
+        frames = iter_frames(log_dir, batch_size, limit)
+        while True:
+            lap = time.perf_counter()
+            frame = next(frames, None)
+            decode_seconds += time.perf_counter() - lap
+            if frame is None:
+                break
+
+            lap = time.perf_counter()
+            frame[SERVED_COLUMN] = score(served, frame, tier)
+            served_seconds += time.perf_counter() - lap
+            same = (frame["version"] == served.version).to_numpy()
+            same_version += int(same.sum())
+            mismatches += int((np.abs(frame[SERVED_COLUMN] - frame[LOGGED_COLUMN]).to_numpy()[same]
+                               > MATCH_TOLERANCE).sum())
+
+            if candidate is not None:
+                lap = time.perf_counter()
+                frame[CANDIDATE_COLUMN] = score(candidate, frame, tier)
+                candidate_seconds += time.perf_counter() - lap
+                shift = (frame[CANDIDATE_COLUMN] - frame[SERVED_COLUMN]).to_numpy()
+                shifts.append(shift.astype(np.float32))
+                changes.append((np.abs(shift) / np.maximum(np.abs(frame[SERVED_COLUMN].to_numpy()), 1.0))
+                               .astype(np.float32))
+            rows += len(frame)
+            if writer is not None:
+                writer.write(frame)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    report = {
+        "rows": rows,
+        "seconds": time.perf_counter() - started,
+        "decode_rows_per_s": rows / decode_seconds if decode_seconds else 0.0,
+        "served": {"version": served.version, "rows_per_s": rows / served_seconds if served_seconds else 0.0,
+                   "same_version_rows": same_version, "mismatches": mismatches},
+    }
+    if candidate is not None and rows:
+        shift, change = np.concatenate(shifts), np.concatenate(changes)
+        report["candidate"] = {
+            "version": candidate.version,
+            "rows_per_s": rows / candidate_seconds if candidate_seconds else 0.0,
+            "mean_shift": float(shift.mean()),
+            "mean_abs_change": float(np.abs(shift).mean()),
+            "p95_abs_change": float(np.percentile(np.abs(shift), 95)),
+            "moved_share": float((change > CHANGE_THRESHOLD).mean()),
+        }
+    return report
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Re-score logged predictions with the served model and a candidate.")
+    parser.add_argument("log", help="Prediction log directory or a single segment file.")
+    parser.add_argument("--candidate", help="Artefact directory or registry version to compare with.")
+    parser.add_argument("--registry", default=REGISTRY_DIR, help="Model registry; its active version is 'served'.")
+    parser.add_argument("--files-dir", default=FILES_DIR, help="Served artefacts when the registry has none.")
+    parser.add_argument("--tier", help="Score every row with this tier instead of the logged one.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--limit", type=int, help="Replay at most this many predictions.")
+    parser.add_argument("--out", help="Write each row with its logged, served and candidate price (CSV/Parquet).")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    served = _load(*ModelWatcher(args.registry, args.files_dir).target())
+    candidate = None
+    if args.candidate:
+        directory = args.candidate
+        if not os.path.isdir(directory):
+            directory = ModelRegistry(args.registry).path(args.candidate)
+        if not os.path.isdir(directory):
+            raise SystemExit(f"No artefact directory or registry version '{args.candidate}'.")
+        candidate = _load(content_version(directory), directory)
+
+    report = replay(args.log, served, candidate, args.tier, args.batch_size, args.limit, args.out)
+    print(f"{report['rows']:,} predictions replayed in {report['seconds']:.2f} s "
+          f"(decoding {report['decode_rows_per_s']:,.0f} rows/s)")
+    s = report["served"]
+    print(f"served    {s['version']}: {s['rows_per_s']:>10,.0f} rows/s, {s['mismatches']:,} of "
+          f"{s['same_version_rows']:,} same-version rows priced differently than logged")
+    if "candidate" in report:
+        c = report["candidate"]
+        print(f"candidate {c['version']}: {c['rows_per_s']:>10,.0f} rows/s, shift {c['mean_shift']:+,.0f} $, "
+              f"mean |change| {c['mean_abs_change']:,.0f} $, p95 {c['p95_abs_change']:,.0f} $, "
+              f"{c['moved_share']:.1%} moved > {CHANGE_THRESHOLD:.0%}")
+
+
+if __name__ == "__main__":
+    main()
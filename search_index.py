@@ -0,0 +1,71 @@
+"""
+Car Price AI — Prefix Search Index
+==================================
+Server-side typeahead over long option lists (sellers, trims).
+
+Strings are case-folded and kept in two sorted arrays: whole strings, and the
+suffixes that start at each later word.  A query is two ``bisect`` calls plus
+a scan that stops after ``limit`` hits, so only a short result list ever has
+to be sent to the browser.
+"""
+
+from bisect import bisect_left
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+DEFAULT_LIMIT = 20
+
+
+def _fold(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+
+class PrefixIndex:
+    """
+    Sorted-array prefix index with word-start matching.
+
+    ``search("motor")`` finds "Ford Motor Credit"; matches at the start of the
+    whole string rank ahead of matches at a later word.
+    """
+
+    def __init__(self, values: list[str]) -> None:
+        self.values = list(values)
+        full, words = [], []
+        for i, value in enumerate(self.values):
+            folded = _fold(value)
+            full.append((folded, i))
+            start = folded.find(" ")
+            while start != -1:
+                words.append((folded[start + 1:], i))
+                start = folded.find(" ", start + 1)
+        full.sort()
+        words.sort()
+        self._full_keys = [k for k, _ in full]
+        self._full_ids = [i for _, i in full]
+        self._word_keys = [k for k, _ in words]
+        self._word_ids = [i for _, i in words]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @staticmethod
+    def _scan(keys: list[str], ids: list[int], prefix: str, limit: int, seen: set, out: list) -> None:
+        pos = bisect_left(keys, prefix)
+        while pos < len(keys) and len(out) < limit and keys[pos].startswith(prefix):
+            value_id = ids[pos]
+            if value_id not in seen:
+                seen.add(value_id)
+                out.append(value_id)
+            pos += 1
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> list[str]:
+        """Up to ``limit`` values matching ``query``; an empty query returns the first ``limit``."""
+        prefix = _fold(query)
+        if not prefix:
+            return [self.values[i] for i in self._full_ids[:limit]]
+        seen: set[int] = set()
+        hits: list[int] = []
+        self._scan(self._full_keys, self._full_ids, prefix, limit, seen, hits)
+        self._scan(self._word_keys, self._word_ids, prefix, limit, seen, hits)
+        return [self.values[i] for i in hits]
@@ -0,0 +1,397 @@
+"""
+Car Price AI — JSON Prediction Service
+======================================
+Local HTTP service exposing the same 12-field input ``render_predict`` builds.
+
+Concurrent requests are coalesced into micro-batches (bounded by a maximum
+batch size and a maximum wait) and scored with one predict call per batch.
+
+Endpoints
+---------
+    POST /predict   single object or array of objects → predicted prices
+                    (``?tier=fast|balanced|full`` overrides the server's tier)
+    GET  /stats     request counts, batch sizes and p50/p95/p99 latency
+    GET  /drift     input drift against the training data and unseen categories (drift.py)
+    GET  /metrics   per-stage histograms and counters (Prometheus text format)
+    GET  /health    liveness probe and the served model version
+
+The active version of the model registry (``registry.py``) is served, or
+``--files-dir`` when the registry has none.  New versions are loaded and
+validated in the background and swapped in between two batches.
+
+Usage
+-----
+    python serve.py --port 8000 --max-batch-size 256 --max-wait-ms 5 --tier fast
+    python serve.py --registry /srv/car-price/registry
+    python serve.py --log-dir logs --log-compress      # append every prediction to a log (prediction_log.py)
+"""
+
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from drift import DriftMonitor
+from inference import CATEGORICAL_COLUMNS, FEATURE_COLUMNS, FILES_DIR, NUMERIC_COLUMNS, predict_records
+from inference_pool import ServiceBusy
+from metrics import CONTENT_TYPE, REGISTRY
+from prediction_log import DEFAULT_MAX_BYTES, PredictionLog
+from registry import REGISTRY_DIR, WATCH_INTERVAL, LoadedModel, ModelWatcher
+from tiers import FULL_TIER, available_tiers, tier_model
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+DEFAULT_MAX_BATCH_SIZE = 256
+DEFAULT_MAX_WAIT_MS    = 5.0
+DEFAULT_MAX_QUEUE      = 1_024
+LATENCY_WINDOW         = 10_000   # most recent requests kept for percentiles
+MAX_BODY_BYTES         = 1 << 20  # about 4,000 records; whole inventories go through batch_score.py
+
+
+# ---------------------------------------------------------------------------
+# Micro-batcher
+# ---------------------------------------------------------------------------
+class MicroBatcher:
+    """
+    Coalesce concurrent prediction requests into batched predict calls.
+
+    A single worker thread drains the queue: it blocks for the first request,
+    then keeps collecting until ``max_batch_size`` rows are gathered or
+    ``max_wait_ms`` has elapsed, and scores everything in one call per
+    serving tier present in the batch.  :meth:`swap` replaces the model
+    between two batches, together with its input drift monitor.
+    """
+
+    def __init__(
+        self,
+        ml_model,
+        transform,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        tiers: dict[str, dict] | None = None,
+        default_tier: str = FULL_TIER,
+        prediction_log: PredictionLog | None = None,
+    ) -> None:
+        self.transform = transform
+        self.models = {name: tier_model(ml_model, name, tiers or {}) for name in available_tiers(tiers or {})}
+        if default_tier not in self.models:
+            raise ValueError(f"Unknown serving tier '{default_tier}'; available: {list(self.models)}")
+        self.default_tier = default_tier
+        self.version: str | None = None
+        self.prediction_log = prediction_log
+        self.drift = DriftMonitor(transform)
+        # (transform, models, version, drift) read once per batch, so a batch never mixes two versions.
+        self._serving = (self.transform, self.models, self.version, self.drift)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1_000
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+
+        self._lock = threading.Lock()
+        self._latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._batch_sizes: deque[int] = deque(maxlen=LATENCY_WINDOW)
+        self.requests = self.rows = self.rejected = self.errors = 0
+
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def swap(self, loaded: LoadedModel) -> None:
+        """Score every batch after the current one with ``loaded``; tiers it lacks fall back to full."""
+        models = {name: tier_model(loaded.ml_model, name, loaded.tiers) for name in available_tiers(loaded.tiers)}
+        if self.default_tier not in models:
+            logger.warning("Version %s has no '%s' tier; serving it with the full model.",
+                           loaded.version, self.default_tier)
+        drift = DriftMonitor(loaded.transform, loaded.drift_reference)
+        self.transform, self.models, self.version, self.drift = loaded.transform, models, loaded.version, drift
+        self._serving = (loaded.transform, models, loaded.version, drift)
+
+    def submit(self, records: list[dict], tier: str | None = None) -> Future:
+        """
+        Queue ``records`` for scoring with ``tier`` (default: the batcher's).
+
+        Raises ``ValueError`` for an unknown tier and ``ServiceBusy`` when the queue is full.
+        """
+        tier = tier or self.default_tier
+        if tier not in self.models and tier != self.default_tier:
+            raise ValueError(f"Unknown serving tier '{tier}'; available: {list(self.models)}")
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((records, future, time.perf_counter(), tier))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise ServiceBusy("Prediction queue is full") from None
+        return future
+
+    def _collect(self) -> list[tuple]:
+        batch = [self._queue.get()]
+        rows = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            by_tier = defaultdict(list)
+            for item in self._collect():
+                by_tier[item[3]].append(item)
+            transform, models, version, drift = self._serving
+            for tier, batch in by_tier.items():
+                self._score(models.get(tier, models[FULL_TIER]), transform, version, drift, tier, batch)
+
+    def _score(self, ml_model, transform, version: str | None, drift: DriftMonitor, tier: str,
+               batch: list[tuple]) -> None:
+        records = [record for item in batch for record in item[0]]
+        timings: dict[str, float] = {}
+        try:
+            prices = predict_records(ml_model, transform, records, timings)
+        except Exception as exc:  # noqa: BLE001
+            logger.error("Batch prediction failed: %s", exc)
+            with self._lock:
+                self.errors += len(batch)
+            for _, future, _, _ in batch:
+                future.set_exception(exc)
+            return
+
+        done = time.perf_counter()
+        offset = 0
+        with self._lock:
+            self._batch_sizes.append(len(records))
+            self.rows += len(records)
+            for item_records, future, queued_at, _ in batch:
+                future.set_result(prices[offset:offset + len(item_records)].tolist())
+                offset += len(item_records)
+                self._latencies.append(done - queued_at)
+                self.requests += 1
+        # After the responses are sent, and never allowed to stop the worker thread.
+        try:
+            self._record(records, prices, timings, done, version, drift, tier, batch)
+        except Exception as exc:  # noqa: BLE001
+            logger.error("Drift or prediction log bookkeeping failed for a batch: %s", exc)
+
+    def _record(self, records: list[dict], prices: np.ndarray, timings: dict[str, float], done: float,
+                version: str | None, drift: DriftMonitor, tier: str, batch: list[tuple]) -> None:
+        """Count a scored batch into the drift monitor and the prediction log."""
+        drift.observe_records(records)
+        if self.prediction_log is not None:
+            # Transform and predict times are the whole batch's; total is each request's own.
+            offset = 0
+            for item_records, _, queued_at, _ in batch:
+                stages = {**timings, "total": done - queued_at}
+                for record in item_records:
+                    self.prediction_log.log(record, float(prices[offset]), version, tier, "serve", stages)
+                    offset += 1
+
+    def stats(self) -> dict:
+        """Throughput counters plus latency percentiles over the recent window."""
+        with self._lock:
+            latencies = np.array(self._latencies) * 1_000
+            batch_sizes = np.array(self._batch_sizes)
+            snapshot = {
+                "model_version": self.version,
+                "requests": self.requests,
+                "rows": self.rows,
+                "rejected": self.rejected,
+                "errors": self.errors,
+                "queue_depth": self._queue.qsize(),
+            }
+        if latencies.size:
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            snapshot.update(latency_ms={"p50": round(p50, 3), "p95": round(p95, 3), "p99": round(p99, 3)},
+                            mean_batch_size=round(float(batch_sizes.mean()), 2))
+        if self.prediction_log is not None:
+            snapshot["prediction_log"] = self.prediction_log.stats()
+        return snapshot
+
+
+# ---------------------------------------------------------------------------
+# HTTP layer
+# ---------------------------------------------------------------------------
+def validate_payload(payload) -> tuple[list[dict], bool]:
+    """
+    Normalise a request body to a list of records.
+
+    Returns
+    -------
+    (records, is_single) — raises ``ValueError`` on malformed input.
+    """
+    is_single = isinstance(payload, dict)
+    records = [payload] if is_single else payload
+    if not isinstance(records, list) or not records:
+        raise ValueError("Body must be a JSON object or a non-empty array of objects.")
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            raise ValueError(f"Item {i} is not a JSON object.")
+        missing = [col for col in FEATURE_COLUMNS if col not in record]
+        if missing:
+            raise ValueError(f"Item {i} is missing fields: {missing}")
+        # Reject bad values here so one malformed request cannot fail a whole batch.
+        for col in NUMERIC_COLUMNS:
+            if isinstance(record[col], bool) or not isinstance(record[col], (int, float)):
+                raise ValueError(f"Item {i} field '{col}' must be a number.")
+        for col in CATEGORICAL_COLUMNS:
+            # null is allowed: the encoder has a value for missing categories.
+            if record[col] is not None and not isinstance(record[col], str):
+                raise ValueError(f"Item {i} field '{col}' must be a string or null.")
+    return records, is_single
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    batcher: MicroBatcher       # injected by make_server
+    request_timeout: float = 30.0
+
+    def _send_json(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "model_version": self.batcher.version})
+        elif self.path == "/stats":
+            self._send_json(200, self.batcher.stats())
+        elif self.path == "/drift":
+            self._send_json(200, {"model_version": self.batcher.version, **self.batcher.drift.report()})
+        elif self.path == "/metrics":
+            self.batcher.drift.report()         # refreshes the drift gauges
+            data = REGISTRY.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self) -> None:  # noqa: N802
+        url = urlsplit(self.path)
+        if url.path != "/predict":
+            self._send_json(404, {"error": "Not found"})
+            return
+        tier = parse_qs(url.query).get("tier", [self.batcher.default_tier])[0]
+        # Checked before reading: rfile.read(-1) blocks until the client disconnects,
+        # and a huge length would be buffered whole.
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._send_json(400, {"error": "Content-Length must be a non-negative integer."})
+            return
+        if length > MAX_BODY_BYTES:
+            self._send_json(413, {"error": f"Body exceeds {MAX_BODY_BYTES:,} bytes."})
+            return
+        try:
+            records, is_single = validate_payload(json.loads(self.rfile.read(length)))
+            future = self.batcher.submit(records, tier)
+        except ServiceBusy as exc:
+            self._send_json(503, {"error": str(exc)})
+            return
+        except (ValueError, json.JSONDecodeError) as exc:
+            self._send_json(400, {"error": str(exc)})
+            return
+
+        try:
+            prices = future.result(timeout=self.request_timeout)
+        except Exception as exc:  # noqa: BLE001
+            self._send_json(500, {"error": f"Prediction failed: {exc}"})
+            return
+
+        if is_single:
+            self._send_json(200, {"prediction": prices[0], "tier": tier})
+        else:
+            self._send_json(200, {"predictions": prices, "tier": tier})
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class PredictionServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1_024   # socketserver's default backlog of 5 resets bursts of clients
+
+
+def make_server(host: str, port: int, batcher: MicroBatcher) -> PredictionServer:
+    handler = type("BoundPredictionHandler", (PredictionHandler,), {"batcher": batcher})
+    return PredictionServer((host, port), handler)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve car price predictions over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--files-dir", default=FILES_DIR,
+                        help="Directory holding the model artefacts when the registry has no active version.")
+    parser.add_argument("--registry", default=REGISTRY_DIR, help="Model registry to serve and watch (registry.py).")
+    parser.add_argument("--watch-interval", type=float, default=WATCH_INTERVAL,
+                        help="Seconds between checks for a new model version.")
+    parser.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE,
+                        help="Maximum rows scored per predict call.")
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help="Longest a request waits for a batch to fill.")
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE,
+                        help="Pending requests accepted before answering 503.")
+    parser.add_argument("--log-dir", help="Append every prediction to a log in this directory.")
+    parser.add_argument("--log-max-mb", type=float, default=DEFAULT_MAX_BYTES / 2 ** 20,
+                        help="Size at which a log segment is closed and a new one started.")
+    parser.add_argument("--log-compress", action="store_true", help="Gzip the log segments.")
+    parser.add_argument("--tier", default=FULL_TIER,
+                        help="Default serving tier (full, balanced, fast; see tiers.py).")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    watcher = ModelWatcher(args.registry, args.files_dir, interval=args.watch_interval)
+    watcher.check()
+    loaded = watcher.current()
+    if loaded is None:
+        raise SystemExit(f"Model artefacts could not be loaded ({watcher.last_error}).")
+
+    prediction_log = (PredictionLog(args.log_dir, int(args.log_max_mb * 2 ** 20), args.log_compress)
+                      if args.log_dir else None)
+    batcher = MicroBatcher(loaded.ml_model, loaded.transform, args.max_batch_size, args.max_wait_ms,
+                           args.max_queue, loaded.tiers, args.tier, prediction_log)
+    batcher.swap(loaded)
+    watcher.subscribe(batcher.swap)
+    watcher.start()
+    server = make_server(args.host, args.port, batcher)
+    logger.info("Serving predictions on http://%s:%d (batch ≤ %d rows, wait ≤ %.1f ms, tier %s of %s).",
+                args.host, args.port, args.max_batch_size, args.max_wait_ms, args.tier, list(batcher.models))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        watcher.stop()
+        if prediction_log is not None:
+            prediction_log.close()
+
+
+if __name__ == "__main__":
+    main()
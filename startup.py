@@ -0,0 +1,135 @@
+"""
+Car Price AI — Cold Start
+=========================
+Background warm-up of the model artefacts.
+
+Importing ``xgboost``/``category_encoders`` and unpickling the artefacts takes
+seconds.  ``start_warmup`` does all of it on a background thread — imports,
+artefact loading, transform compilation and one throw-away prediction — so
+the home page renders immediately and the first real valuation is fast.
+Every step is timed and logged so cold start can be tracked across releases.
+
+When a model bundle (see ``bundle.py``) exists it is preferred over the joblib
+files, and the process RSS before/after loading is logged alongside.
+"""
+
+import importlib
+import logging
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from bundle import has_bundle, load_bundle
+from compiled_transform import CompiledTransform
+from inference import CATEGORICAL_COLUMNS, FILES_DIR, NUMERIC_COLUMNS, load_artefacts, predict_records
+from metrics import ARTEFACT_LOAD_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+# Pulled in implicitly by unpickling the artefacts; imported explicitly first so
+# their cost shows up as its own line in the timings. A bundle only needs xgboost.
+HEAVY_MODULES: list[str] = ["sklearn", "category_encoders", "xgboost"]
+BUNDLE_MODULES: list[str] = ["xgboost"]
+
+
+def _dummy_record() -> dict:
+    """Input that exercises every column; unknown categories are fine here."""
+    return {**{col: "" for col in CATEGORICAL_COLUMNS}, **{col: 0.0 for col in NUMERIC_COLUMNS}}
+
+
+def memory_usage() -> dict[str, int]:
+    """Resident and shared (file-backed) memory of this process in KiB; empty off Linux."""
+    try:
+        with open("/proc/self/statm", "r", encoding="utf-8") as fh:
+            _, resident, shared, *_ = (int(field) for field in fh.read().split())
+    except OSError:
+        return {}
+    page_kib = os.sysconf("SC_PAGE_SIZE") // 1024
+    return {"rss_kib": resident * page_kib, "shared_kib": shared * page_kib}
+
+
+def _format_memory(usage: dict[str, int]) -> str:
+    if not usage:
+        return "n/a"
+    return f"RSS {usage['rss_kib'] / 1024:.1f} MiB (shared {usage['shared_kib'] / 1024:.1f} MiB)"
+
+
+def _load_joblib(files_dir: str, timings: dict[str, float]) -> tuple:
+    started = time.perf_counter()
+    ml_model, encoder, scaler, options = load_artefacts(files_dir)
+    timings["load artefacts"] = (time.perf_counter() - started) * 1_000
+    if ml_model is None:
+        return None, None, None
+
+    started = time.perf_counter()
+    transform = CompiledTransform.from_artefacts(encoder, scaler)
+    timings["compile transform"] = (time.perf_counter() - started) * 1_000
+    return ml_model, transform, options
+
+
+def _load_bundle(bundle_dir: str, timings: dict[str, float]) -> tuple:
+    started = time.perf_counter()
+    try:
+        resources = load_bundle(bundle_dir)
+    except Exception as exc:  # noqa: BLE001
+        logger.error("Could not load bundle %s: %s", bundle_dir, exc)
+        return None, None, None
+    timings["load bundle"] = (time.perf_counter() - started) * 1_000
+    return resources
+
+
+def load_and_warm(files_dir: str = FILES_DIR) -> tuple:
+    """
+    Import, load, compile and run one prediction, logging the time of each step.
+
+    Returns
+    -------
+    (ml_model, transform, options) or (None, None, None) on failure.
+    """
+    timings: dict[str, float] = {}
+
+    def _lap(label: str, started: float) -> None:
+        timings[label] = (time.perf_counter() - started) * 1_000
+
+    total = time.perf_counter()
+    bundle_dir = f"{files_dir}/bundle"
+    use_bundle = has_bundle(bundle_dir)
+    for name in BUNDLE_MODULES if use_bundle else HEAVY_MODULES:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as exc:
+            logger.error("Could not import %s: %s", name, exc)
+        _lap(f"import {name}", started)
+
+    before = memory_usage()
+    ml_model, transform, options = None, None, None
+    if use_bundle:
+        ml_model, transform, options = _load_bundle(bundle_dir, timings)
+    if ml_model is None:
+        # joblib artefacts remain the fallback when no (valid) bundle exists.
+        ml_model, transform, options = _load_joblib(files_dir, timings)
+    if ml_model is None:
+        return None, None, None
+    logger.info("Memory before load: %s; after: %s.", _format_memory(before), _format_memory(memory_usage()))
+
+    started = time.perf_counter()
+    predict_records(ml_model, transform, [_dummy_record()])
+    _lap("first predict", started)
+    _lap("total", total)
+
+    logger.info("Cold start: %s", ", ".join(f"{label} {ms:.0f} ms" for label, ms in timings.items()))
+    for label, ms in timings.items():
+        ARTEFACT_LOAD_SECONDS.set(ms / 1_000, label)
+    return ml_model, transform, options
+
+
+def start_warmup(files_dir: str = FILES_DIR) -> Future:
+    """Run :func:`load_and_warm` on a daemon thread; the future yields its tuple."""
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="artefact-warmup")
+    future = executor.submit(load_and_warm, files_dir)
+    executor.shutdown(wait=False)
+    return future
@@ -0,0 +1,224 @@
+"""
+Car Price AI — Serving Tiers
+============================
+Latency tiers of the production XGBoost model, all cut from the same booster
+with ``iteration_range`` — no second model to train or ship.
+
+The learning curve (``files/xgboost_learning_curve.png``) flattens long before
+the 1,000th tree, so predicting with the first N trees gives up little
+accuracy while walking a fraction of the trees.  :func:`measure_tiers` scores
+every ``TREE_STEP``-tree prefix of the booster on the test split, picks for
+each tier the fewest trees whose MAE stays within the tier's tolerance of the
+full model, and times single-row latency per tier.  The result is stored next
+to the model as ``tiers.json``; the training pipeline writes it on every
+``train`` stage.
+
+Tiers
+-----
+    full      every tree — the batch default
+    balanced  MAE within 1% of full
+    fast      MAE within 5% of full — the app default
+
+Usage
+-----
+    python tiers.py --data car_prices.csv          # re-measure files/xgb_model.joblib
+    python batch_score.py inventory.csv out.parquet --tier full
+    python serve.py --tier fast                    # POST /predict?tier=full overrides per request
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+from inference import FILES_DIR
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+FORMAT_VERSION = 1
+TIERS_FILE     = "tiers.json"
+FULL_TIER      = "full"
+
+# Largest MAE increase over the full model each tier accepts.
+TIER_TOLERANCES: dict[str, float] = {"balanced": 0.01, "fast": 0.05}
+TREE_STEP     = 25
+EVAL_ROWS     = 20_000     # rows scored per prefix while searching; final metrics use the whole split
+LATENCY_CALLS = 200
+SEED          = 7
+
+
+# ---------------------------------------------------------------------------
+# Serving
+# ---------------------------------------------------------------------------
+class TieredModel:
+    """
+    ``ml_model`` restricted to its first ``trees`` trees.
+
+    Exposes the ``predict`` the scoring functions call and goes straight to
+    the booster's in-place prediction, skipping the sklearn wrapper.
+    """
+
+    def __init__(self, ml_model, trees: int) -> None:
+        self.ml_model = ml_model
+        self.trees = trees
+        self._booster = ml_model.get_booster()
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        return self._booster.inplace_predict(x, iteration_range=(0, self.trees))
+
+    def contributions(self, x: np.ndarray, approximate: bool = False) -> np.ndarray:
+        """Per-feature TreeSHAP values (plus bias) over the tier's trees."""
+        from xgboost import DMatrix
+
+        return self._booster.predict(DMatrix(x), pred_contribs=True, approx_contribs=approximate,
+                                     iteration_range=(0, self.trees))
+
+
+def total_trees(ml_model) -> int:
+    return ml_model.get_booster().num_boosted_rounds()
+
+
+def tier_model(ml_model, tier: str, tiers: dict[str, dict]):
+    """``ml_model`` as served by ``tier``; ``full`` is the model itself."""
+    if tier == FULL_TIER:
+        return ml_model
+    if tier not in tiers:
+        raise ValueError(f"Unknown serving tier '{tier}'; available: {available_tiers(tiers)}")
+    return TieredModel(ml_model, tiers[tier]["trees"])
+
+
+def available_tiers(tiers: dict[str, dict]) -> list[str]:
+    """Tier names, slowest first; ``full`` is always available."""
+    return [FULL_TIER] + [name for name in TIER_TOLERANCES if name in tiers]
+
+
+def load_tiers(files_dir: str = FILES_DIR, ml_model=None) -> dict[str, dict]:
+    """
+    Measured tiers stored with the artefacts.
+
+    Empty when none were measured, the file is unreadable, or it was measured
+    on a model with a different number of trees than ``ml_model``.
+    """
+    try:
+        with open(os.path.join(files_dir, TIERS_FILE), "r", encoding="utf-8") as fh:
+            report = json.load(fh)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as exc:
+        logger.error("Serving tiers not loaded: %s", exc)
+        return {}
+    if report.get("format_version") != FORMAT_VERSION:
+        logger.error("Serving tiers have format %s, expected %d.", report.get("format_version"), FORMAT_VERSION)
+        return {}
+    if ml_model is not None and report["total_trees"] != total_trees(ml_model):
+        logger.error("Serving tiers were measured on a %d-tree model, the loaded one has %d; ignoring them.",
+                     report["total_trees"], total_trees(ml_model))
+        return {}
+    return report["tiers"]
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+def _row_latency_ms(model, x: np.ndarray, calls: int = LATENCY_CALLS) -> float:
+    timings = []
+    for i in range(calls):
+        row = x[i % len(x)][None, :]
+        started = time.perf_counter()
+        model.predict(row)
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings)) * 1_000
+
+
+def measure_tiers(ml_model, x_test: np.ndarray, y_test: np.ndarray,
+                  tolerances: dict[str, float] = TIER_TOLERANCES, step: int = TREE_STEP,
+                  eval_rows: int = EVAL_ROWS) -> dict:
+    """
+    Pick the tree count of each tier and measure its accuracy and latency.
+
+    Returns
+    -------
+    The ``tiers.json`` report: per tier its trees, MAE, RMSE, R² and median
+    single-row latency, plus the MAE of every prefix that was scored.
+    """
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+    booster = ml_model.get_booster()
+    trees = total_trees(ml_model)
+    rows = np.random.default_rng(SEED).permutation(len(x_test))[:eval_rows]
+    x_eval, y_eval = x_test[rows], y_test[rows]
+
+    curve = {n: float(mean_absolute_error(y_eval, booster.inplace_predict(x_eval, iteration_range=(0, n))))
+             for n in sorted(set(range(step, trees, step)) | {trees})}
+    chosen = {FULL_TIER: trees}
+    for name, tolerance in tolerances.items():
+        chosen[name] = min(n for n, mae in curve.items() if mae <= curve[trees] * (1 + tolerance))
+
+    tiers = {}
+    for name, n in chosen.items():
+        model = TieredModel(ml_model, n)
+        predicted = model.predict(x_test)
+        tiers[name] = {
+            "trees": n,
+            "mae": float(mean_absolute_error(y_test, predicted)),
+            "rmse": float(np.sqrt(mean_squared_error(y_test, predicted))),
+            "r2": float(r2_score(y_test, predicted)),
+            "row_latency_ms": round(_row_latency_ms(model, x_test), 4),
+        }
+        logger.info("Tier %-8s %4d trees  MAE %8.2f $  %.3f ms/row",
+                    name, n, tiers[name]["mae"], tiers[name]["row_latency_ms"])
+    return {
+        "format_version": FORMAT_VERSION,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "total_trees": trees,
+        "eval_rows": len(rows),
+        "tiers": tiers,
+        "mae_by_trees": {str(n): round(mae, 2) for n, mae in curve.items()},
+    }
+
+
+def write_tiers(report: dict, out_dir: str) -> None:
+    with open(os.path.join(out_dir, TIERS_FILE), "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def main(argv: list[str] | None = None) -> None:
+    import joblib
+    import pandas as pd
+
+    from inference import FEATURE_COLUMNS
+    from train_pipeline import CACHE_DIR, RAW_CSV, TARGET, TrainingPipeline
+
+    parser = argparse.ArgumentParser(description="Measure the serving tiers of the exported model.")
+    parser.add_argument("--data", default=RAW_CSV, help="Raw sales CSV (car_prices.csv).")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="Training pipeline cache.")
+    parser.add_argument("--files-dir", default=FILES_DIR, help="Directory holding xgb_model.joblib.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    pipeline = TrainingPipeline(args.data, args.cache_dir)
+    pipeline.run(until="scale")
+    test = pd.read_parquet(f"{pipeline.stage_dir('scale')}/test.parquet")
+    ml_model = joblib.load(f"{args.files_dir}/xgb_model.joblib")
+
+    report = measure_tiers(ml_model, test[FEATURE_COLUMNS].to_numpy(dtype=np.float32),
+                           test[TARGET].to_numpy(dtype=np.float32))
+    write_tiers(report, args.files_dir)
+    for name, tier in report["tiers"].items():
+        print(f"{name:<9} {tier['trees']:>5} trees  MAE {tier['mae']:>9.2f} $  R² {tier['r2']:.4f}  "
+              f"{tier['row_latency_ms']:.3f} ms/row")
+    print(f"Tiers written to {args.files_dir}/{TIERS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
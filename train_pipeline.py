@@ -0,0 +1,440 @@
+"""
+Car Price AI — Training Pipeline
+================================
+Scripted version of the training flow in ``CARS.ipynb``:
+
+    clean → split → encode → scale → train → index → export
+
+The raw CSV is read once with explicit compact dtypes (categoricals,
+``float32``) and every intermediate is written as Parquet under a cache
+directory keyed by a content hash of its inputs and parameters.  A stage
+whose key already has an output is skipped, so re-running after changing
+only the model parameters goes straight to ``train``.  Wall time and peak
+resident memory are reported per stage.
+
+The export stage writes the artefacts ``load_resources`` expects
+(``xgb_model.joblib``, ``target_encoder.joblib``, ``scaler.joblib``,
+``options.json`` and the options catalogue), the serving tiers measured in
+``train`` (``tiers.json``, see ``tiers.py``), the comparable-sales index
+built in ``index`` (``comparables/``, see ``comparables.py``), the target encoder's
+per-category statistics (``encoder_stats.parquet``, see ``refresh.py``), the
+training inputs' reference summaries (``drift_reference.json``, see ``drift.py``) and
+``training_run.json``, and refreshes ``files/bundle`` when one is present.
+
+Usage
+-----
+    python train_pipeline.py --data car_prices.csv
+    python train_pipeline.py --data car_prices.csv --n-estimators 200 --out /tmp/files
+    python train_pipeline.py --data car_prices.csv --params tuned_params.json
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import logging
+import os
+import resource
+import shutil
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from catalogue import Catalogue, build_from_frame
+from inference import CATEGORICAL_COLUMNS, FEATURE_COLUMNS, FILES_DIR, updating_artefacts
+from normalization import normalize_frame
+from tiers import TIERS_FILE, measure_tiers, write_tiers
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+RAW_CSV   = "car_prices.csv"
+CACHE_DIR = ".pipeline_cache"
+TARGET    = "sellingprice"
+
+# Bump when a stage's code changes so cached outputs from older code are not reused.
+PIPELINE_VERSION = 5
+
+# vin and mmr are dropped by the notebook, so they are never read.
+RAW_DTYPES: dict[str, str] = {
+    "year": "float32", "make": "category", "model": "category", "trim": "category",
+    "body": "category", "transmission": "category", "state": "category",
+    "condition": "float32", "odometer": "float32", "color": "category",
+    "interior": "category", "seller": "category", TARGET: "float32", "saledate": "category",
+}
+# The notebook fills these with "Unknown"; ``state`` is left missing on purpose.
+FILL_UNKNOWN: list[str] = ["make", "model", "trim", "body", "transmission", "color", "interior", "seller"]
+
+MIN_PRICE  = 100
+TRAIN_SIZE = 0.8
+SPLIT_SEED = 7
+
+# best_params_xgb from the notebook's RandomizedSearchCV.
+XGB_PARAMS: dict = {
+    "subsample": 1.0, "n_estimators": 1000, "max_depth": 7, "learning_rate": 0.1,
+    "gamma": 0.1, "random_state": 42, "n_jobs": -1,
+}
+
+STAGES: list[str] = ["clean", "split", "encode", "scale", "train", "index", "export"]
+RUN_FILE = "training_run.json"
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+def _key(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _reset_peak_rss() -> None:
+    """Reset the kernel's high-water mark so the next reading covers one stage (Linux only)."""
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="utf-8") as fh:
+            fh.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_kib() -> int:
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    # Process-lifetime peak; cannot be reset, so later stages report at least the earlier peaks.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _write_parquet(frame: pd.DataFrame, path: str) -> None:
+    frame.to_parquet(path, index=False)
+
+
+def _split_xy(frame: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series]:
+    return frame[FEATURE_COLUMNS], frame[TARGET]
+
+
+# ---------------------------------------------------------------------------
+# Stage bodies
+# ---------------------------------------------------------------------------
+def read_raw(path: str) -> pd.DataFrame:
+    """Read the raw sales CSV with compact dtypes."""
+    return pd.read_csv(path, usecols=list(RAW_DTYPES), dtype=RAW_DTYPES, on_bad_lines="skip")
+
+
+def filter_sales(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rows of a :func:`read_raw` frame the model can learn from, with ``car_age`` added.
+
+    Sale dates are parsed once per distinct value (a few thousand) rather than
+    once per row, then mapped back through the category codes.
+    """
+    df = df[df[TARGET] > MIN_PRICE]
+
+    dates = df["saledate"].cat.categories
+    parsed = pd.to_datetime(pd.Series(dates, dtype=object), errors="coerce", utc=True)
+    years = np.append(parsed.dt.year.to_numpy(dtype=np.float64), np.nan)   # code -1 → NaN
+    sale_year = years[df["saledate"].cat.codes.to_numpy()]
+
+    keep = ~np.isnan(sale_year) & df["year"].notna().to_numpy()
+    df = df[keep].copy()
+    df["car_age"] = (sale_year[keep] - df["year"].to_numpy().astype(np.int64)).astype(np.int16)
+    return df
+
+
+def clean_frame(df: pd.DataFrame, fill_values: dict[str, float] | None = None) -> pd.DataFrame:
+    """
+    Apply the notebook's cleaning steps to a frame from :func:`read_raw`.
+
+    Missing ``odometer`` and ``condition`` are filled with ``fill_values``, by
+    default the frame's own medians.  Categorical columns come out in their
+    canonical spelling (see ``normalization.py``).
+    """
+    df = filter_sales(df)
+    for col in ["odometer", "condition"]:
+        df[col] = df[col].fillna(df[col].median() if fill_values is None else fill_values[col])
+    for col in FILL_UNKNOWN:
+        if "Unknown" not in df[col].cat.categories:
+            df[col] = df[col].cat.add_categories("Unknown")
+        df[col] = df[col].fillna("Unknown")
+    for col in CATEGORICAL_COLUMNS:
+        df[col] = df[col].cat.remove_unused_categories()
+    # Canonical spellings before fitting, so the encoder, options and inference agree.
+    return normalize_frame(df[FEATURE_COLUMNS + [TARGET]].reset_index(drop=True))
+
+
+def evaluate(ml_model, x_test: np.ndarray, y_test: np.ndarray) -> dict[str, float]:
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+    predicted = ml_model.predict(x_test)
+    return {
+        "r2": float(r2_score(y_test, predicted)),
+        "mae": float(mean_absolute_error(y_test, predicted)),
+        "rmse": float(np.sqrt(mean_squared_error(y_test, predicted))),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Pipeline
+# ---------------------------------------------------------------------------
+class TrainingPipeline:
+    """
+    Content-addressed stage runner.
+
+    Each stage writes into ``<cache_dir>/<stage>-<key>/`` via a temporary
+    directory that is renamed into place on success, so an interrupted run
+    never leaves a half-written stage that a later run would trust.
+    """
+
+    def __init__(self, data_path: str, cache_dir: str = CACHE_DIR, out_dir: str = FILES_DIR,
+                 xgb_params: dict | None = None, force: bool = False) -> None:
+        self.data_path = data_path
+        self.cache_dir = cache_dir
+        self.out_dir = out_dir
+        self.xgb_params = {**XGB_PARAMS, **(xgb_params or {})}
+        self.force = force
+        self.keys: dict[str, str] = {}
+        self.report: list[dict] = []
+
+    def stage_dir(self, stage: str) -> str:
+        return os.path.join(self.cache_dir, f"{stage}-{self.keys[stage]}")
+
+    def _run(self, stage: str, body, done=None) -> None:
+        """Run ``body(out_dir)`` unless the stage output already exists; record time and peak RSS."""
+        final = self.stage_dir(stage) if stage != "export" else self.out_dir
+        is_done = done() if done else os.path.isdir(final)
+        if is_done and not self.force:
+            logger.info("%-6s cached (%s)", stage, self.keys[stage])
+            self.report.append({"stage": stage, "status": "cached", "seconds": 0.0, "peak_rss_mib": None})
+            return
+
+        _reset_peak_rss()
+        started = time.perf_counter()
+        if stage == "export":
+            with updating_artefacts(final):
+                body(final)
+        else:
+            staging = f"{final}.tmp-{os.getpid()}"
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+            body(staging)
+            shutil.rmtree(final, ignore_errors=True)
+            os.replace(staging, final)
+        seconds = time.perf_counter() - started
+        peak = _peak_rss_kib() / 1024
+        logger.info("%-6s ran in %.1f s, peak RSS %.0f MiB (%s)", stage, seconds, peak, self.keys[stage])
+        self.report.append({"stage": stage, "status": "ran", "seconds": round(seconds, 3),
+                            "peak_rss_mib": round(peak, 1)})
+
+    # -- stages -------------------------------------------------------------
+    def _clean(self, out: str) -> None:
+        frame = clean_frame(read_raw(self.data_path))
+        logger.info("Rows remaining after cleaning: %d", len(frame))
+        _write_parquet(frame, f"{out}/clean.parquet")
+
+    def _split(self, out: str) -> None:
+        from sklearn.model_selection import train_test_split
+
+        frame = pd.read_parquet(f"{self.stage_dir('clean')}/clean.parquet")
+        train, test = train_test_split(frame, train_size=TRAIN_SIZE, random_state=SPLIT_SEED)
+        _write_parquet(train, f"{out}/train.parquet")
+        _write_parquet(test, f"{out}/test.parquet")
+
+    def _encode(self, out: str) -> None:
+        import category_encoders as ce
+
+        from drift import build_reference, write_reference
+        from refresh import STATS_FILE, encoder_stats
+
+        source = self.stage_dir("split")
+        x_train, y_train = _split_xy(pd.read_parquet(f"{source}/train.parquet"))
+        x_test, y_test = _split_xy(pd.read_parquet(f"{source}/test.parquet"))
+        encoder = ce.TargetEncoder(cols=CATEGORICAL_COLUMNS, handle_unknown="value")
+        encoder.fit(x_train, y_train)
+        joblib.dump(encoder, f"{out}/target_encoder.joblib")
+        # Per-category sufficient statistics, so refresh.py can update the encoder later.
+        encoder_stats(x_train, y_train).to_parquet(f"{out}/{STATS_FILE}", index=False)
+        # What serving traffic is compared with to detect input drift.
+        write_reference(build_reference(x_train, x_test), out)
+        for name, x, y in (("train", x_train, y_train), ("test", x_test, y_test)):
+            encoded = encoder.transform(x).astype(np.float32)
+            encoded[TARGET] = y.to_numpy()
+            _write_parquet(encoded, f"{out}/{name}.parquet")
+
+    def _scale(self, out: str) -> None:
+        from sklearn.preprocessing import StandardScaler
+
+        source = self.stage_dir("encode")
+        x_train, y_train = _split_xy(pd.read_parquet(f"{source}/train.parquet"))
+        scaler = StandardScaler().fit(x_train)
+        joblib.dump(scaler, f"{out}/scaler.joblib")
+        for name, x, y in (("train", x_train, y_train),
+                           ("test", *_split_xy(pd.read_parquet(f"{source}/test.parquet")))):
+            scaled = pd.DataFrame(scaler.transform(x).astype(np.float32), columns=FEATURE_COLUMNS)
+            scaled[TARGET] = y.to_numpy()
+            _write_parquet(scaled, f"{out}/{name}.parquet")
+
+    def _train(self, out: str) -> None:
+        from xgboost import XGBRegressor
+
+        source = self.stage_dir("scale")
+        x_train, y_train = _split_xy(pd.read_parquet(f"{source}/train.parquet"))
+        x_test, y_test = _split_xy(pd.read_parquet(f"{source}/test.parquet"))
+        # Fitted on arrays, the same input the compiled transform produces at inference.
+        started = time.perf_counter()
+        ml_model = XGBRegressor(**self.xgb_params).fit(x_train.to_numpy(), y_train.to_numpy())
+        train_seconds = time.perf_counter() - started
+        metrics = evaluate(ml_model, x_test.to_numpy(), y_test.to_numpy())
+        metrics["train_seconds"] = round(train_seconds, 2)
+        logger.info("Test R² %.4f, MAE %.2f $, RMSE %.2f $", metrics["r2"], metrics["mae"], metrics["rmse"])
+        joblib.dump(ml_model, f"{out}/xgb_model.joblib")
+        with open(f"{out}/metrics.json", "w", encoding="utf-8") as fh:
+            json.dump(metrics, fh, indent=2)
+        write_tiers(measure_tiers(ml_model, x_test.to_numpy(), y_test.to_numpy()), out)
+
+    def _index(self, out: str) -> None:
+        from comparables import build_index
+
+        sales = pd.read_parquet(f"{self.stage_dir('split')}/train.parquet")
+        scaled = pd.read_parquet(f"{self.stage_dir('scale')}/train.parquet", columns=FEATURE_COLUMNS)
+        build_index(sales, scaled.to_numpy(dtype=np.float32), out)
+
+    def _export(self, out: str) -> None:
+        from comparables import INDEX_DIR
+        from drift import REFERENCE_FILE
+        from refresh import STATS_FILE
+
+        os.makedirs(out, exist_ok=True)
+        artefacts = {
+            "xgb_model.joblib": f"{self.stage_dir('train')}/xgb_model.joblib",
+            "target_encoder.joblib": f"{self.stage_dir('encode')}/target_encoder.joblib",
+            "scaler.joblib": f"{self.stage_dir('scale')}/scaler.joblib",
+            STATS_FILE: f"{self.stage_dir('encode')}/{STATS_FILE}",
+            REFERENCE_FILE: f"{self.stage_dir('encode')}/{REFERENCE_FILE}",
+            TIERS_FILE: f"{self.stage_dir('train')}/{TIERS_FILE}",
+        }
+        for name, path in artefacts.items():
+            shutil.copyfile(path, f"{out}/{name}.tmp")
+            os.replace(f"{out}/{name}.tmp", f"{out}/{name}")
+
+        staging = f"{out}/{INDEX_DIR}.tmp-{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        shutil.copytree(self.stage_dir("index"), staging)
+        shutil.rmtree(f"{out}/{INDEX_DIR}", ignore_errors=True)
+        os.replace(staging, f"{out}/{INDEX_DIR}")
+
+        clean = pd.read_parquet(f"{self.stage_dir('clean')}/clean.parquet", columns=CATEGORICAL_COLUMNS)
+        staging = f"{out}/catalogue.tmp-{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        build_from_frame(clean, staging)
+        shutil.rmtree(f"{out}/catalogue", ignore_errors=True)
+        os.replace(staging, f"{out}/catalogue")
+        with open(f"{out}/options.json", "w", encoding="utf-8") as fh:
+            json.dump(Catalogue(f"{out}/catalogue").to_dict(), fh)
+
+        self._refresh_bundle(out)
+        with open(f"{self.stage_dir('train')}/metrics.json", "r", encoding="utf-8") as fh:
+            metrics = json.load(fh)
+        run = {
+            "pipeline_version": PIPELINE_VERSION,
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "data": os.path.abspath(self.data_path),
+            "keys": self.keys,
+            "xgb_params": self.xgb_params,
+            "metrics": metrics,
+        }
+        with open(f"{out}/{RUN_FILE}", "w", encoding="utf-8") as fh:
+            json.dump(run, fh, indent=2)
+
+    @staticmethod
+    def _refresh_bundle(out: str) -> None:
+        """Re-export ``<out>/bundle`` if present, otherwise the app would keep serving the old model."""
+        from bundle import export_bundle, has_bundle
+        from compiled_transform import CompiledTransform
+
+        if not has_bundle(f"{out}/bundle"):
+            return
+        ml_model = joblib.load(f"{out}/xgb_model.joblib")
+        transform = CompiledTransform.from_artefacts(joblib.load(f"{out}/target_encoder.joblib"),
+                                                     joblib.load(f"{out}/scaler.joblib"))
+        export_bundle(ml_model, transform, Catalogue(f"{out}/catalogue"), f"{out}/bundle")
+
+    def _exported(self) -> bool:
+        try:
+            with open(f"{self.out_dir}/{RUN_FILE}", "r", encoding="utf-8") as fh:
+                return json.load(fh)["keys"].get("export") == self.keys["export"]
+        except (OSError, ValueError, KeyError):
+            return False
+
+    # -- driver -------------------------------------------------------------
+    def run(self, until: str = STAGES[-1]) -> list[dict]:
+        """Run every stage up to and including ``until``; returns the per-stage report."""
+        started = time.perf_counter()
+        self.keys["clean"]  = _key("clean", PIPELINE_VERSION, _file_sha256(self.data_path), RAW_DTYPES, MIN_PRICE)
+        self.keys["split"]  = _key("split", self.keys["clean"], TRAIN_SIZE, SPLIT_SEED)
+        self.keys["encode"] = _key("encode", self.keys["split"])
+        self.keys["scale"]  = _key("scale", self.keys["encode"])
+        self.keys["train"]  = _key("train", self.keys["scale"], self.xgb_params)
+        self.keys["index"]  = _key("index", self.keys["scale"])
+        self.keys["export"] = _key("export", self.keys["train"], self.keys["index"])
+
+        bodies = {
+            "clean": self._clean, "split": self._split, "encode": self._encode,
+            "scale": self._scale, "train": self._train, "index": self._index, "export": self._export,
+        }
+        for stage in STAGES[:STAGES.index(until) + 1]:
+            self._run(stage, bodies[stage], self._exported if stage == "export" else None)
+
+        self.report.append({"stage": "total", "status": "", "seconds": round(time.perf_counter() - started, 3),
+                            "peak_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)})
+        return self.report
+
+
+def format_report(report: list[dict]) -> str:
+    lines = [f"{'stage':<8}{'status':<8}{'seconds':>10}{'peak RSS':>12}"]
+    for row in report:
+        peak = f"{row['peak_rss_mib']:,.0f} MiB" if row["peak_rss_mib"] is not None else "—"
+        lines.append(f"{row['stage']:<8}{row['status']:<8}{row['seconds']:>10.1f}{peak:>12}")
+    return "\n".join(lines)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Train the car price model from the raw sales CSV.")
+    parser.add_argument("--data", default=RAW_CSV, help="Raw sales CSV (car_prices.csv).")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="Where stage outputs are cached.")
+    parser.add_argument("--out", default=FILES_DIR, help="Where the serving artefacts are exported.")
+    parser.add_argument("--until", choices=STAGES, default=STAGES[-1], help="Last stage to run.")
+    parser.add_argument("--params", metavar="PATH", help="JSON of XGBoost parameters, e.g. from tuning.py.")
+    parser.add_argument("--n-estimators", type=int, help="Override the tuned number of trees.")
+    parser.add_argument("--force", action="store_true", help="Re-run every stage, ignoring the cache.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    overrides = {}
+    if args.params:
+        with open(args.params, "r", encoding="utf-8") as fh:
+            overrides.update(json.load(fh)["params"])
+    if args.n_estimators:
+        overrides["n_estimators"] = args.n_estimators
+    pipeline = TrainingPipeline(args.data, args.cache_dir, args.out, overrides, args.force)
+    print(format_report(pipeline.run(args.until)))
+
+
+if __name__ == "__main__":
+    main()
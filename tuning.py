@@ -0,0 +1,251 @@
+"""
+Car Price AI — Hyperparameter Search
+====================================
+Hyperband search over the notebook's XGBoost search space, replacing
+``RandomizedSearchCV(n_iter=10, cv=3)`` with full-length candidates.
+
+Each Hyperband bracket is a round of successive halving: many configurations
+get a small tree budget, and only the best ``1/eta`` are promoted to the next
+rung with ``eta`` times the budget, up to ``--max-trees``.  Every trial uses
+XGBoost early stopping on a held-out validation fold carved from the training
+split, so a candidate that has stopped improving stops spending CPU.
+
+Trials run on a process pool sized to the machine (threads per trial split
+evenly).  Each finished trial is appended to a JSONL checkpoint keyed by the
+training data's cache key, so re-running the same command skips completed
+trials and resumes where a killed search stopped.
+
+Usage
+-----
+    python tuning.py --data car_prices.csv --out tuned_params.json
+    python tuning.py --data car_prices.csv --baseline          # also time best_params_xgb
+    python train_pipeline.py --data car_prices.csv --params tuned_params.json
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from inference import FEATURE_COLUMNS
+from train_pipeline import CACHE_DIR, RAW_CSV, TARGET, XGB_PARAMS, TrainingPipeline
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+# The notebook's XGBoost param_dist; n_estimators becomes the Hyperband budget.
+SEARCH_SPACE: dict[str, list] = {
+    "max_depth": [3, 5, 7, 9],
+    "learning_rate": [0.01, 0.05, 0.1],
+    "subsample": [0.7, 0.8, 1.0],
+    "gamma": [0, 0.1, 0.2],
+}
+MIN_TREES = 50
+MAX_TREES = 1_000
+ETA = 3
+EARLY_STOPPING_ROUNDS = 30
+VALID_SIZE = 0.2
+SEED = 42
+
+# Worker-process state, filled once by _init_worker.
+_DATA: dict[str, np.ndarray] = {}
+
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+def _init_worker(train_path: str) -> None:
+    from sklearn.model_selection import train_test_split
+
+    frame = pd.read_parquet(train_path)
+    x = frame[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+    y = frame[TARGET].to_numpy(dtype=np.float32)
+    _DATA["x_fit"], _DATA["x_valid"], _DATA["y_fit"], _DATA["y_valid"] = train_test_split(
+        x, y, test_size=VALID_SIZE, random_state=SEED,
+    )
+
+
+def run_trial(trial: dict, n_jobs: int) -> dict:
+    """Fit one configuration with ``trial["budget"]`` trees and early stopping; return its scores."""
+    from xgboost import XGBRegressor
+
+    early_stopping = trial.get("early_stopping", True)
+    params = {
+        **trial["config"], "n_estimators": trial["budget"], "random_state": SEED, "n_jobs": n_jobs,
+        "eval_metric": "rmse", "early_stopping_rounds": EARLY_STOPPING_ROUNDS if early_stopping else None,
+    }
+    wall, cpu = time.perf_counter(), time.process_time()
+    ml_model = XGBRegressor(**params)
+    ml_model.fit(_DATA["x_fit"], _DATA["y_fit"], eval_set=[(_DATA["x_valid"], _DATA["y_valid"])], verbose=False)
+    history = ml_model.evals_result()["validation_0"]["rmse"]
+    # Without early stopping the model keeps every tree, so it is scored at the last one.
+    best_iteration = int(np.argmin(history)) if early_stopping else len(history) - 1
+    return {
+        **trial,
+        "rmse": float(history[best_iteration]),
+        "trees": best_iteration + 1,
+        "seconds": round(time.perf_counter() - wall, 3),
+        "cpu_seconds": round(time.process_time() - cpu, 3),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Scheduler
+# ---------------------------------------------------------------------------
+def _trial_id(config: dict, budget: int, tag: str) -> str:
+    return hashlib.sha256(json.dumps([config, budget, tag], sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+def brackets(min_trees: int, max_trees: int, eta: int) -> list[tuple[int, int, int]]:
+    """Hyperband brackets as (configurations, starting budget, rungs), most exploratory first."""
+    s_max = int(math.floor(math.log(max_trees / min_trees, eta) + 1e-9))
+    return [
+        (int(math.ceil((s_max + 1) / (s + 1) * eta ** s)), int(round(max_trees / eta ** s)), s + 1)
+        for s in range(s_max, -1, -1)
+    ]
+
+
+class HyperbandSearch:
+    """
+    Hyperband over ``SEARCH_SPACE`` with a JSONL checkpoint of finished trials.
+
+    Configurations are drawn from a seeded RNG, so a resumed search asks for
+    exactly the same trials and finds the finished ones in the checkpoint.
+    """
+
+    def __init__(self, train_path: str, checkpoint: str, workers: int | None = None,
+                 min_trees: int = MIN_TREES, max_trees: int = MAX_TREES, eta: int = ETA, seed: int = SEED) -> None:
+        self.train_path = train_path
+        self.checkpoint = checkpoint
+        self.workers = workers or os.cpu_count() or 1
+        self.threads = max(1, (os.cpu_count() or 1) // self.workers)
+        self.min_trees = min_trees
+        self.max_trees = max_trees
+        self.eta = eta
+        self.seed = seed
+        self.results: dict[str, dict] = self._read_checkpoint()
+
+    def _read_checkpoint(self) -> dict[str, dict]:
+        results = {}
+        if os.path.exists(self.checkpoint):
+            with open(self.checkpoint, "r", encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue                     # torn last line from a killed run
+                    results[record["id"]] = record
+        if results:
+            logger.info("Resuming: %d finished trials in %s.", len(results), self.checkpoint)
+        return results
+
+    def _record(self, result: dict) -> None:
+        self.results[result["id"]] = result
+        with open(self.checkpoint, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(result) + "\n")
+
+    def _run_all(self, pool: ProcessPoolExecutor, trials: list[dict]) -> list[dict]:
+        pending = [t for t in trials if t["id"] not in self.results]
+        futures = [pool.submit(run_trial, trial, self.threads) for trial in pending]
+        for future in as_completed(futures):
+            result = future.result()
+            self._record(result)
+            logger.info("trial %s  budget %4d  rmse %8.2f  trees %4d  %.1f s",
+                        result["id"], result["budget"], result["rmse"], result["trees"], result["seconds"])
+        return [self.results[t["id"]] for t in trials]
+
+    def _sample(self, rng: random.Random) -> dict:
+        return {name: rng.choice(values) for name, values in SEARCH_SPACE.items()}
+
+    def run(self, baseline: bool = False) -> dict:
+        """
+        Run (or resume) the search.
+
+        Returns
+        -------
+        Summary with the best configuration, its validation RMSE, tree count and
+        total CPU seconds; with ``baseline`` also the notebook's ``best_params_xgb``.
+        """
+        rng = random.Random(self.seed)
+        with ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.train_path,)) as pool:
+            for b, (n_configs, first_budget, rungs) in enumerate(brackets(self.min_trees, self.max_trees, self.eta)):
+                configs = [self._sample(rng) for _ in range(n_configs)]
+                for rung in range(rungs):
+                    budget = min(self.max_trees, int(round(first_budget * self.eta ** rung)))
+                    trials = [{"id": _trial_id(c, budget, f"bracket-{b}"), "bracket": b, "config": c,
+                               "budget": budget} for c in configs]
+                    scored = sorted(self._run_all(pool, trials), key=lambda r: r["rmse"])
+                    configs = [r["config"] for r in scored[:max(1, len(configs) // self.eta)]]
+
+            if baseline:
+                config = {k: v for k, v in XGB_PARAMS.items() if k in SEARCH_SPACE}
+                self._run_all(pool, [{"id": _trial_id(config, XGB_PARAMS["n_estimators"], "baseline"),
+                                      "bracket": "baseline", "config": config,
+                                      "budget": XGB_PARAMS["n_estimators"], "early_stopping": False}])
+        return self.summary()
+
+    def summary(self) -> dict:
+        trials = [r for r in self.results.values() if r["bracket"] != "baseline"]
+        best = min(trials, key=lambda r: r["rmse"])
+        summary = {
+            "params": {**XGB_PARAMS, **best["config"], "n_estimators": best["trees"]},
+            "rmse": best["rmse"],
+            "trials": len(trials),
+            "cpu_seconds": round(sum(r["cpu_seconds"] for r in trials), 1),
+        }
+        baseline = [r for r in self.results.values() if r["bracket"] == "baseline"]
+        if baseline:
+            summary["baseline"] = {k: baseline[0][k] for k in ("rmse", "trees", "cpu_seconds")}
+        return summary
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Hyperband search for the XGBoost parameters.")
+    parser.add_argument("--data", default=RAW_CSV, help="Raw sales CSV (car_prices.csv).")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="Training pipeline cache.")
+    parser.add_argument("--out", default="tuned_params.json", help="Where the best parameters are written.")
+    parser.add_argument("--workers", type=int, help="Parallel trials (default: one per CPU).")
+    parser.add_argument("--min-trees", type=int, default=MIN_TREES)
+    parser.add_argument("--max-trees", type=int, default=MAX_TREES)
+    parser.add_argument("--eta", type=int, default=ETA, help="Halving rate between rungs.")
+    parser.add_argument("--baseline", action="store_true",
+                        help="Also fit the notebook's best_params_xgb (no early stopping) for comparison.")
+    parser.add_argument("--fresh", action="store_true", help="Ignore trials checkpointed by earlier runs.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    pipeline = TrainingPipeline(args.data, args.cache_dir)
+    pipeline.run(until="scale")
+    checkpoint = os.path.join(args.cache_dir, f"tuning-{pipeline.keys['scale']}.jsonl")
+    if args.fresh and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    search = HyperbandSearch(f"{pipeline.stage_dir('scale')}/train.parquet", checkpoint, args.workers,
+                             args.min_trees, args.max_trees, args.eta)
+    summary = search.run(baseline=args.baseline)
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(summary, fh, indent=2)
+
+    print(f"Best validation RMSE {summary['rmse']:.2f} $ over {summary['trials']} trials "
+          f"({summary['cpu_seconds']:.0f} CPU s): {summary['params']}")
+    if "baseline" in summary:
+        base = summary["baseline"]
+        print(f"best_params_xgb: RMSE {base['rmse']:.2f} $ with {base['trees']} trees ({base['cpu_seconds']:.0f} CPU s)")
+    print(f"Parameters written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()